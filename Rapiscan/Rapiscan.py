@@ -1,9 +1,15 @@
 #!/usr/bin/env python
 
+import contextlib
 import os
 import settings
 from sdw4_mapping import Study
-from sdw4_mapping.core.domain import Domain
+from sdw4_mapping.core.domain import Domain, set_copy_on_write, set_lazy
+from sdw4_mapping.common.snapshot import SnapshotCache
+from sdw4_mapping.common.date_memo import DateParseMemo
+from sdw4_mapping.common.date_report import DateParseReport
+from sdw4_mapping.common.allocation_report import AllocationReport
+import sdw4_mapping.transformations.date_conversions as sdw_dt
 import inputs
 
 import lib
@@ -43,6 +49,43 @@ import processors.sv
 import processors.vs
 # import processors.lbs
 
+# processors cooked by the study, in cooking order (main.py)
+cook_processors = {
+    "ae": processors.ae,
+    "aereact": processors.aereact,
+    "aereact2": processors.aereact2,
+    "cm": processors.cm,
+    "cmr": processors.cmr,
+    "cmrev": processors.cmrev,
+    "conmeth": processors.conmeth,
+    "dm": processors.dm,
+    "ds": processors.ds,
+    "dseos": processors.dseos,
+    "ecgd": processors.ecgd,
+    "eg": processors.eg,
+    "egfr": processors.egfr,
+    "ex": processors.ex,
+    "exg": processors.exg,
+    "flu": processors.flu,
+    "fpe": processors.fpe,
+    "ie": processors.ie,
+    "lb": processors.lb,
+    "mh": processors.mh,
+    "mhyn": processors.mhyn,
+    "pe": processors.pe,
+    "pevcg": processors.pevcg,
+    "poim": processors.poim,
+    "povcg": processors.povcg,
+    "povcgjoint": processors.povcgjoint,
+    "sae": processors.sae,
+    "su": processors.su,
+    "sub": processors.sub,
+    "sus": processors.sus,
+    "sv": processors.sv,
+    "vs": processors.vs,
+    # "lbs": processors.lbs,
+}
+
 
 class Rapiscan(Study):
     def __init__(self,
@@ -54,17 +97,156 @@ class Rapiscan(Study):
                  archive_folder=os.path.join(
                      settings.input_folder,
                      "archive"),
-                 output_folder=settings.output_folder):
+                 output_folder=settings.output_folder,
+                 use_snapshot_cache=settings.use_snapshot_cache,
+                 prefetch_workers=settings.prefetch_workers,
+                 categorical_columns=settings.categorical_columns,
+                 max_categories=settings.max_categories,
+                 cache_memory_budget=settings.cache_memory_budget,
+                 cache_spill_folder=settings.cache_spill_folder,
+                 release_raw_domains=settings.release_raw_domains,
+                 date_parse_memo=settings.date_parse_memo,
+                 date_parse_report=settings.date_parse_report,
+                 copy_on_write=settings.copy_on_write,
+                 allocation_report=settings.allocation_report,
+                 lazy_domains=settings.lazy_domains):
+        # the arguments of the study, to make the same study in the
+        # worker processes of scheduler.cook_all
+        self.options = {name: value for name, value in locals().items()
+                        if name not in ("self", "__class__")}
         super().__init__(id=id,
                          input_folder=preprocessed_folder,
                          output_folder=output_folder)
         self.raw_input_folder = input_folder
         self.archive_folder = archive_folder
-        self.raw_domain_reader = inputs.InputReader(self)
+        self.raw_domain_reader = inputs.InputReader(
+            self,
+            snapshot_cache=SnapshotCache() if use_snapshot_cache else None,
+            categorical_columns=categorical_columns,
+            max_categories=max_categories,
+            memory_budget=cache_memory_budget,
+            spill_folder=cache_spill_folder)
+        self.prefetch_workers = prefetch_workers
+        # raw domain -> number of processors still to cook reading it,
+        # or None to keep the raw domains until the end of the run
+        self.raw_domain_consumers = (
+            self.count_raw_domain_consumers() if release_raw_domains
+            else None)
+        # parsed date strings kept across runs (None: parse every run)
+        self.date_parse_memo = None
+        if date_parse_memo is not None:
+            self.date_parse_memo = DateParseMemo(
+                date_parse_memo, sdw_dt.date_parse_fingerprint())
+            sdw_dt.set_date_parse_memo(self.date_parse_memo)
+        # rows, parse paths and time of the date conversions per domain
+        # and column (None: not counted)
+        self.date_parse_report = (DateParseReport() if date_parse_report
+                                  else None)
+        sdw_dt.set_date_parse_report(self.date_parse_report)
+        # cooked domains share the buffers of the raw domains until they
+        # replace their columns
+        set_copy_on_write(copy_on_write)
+        # domains run their operations as optimized plans
+        set_lazy(lazy_domains)
+        # memory allocated per cook (None: not measured)
+        self.allocation_report = (AllocationReport() if allocation_report
+                                  else None)
         self.demographics2 = None
-
-    def get_raw_domain(self, domain_name):
-        return self.raw_domain_reader.get(domain_name)
+        self.subject_reference = None
+        # cook -> rows its deferred filters (inactive records) removed
+        # before joins
+        self.rows_filtered_early = {}
+        # convert_to_dt cache hits and misses of the worker processes
+        # which cooked for this study, see scheduler.cook_all
+        self.worker_date_parse_cache = {"hits": 0, "misses": 0}
+
+    def get_raw_domain(self, domain_name, usecols=None):
+        # usecols: columns (or ColumnProjection) the processor needs,
+        # the rest is never parsed
+        return self.raw_domain_reader.get(domain_name, usecols=usecols)
+
+    def raw_domains(self):
+        # the raw domains declared by the processors, in cooking order
+        names = []
+        for processor in cook_processors.values():
+            for name in getattr(processor, "raw_domains", []):
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def raw_domain_reads(self):
+        # (name, usecols) of the raw domains to read: the projection
+        # declared in the processors' raw_usecols when all consumers
+        # of a raw domain agree on it, else the whole domain (the
+        # projections are then cut from it by the InputReader)
+        projections = {}
+        for processor in cook_processors.values():
+            raw_usecols = getattr(processor, "raw_usecols", {})
+            for name in getattr(processor, "raw_domains", []):
+                projections.setdefault(name, set()).add(
+                    raw_usecols.get(name))
+        return [(name, next(iter(projections[name]))
+                 if len(projections[name]) == 1 else None)
+                for name in self.raw_domains()]
+
+    def count_raw_domain_consumers(self):
+        consumers = {}
+        for processor in cook_processors.values():
+            for name in set(getattr(processor, "raw_domains", [])):
+                consumers[name] = consumers.get(name, 0) + 1
+        return consumers
+
+    def cook(self, name):
+        processor = cook_processors[name]
+        measure = (self.allocation_report.measure(name)
+                   if self.allocation_report is not None
+                   else contextlib.nullcontext())
+        try:
+            with measure:
+                domain = processor.cook(self)
+        finally:
+            self.release_raw_domains(processor)
+        self.rows_filtered_early[name] = domain.rows_filtered_early
+        return domain
+
+    def release_raw_domains(self, processor):
+        # drops the raw domains the processor was the last to read
+        if self.raw_domain_consumers is None:
+            return
+        for name in set(getattr(processor, "raw_domains", [])):
+            if name not in self.raw_domain_consumers:
+                # kept until the end (use_reference_data)
+                continue
+            self.raw_domain_consumers[name] -= 1
+            if self.raw_domain_consumers[name] <= 0:
+                self.raw_domain_reader.release(name)
+
+    def prefetch_raw_domains(self):
+        # get_raw_domain() then only waits for the domain it asks for
+        self.raw_domain_reader.prefetch(
+            self.raw_domain_reads(),
+            max_workers=self.prefetch_workers)
+
+    def reference_data(self, domain_names):
+        # the raw domains most cooks read, with the subject reference and
+        # the demographics built from them, as picklable frames for the
+        # worker processes of scheduler.cook_all
+        return {
+            "raw_domains": {name: self.get_raw_domain(name).data
+                            for name in domain_names},
+            "subject_reference": self.get_subject_reference(),
+            "demographics2": self.get_demographics2().data}
+
+    def use_reference_data(self, reference):
+        # takes the data of reference_data instead of reading and
+        # building it again, and keeps it until the end of the run
+        for name, data in reference["raw_domains"].items():
+            self.raw_domain_reader.add(name, data)
+            if self.raw_domain_consumers is not None:
+                self.raw_domain_consumers.pop(name, None)
+        self.subject_reference = reference["subject_reference"]
+        self.demographics2 = Domain(self, "DM2")
+        self.demographics2.data = reference["demographics2"]
 
     def apply_common_transforms(self, domain):
         demographics = self.get_raw_domain("dm")
@@ -72,13 +254,23 @@ class Rapiscan(Study):
         lib.common.apply_common_transforms(
             domain=domain,
             demographics=demographics,
-            subject_visits=subject_visits)
+            subject_visits=subject_visits,
+            reference=self.get_subject_reference())
+
+    def get_subject_reference(self):
+        # AGE, SEX and parsed RFSTDTC per Subject, built on first use
+        if self.subject_reference is None:
+            self.subject_reference = lib.common.build_subject_reference(
+                self,
+                demographics=self.get_raw_domain("dm"),
+                subject_visits=self.get_raw_domain("sv"))
+        return self.subject_reference
 
     def get_demographics2(self):
         if self.demographics2 is None:
             demographics = self.get_raw_domain("dm")
             dm2 = Domain(self, "DM2")
-            dm2.data = demographics.data.copy()
+            dm2.copy_data(demographics)
             dm2.data = dm2.data[['Subject', 'S_DM_SEX', 'S_DM_AGE']]
             dm2.rename_columns({'S_DM_SEX': 'SEX', 'S_DM_AGE': 'AGE'})
             dm2.data = dm2.data[['Subject', 'SEX', 'AGE']]
@@ -91,100 +283,100 @@ class Rapiscan(Study):
         lib.common.apply_sex_age(domain, demographics)
 
     def cook_ae(self):
-        return processors.ae.cook(self)
+        return self.cook("ae")
 
     def cook_aereact(self):
-        return processors.aereact.cook(self)
+        return self.cook("aereact")
 
     def cook_aereact2(self):
-        return processors.aereact2.cook(self)
+        return self.cook("aereact2")
 
     def cook_cm(self):
-        return processors.cm.cook(self)
+        return self.cook("cm")
 
     def cook_cmr(self):
-        return processors.cmr.cook(self)
+        return self.cook("cmr")
 
     def cook_cmrev(self):
-        return processors.cmrev.cook(self)
+        return self.cook("cmrev")
 
     def cook_conmeth(self):
-        return processors.conmeth.cook(self)
+        return self.cook("conmeth")
 
     def cook_dm(self):
-        return processors.dm.cook(self)
+        return self.cook("dm")
 
     def cook_ds(self):
-        return processors.ds.cook(self)
+        return self.cook("ds")
 
     def cook_dseos(self):
-        return processors.dseos.cook(self)
+        return self.cook("dseos")
 
     def cook_ecgd(self):
-        return processors.ecgd.cook(self)
+        return self.cook("ecgd")
 
     def cook_eg(self):
-        return processors.eg.cook(self)
+        return self.cook("eg")
 
     def cook_egfr(self):
-        return processors.egfr.cook(self)
+        return self.cook("egfr")
 
     def cook_ex(self):
-        return processors.ex.cook(self)
+        return self.cook("ex")
 
     def cook_exg(self):
-        return processors.exg.cook(self)
+        return self.cook("exg")
 
     def cook_flu(self):
-        return processors.flu.cook(self)
+        return self.cook("flu")
 
     def cook_fpe(self):
-        return processors.fpe.cook(self)
+        return self.cook("fpe")
 
     def cook_ie(self):
-        return processors.ie.cook(self)
+        return self.cook("ie")
 
     def cook_lb(self):
-        return processors.lb.cook(self)
+        return self.cook("lb")
 
     def cook_mh(self):
-        return processors.mh.cook(self)
+        return self.cook("mh")
 
     def cook_mhyn(self):
-        return processors.mhyn.cook(self)
+        return self.cook("mhyn")
 
     def cook_pe(self):
-        return processors.pe.cook(self)
+        return self.cook("pe")
 
     def cook_pevcg(self):
-        return processors.pevcg.cook(self)
+        return self.cook("pevcg")
 
     def cook_poim(self):
-        return processors.poim.cook(self)
+        return self.cook("poim")
 
     def cook_povcg(self):
-        return processors.povcg.cook(self)
+        return self.cook("povcg")
 
     def cook_povcgjoint(self):
-        return processors.povcgjoint.cook(self)
+        return self.cook("povcgjoint")
 
     def cook_sae(self):
-        return processors.sae.cook(self)
+        return self.cook("sae")
 
     def cook_su(self):
-        return processors.su.cook(self)
+        return self.cook("su")
 
     def cook_sub(self):
-        return processors.sub.cook(self)
+        return self.cook("sub")
 
     def cook_sus(self):
-        return processors.sus.cook(self)
+        return self.cook("sus")
 
     def cook_sv(self):
-        return processors.sv.cook(self)
+        return self.cook("sv")
 
     def cook_vs(self):
-        return processors.vs.cook(self)
+        return self.cook("vs")
 
     # def cook_lbs(self):
     #     return processors.lbs.cook(self)
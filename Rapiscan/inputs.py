@@ -1,27 +1,278 @@
 #!/usr/bin/env python
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from sdw4_mapping import Domain
+from sdw4_mapping.common.utils import (
+    ColumnProjection, encode_categories, memory_usage)
+import hashlib
+import logging
 import os
+import threading
+import pandas as pd
 
 
 class InputReader:
-    def __init__(self, study):
+    def __init__(self, study, snapshot_cache=None,
+                 categorical_columns=None, max_categories=None,
+                 memory_budget=None, spill_folder=None):
         self.study = study
-        self.cache = {}
+        # least recently used first
+        self.cache = OrderedDict()
+        # bytes the cached domains may use (None: no limit); least
+        # recently used domains are evicted above it, and spilled to
+        # spill_folder if given (else read again when needed)
+        self.memory_budget = memory_budget
+        self.spill_folder = spill_folder
+        # key -> bytes used by the cached domain, or by the finished
+        # read ahead of it
+        self.domain_sizes = {}
+        # key -> pickle of an evicted domain in spill_folder
+        self.spilled = {}
+        self.evictions = 0
+        # sdw4_mapping.common.snapshot.SnapshotCache, or None to always parse the CSV
+        self.snapshot_cache = snapshot_cache
+        # columns stored as pandas categoricals, see encode_categories
+        self.categorical_columns = categorical_columns
+        self.max_categories = max_categories
+        # domain_name -> bytes saved by the categoricals, updated by the
+        # prefetch threads under the lock
+        self.memory_saved = {}
+        self.lock = threading.Lock()
+        # domain_name -> Future of the domain being read in the background
+        self.pending = {}
+        # key -> (domain_name, usecols) of the domains to prefetch not
+        # submitted yet, see read_ahead
+        self.queued = OrderedDict()
+        # reads ahead at once with a memory budget
+        self.read_ahead_limit = 0
+        self.executor = None
 
-    def get(self, domain_name):
+    @staticmethod
+    def key(domain_name, usecols=None):
+        # the cache holds one entry per domain and projection
+        if usecols is None:
+            return domain_name
+        if isinstance(usecols, (list, tuple)):
+            usecols = tuple(usecols)
+        return (domain_name, usecols)
+
+    def get(self, domain_name, usecols=None):
         # Take advantage that all files are ae.CSV, etc.
-        domain = self.cache.get(domain_name)
-        if domain:
-            return domain
+        key = self.key(domain_name, usecols)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        future = self.pending.pop(key, None)
+        self.queued.pop(key, None)
+        if future is not None:
+            # only wait for the one we need
+            domain = future.result()
+        elif key in self.spilled:
+            domain = self.reload(key, domain_name)
+        elif usecols is not None and (domain_name in self.cache
+                                      or domain_name in self.pending
+                                      or domain_name in self.queued
+                                      or domain_name in self.spilled):
+            # the whole domain is (being) read anyway, cut the
+            # projection from it instead of parsing the file again
+            domain = self.project(self.get(domain_name), usecols)
+        else:
+            domain = self.read(domain_name, usecols)
+        self.cache[key] = domain
+        if self.memory_budget is not None:
+            if future is None or key not in self.domain_sizes:
+                self.domain_sizes[key] = self.domain_size(domain)
+            self.evict()
+            self.read_ahead()
+        return domain
+
+    def add(self, domain_name, data):
+        # caches data (e.g. read by another process) as the domain
+        domain = Domain(study=self.study, name=domain_name)
+        domain.data = data
+        self.cache[self.key(domain_name)] = domain
+        if self.memory_budget is not None:
+            self.domain_sizes[self.key(domain_name)] = self.domain_size(
+                domain)
+            self.evict()
+            self.read_ahead()
 
+    def read(self, domain_name, usecols=None):
         filename = f"{domain_name}.csv"
         filename = os.path.join(self.study.input_folder, filename)
 
         try:
             domain = Domain(study=self.study, name=domain_name,
-                            data_path=filename)
-            self.cache[domain_name] = domain
-            return domain
+                            data_path=filename,
+                            usecols=usecols,
+                            snapshot_cache=self.snapshot_cache)
         except Exception as e:
             raise Exception(f"Failed to read {filename}: {e}", e)
+        self.encode(domain)
+        return domain
+
+    def encode(self, domain):
+        # after the read, so the snapshots keep plain strings
+        if domain.data is None or (self.categorical_columns is None
+                                   and self.max_categories is None):
+            return
+        before = memory_usage(domain.data)
+        encode_categories(domain.data,
+                          columns=self.categorical_columns,
+                          max_categories=self.max_categories)
+        saved = before - memory_usage(domain.data)
+        with self.lock:
+            self.memory_saved[domain.name] = (
+                self.memory_saved.get(domain.name, 0) + saved)
+        logging.info(f"Categoricals saved {saved / 2**20:.1f} MiB"
+                     f" on {domain.name}")
+
+    def memory_report(self):
+        lines = [f"{name}: {saved / 2**20:.1f} MiB"
+                 for name, saved in sorted(self.memory_saved.items())]
+        total = sum(self.memory_saved.values())
+        lines.append(f"Categoricals saved {total / 2**20:.1f} MiB in total")
+        return "\n".join(lines)
+
+    def project(self, domain, usecols):
+        projected = Domain(study=self.study, name=domain.name)
+        if isinstance(usecols, ColumnProjection):
+            projected.data = usecols.apply(domain.data)
+        else:
+            # same column order as read_csv gives
+            projected.data = domain.data[
+                [c for c in domain.data.columns if c in usecols]]
+        return projected
+
+    @staticmethod
+    def key_name(key):
+        return key if isinstance(key, str) else key[0]
+
+    def release(self, domain_name):
+        # drops the domain and its projections, read again if needed
+        for key in [key for key in self.cache
+                    if self.key_name(key) == domain_name]:
+            del self.cache[key]
+            self.domain_sizes.pop(key, None)
+        for key in [key for key in self.pending
+                    if self.key_name(key) == domain_name]:
+            self.pending.pop(key).cancel()
+            self.domain_sizes.pop(key, None)
+        for key in [key for key in self.queued
+                    if self.key_name(key) == domain_name]:
+            del self.queued[key]
+        for key in [key for key in self.spilled
+                    if self.key_name(key) == domain_name]:
+            path = self.spilled.pop(key)
+            if os.path.exists(path):
+                os.remove(path)
+        logging.info(f"Released raw domain {domain_name}")
+
+    @staticmethod
+    def domain_size(domain):
+        return 0 if domain.data is None else memory_usage(domain.data)
+
+    def sizes(self):
+        # key -> bytes used by each cached domain
+        for key, domain in self.cache.items():
+            if key not in self.domain_sizes:
+                self.domain_sizes[key] = self.domain_size(domain)
+        return {key: self.domain_sizes[key] for key in self.cache}
+
+    def evict(self):
+        # drops the least recently used domains until the cache fits
+        # the budget, always keeping the one just used
+        total = sum(self.domain_sizes.get(key, 0) for key in self.cache)
+        while total > self.memory_budget and len(self.cache) > 1:
+            key, domain = self.cache.popitem(last=False)
+            total -= self.domain_sizes.pop(key, 0)
+            self.evictions += 1
+            if self.spill_folder is not None and domain.data is not None:
+                self.spill(key, domain)
+            logging.info(f"Evicted {self.key_name(key)}"
+                         f" from the raw domain cache")
+
+    def spill_path(self, key):
+        name = self.key_name(key)
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_folder, f"{name}.{digest[:8]}.pkl")
+
+    def spill(self, key, domain):
+        if key in self.spilled:
+            # unchanged since it was reloaded
+            return
+        path = self.spill_path(key)
+        try:
+            os.makedirs(self.spill_folder, exist_ok=True)
+            domain.data.to_pickle(path)
+            self.spilled[key] = path
+        except Exception as e:
+            logging.warning(f"Could not spill {key} to {path}: {e}")
+
+    def reload(self, key, domain_name):
+        domain = Domain(study=self.study, name=domain_name)
+        try:
+            domain.data = pd.read_pickle(self.spilled[key])
+        except Exception as e:
+            logging.warning(f"Could not reload {self.spilled.pop(key)},"
+                            f" reading {domain_name} again: {e}")
+            return self.read(domain_name, None if isinstance(key, str)
+                             else key[1])
+        return domain
+
+    def prefetch(self, domain_names, max_workers=4):
+        # Reads the domains on a thread pool in the background.
+        # The input folder is often a shared drive with a high
+        # per-file latency, so the reads mostly wait on I/O.
+        # domain_names items are names or (name, usecols) pairs.
+        if max_workers <= 0:
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix="InputReader")
+        for item in domain_names:
+            domain_name, usecols = (
+                item if isinstance(item, tuple) else (item, None))
+            key = self.key(domain_name, usecols)
+            if (key not in self.cache and key not in self.pending
+                    and key not in self.queued and key not in self.spilled):
+                self.queued[key] = (domain_name, usecols)
+        self.read_ahead_limit = max_workers
+        self.read_ahead()
+
+    def read_ahead(self):
+        # Submits the queued reads: all of them without a memory budget.
+        # With one, the domains read ahead wait in pending, out of the
+        # cache: at most read_ahead_limit reads are pending at once, and
+        # the next one is submitted only while the cached domains and the
+        # finished reads ahead fit the budget (get submits the next ones).
+        while self.queued and (self.memory_budget is None or (
+                len(self.pending) < self.read_ahead_limit
+                and self.held_size() < self.memory_budget)):
+            key, (domain_name, usecols) = self.queued.popitem(last=False)
+            self.pending[key] = self.executor.submit(
+                self.read, domain_name, usecols)
+
+    def held_size(self):
+        # bytes used by the cached domains and the finished reads ahead
+        for key, future in self.pending.items():
+            if (key not in self.domain_sizes and future.done()
+                    and not future.cancelled()
+                    and future.exception() is None):
+                self.domain_sizes[key] = self.domain_size(future.result())
+        return sum(self.domain_sizes.get(key, 0)
+                   for key in list(self.cache) + list(self.pending))
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        self.pending = {}
+        self.queued = OrderedDict()
+        for path in self.spilled.values():
+            if os.path.exists(path):
+                os.remove(path)
+        self.spilled = {}
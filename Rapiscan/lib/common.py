@@ -1,22 +1,46 @@
 import pandas as pd
-from sdw4_mapping.transformations.date_conversions import convert_to_dt
+from sdw4_mapping.core.domain import Domain
+from sdw4_mapping.common.utils import ColumnProjection, compile_patterns
+from sdw4_mapping.transformations.date_conversions import convert_to_dt, date_parse_scope
+from sdw4_mapping.transformations.conditions import equals
 from datetime import date
 
 
 def make_tc(domain, column):
+    # timed as a whole in the date parse report
+    with date_parse_scope(domain.name, column, len(domain.data)):
+        _make_tc(domain, column)
+
+
+def _make_tc(domain, column):
+    # column-wise: blanks to NaT, convert_date, then datetimes to dates
     df = domain.data
-    df[column] = df[column].apply(lambda x: pd.NaT if x == "" else x)
+    kind = pd.api.types.infer_dtype(df[column], skipna=True)
+    if kind == "date" and pd.api.types.is_object_dtype(df[column]):
+        # dates made by a previous make_tc, nothing left to convert
+        return
+    if kind == "string":
+        blank = df[column].to_numpy() == ""
+        if blank.any():
+            df[column] = df[column].where(~blank, pd.NaT)
+    elif not pd.api.types.is_datetime64_any_dtype(df[column]):
+        # numbers, nulls only...: keep the dtype inference of apply
+        df[column] = df[column].apply(lambda x: pd.NaT if x == "" else x)
     domain.convert_date(column)
     df = domain.data
 
-    def try_to_date(d):
-        try:
-            return d.date()
-        except:
-            return d
+    if pd.api.types.is_datetime64_any_dtype(df[column]) and len(df):
+        df[column] = df[column].dt.date
+    else:
+        # some values were not converted (or no rows, kept datetime64)
+        df[column] = df[column].apply(_try_to_date)
 
-    df[column] = df[column].apply(try_to_date)
-    # df[column] = df[column].dt.date
+
+def _try_to_date(d):
+    try:
+        return d.date()
+    except:
+        return d
 
 
 def apply_sex_age(domain, demographics):
@@ -26,28 +50,57 @@ def apply_sex_age(domain, demographics):
         columns=["S_DM_AGEY_STD", "SEX"])
 
 
-def apply_common_transforms(domain, demographics, subject_visits):
+def build_subject_reference(study, demographics, subject_visits):
+    # tables joined by Subject in apply_common_transforms, built once per
+    # run: "demographics" (S_DM_AGEY_STD, SEX), "visits" (RFSTDTC, the
+    # check-in visit date, parsed once for all the domains) and "both"
+    # (outer join of the two, a Subject missing on one side gets nulls)
+    dm = demographics.data
+    dm = dm[[c for c in ["Subject", "S_DM_AGEY_STD", "SEX"]
+             if c in dm.columns]]
+    sv = subject_visits.data
+    visits = Domain(study, "RFSTDTC")
+    visits.data = (sv.loc[sv["Folder"] == "VCHECKIN",
+                          ["Subject", "S_SV_VISDAT_INT"]]
+                   .rename(columns={"S_SV_VISDAT_INT": "RFSTDTC"}))
+    # Inefficient -- we know the format, but it has millis not micros
+    make_tc(visits, "RFSTDTC")
+    return {"demographics": dm,
+            "visits": visits.data,
+            "both": dm.merge(visits.data, on="Subject", how="outer")}
+
+
+def apply_common_transforms(domain, demographics, subject_visits,
+                            reference=None):
+    # reference: tables of build_subject_reference (built here if None)
+    if reference is None:
+        reference = build_subject_reference(
+            domain.study, demographics, subject_visits)
+
     # if there are already AGE and SEX, keep the original?
     columns_to_add = [s for s in ["S_DM_AGEY_STD", "SEX"]
                       if s not in domain.data.columns]
-    if columns_to_add:
-        # print(domain.data.columns)
-        # print(demographics.data.columns)
-        domain.join(right=demographics,
-                    on=["Subject"],  # e-mail 2021-04-16 4:43PM & 5:13PM
-                    # on=["subjectId"],
-                    columns=columns_to_add)
-
-    # we redo the parse on each pass... :-(
-    if "RFSTDTC" not in domain.data.columns:
-        domain.join(right=subject_visits,
-                    # on=["Subject", "Folder"], #Question in email 2021-04-16 9:20AM
-                    # on=["subjectId"], #see e-mail 2021-04-16 4:43 PM
+    add_rfstdtc = "RFSTDTC" not in domain.data.columns
+    # one join for all the missing columns; a table with only the
+    # missing ones, so subjects with several check-in visits don't
+    # duplicate rows when only AGE and SEX are added
+    if columns_to_add and add_rfstdtc:
+        right, columns = reference["both"], columns_to_add + ["RFSTDTC"]
+    elif columns_to_add:
+        right, columns = reference["demographics"], columns_to_add
+    elif add_rfstdtc:
+        right, columns = reference["visits"], ["RFSTDTC"]
+    else:
+        right = None
+    if right is not None:
+        domain.join(right=right,
                     on=["Subject"],  # see e-mail 2021-04-16 5:13
-                    right_filter={"Folder": "VCHECKIN"},
-                    columns={"S_SV_VISDAT_INT": "RFSTDTC"})
-        # Inefficient -- we know the format, but it has millis not micros
-        make_tc(domain, "RFSTDTC")
+                    columns=columns)
+    if add_rfstdtc:
+        # subjects without check-in get NaT, as from the parse of the
+        # joined dates
+        rfstdtc = domain.data["RFSTDTC"]
+        domain.data["RFSTDTC"] = rfstdtc.where(rfstdtc.notna(), pd.NaT)
 
     # Note there is no need to rename a column if the column already
     # has that name.
@@ -88,31 +141,43 @@ drop_lst = ['projectid', 'studyid', 'environmentName', 'Site', 'siteid', 'StudyS
             ]
 
 
-def cols_drop(df):
-    col_pattern = ['_YYYY', '_STD', '_RAW', '_MM', '_DD', '_CODE', '_CD', '_INT']
-    pattern = '|'.join(col_pattern)
-    Columns_to_drop = list(df.columns[list(df.columns.str.contains(pattern))])
-    # Columns_to_drop2 = list(df.columns[df.columns.str.endswith('_INT')])
-    # Columns_to_drop = Columns_to_drop1 + Columns_to_drop2
-    return Columns_to_drop
+cols_drop_patterns = ['_YYYY', '_STD', '_RAW', '_MM', '_DD', '_CODE', '_CD', '_INT']
 
+# active records (not deleted or replaced in the EDC), kept by the cooks:
+# dom.filter_rows(common.record_active)
+record_active = equals("RecordActive", "1")
 
-def studyDUR(domain: pd.DataFrame, date_start: str, date_end: str, output_col_name: str):
-    domain[date_start] = pd.to_datetime(domain[date_start])
 
-    domain[date_end] = pd.to_datetime(domain[date_end])
+def cols_drop(df):
+    # columns matching cols_drop_patterns; dom.prune_columns(drop_lst,
+    # cols_drop_patterns) drops them with drop_lst in one go
+    regex = compile_patterns(tuple(cols_drop_patterns))
+    return [c for c in df.columns if regex.search(c)]
 
-    domain.loc[(domain[date_end] - domain[date_start]).dt.days >= 0, output_col_name] = 1 + (
-                domain[date_end] - domain[date_start]).dt.days
 
-    domain.loc[(domain[date_end] - domain[date_start]).dt.days < 0, output_col_name] = (
-                domain[date_end] - domain[date_start]).dt.days
+def study_days(start: pd.Series, end: pd.Series) -> pd.Series:
+    # days from start to end datetimes, plus one when not negative: there
+    # is no day 0 (the day before day 1 is day -1); <NA> if a date is
+    # missing
+    days = (end - start).dt.days.astype("Int64")
+    return days + days.ge(0).astype("Int64")
 
-    domain[output_col_name] = domain[output_col_name].apply(
-        lambda x: int(x) if not pd.isnull(x) and not pd.isna(x) else pd.NA)
 
+def studyDUR(domain: pd.DataFrame, date_start: str, date_end: str, output_col_name: str):
+    # the date columns are left converted to datetime64; the rows with a
+    # missing date keep the value already in the output column, if any
+    domain[date_start] = pd.to_datetime(domain[date_start])
+    domain[date_end] = pd.to_datetime(domain[date_end])
+    days = study_days(domain[date_start], domain[date_end])
+    if output_col_name in domain.columns:
+        missing = days.isna()
+        if missing.any():
+            days[missing] = domain.loc[missing, output_col_name].apply(
+                lambda x: int(x) if not pd.isna(x) else pd.NA)
+    domain[output_col_name] = days
     return domain
 
+
 dictlab = {'RCT3': 'GGT',
  'RCT408': 'Creatinine2dp',
  'RCT11': 'SerumGlucose',
@@ -155,3 +220,14 @@ dictlab = {'RCT3': 'GGT',
  'RCT2412': 'Cocaine',
  'RCT2422': 'Opiates',
  'RCT2424': 'Cannabinoids'}
+
+
+def raw_projection(drop=(), drop_patterns=()):
+    # Columns of a raw domain a processor reads: all but "subjectId"
+    # and the ones it drops before using any other column. The columns
+    # the sex/age and common transforms look for are always read, so
+    # they are joined the same way.
+    return ColumnProjection(
+        drop=["subjectId", *drop],
+        drop_patterns=drop_patterns,
+        keep=["S_DM_AGEY_STD", "SEX", "RFSTDTC"])
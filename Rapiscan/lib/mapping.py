@@ -0,0 +1,187 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sdw4_mapping.common.utils import ColumnProjection
+from sdw4_mapping.core.domain import Domain
+from lib import common
+
+# Declarative domain mappings: a processor describes its cook as a
+# DomainMapping, an ordered tuple of the steps below, and gets the cook
+# function, raw_domains and raw_usecols from it, e.g.
+#
+#   mapping = DomainMapping(
+#       name="EX", raw="ex",
+#       read=common.raw_projection(drop=common.drop_lst),
+#       steps=(SexAge(), CommonTransforms(),
+#              Drop(common.drop_lst, common.cols_drop_patterns),
+#              MakeTc(("EX_DATETIME",)),
+#              Rename({"EX_DATETIME": "EXSTDTC"})))
+#   raw_domains, raw_usecols = mapping.raw_domains, mapping.raw_usecols
+#   cook = mapping.compile()
+
+
+@dataclass(frozen=True)
+class Drop:
+    # columns dropped by names and by regular expressions
+    columns: Tuple[str, ...] = ()
+    patterns: Tuple[str, ...] = ()
+
+    def __post_init__(self):
+        # lists (e.g. common.drop_lst) are taken as tuples, so drops
+        # merge and hash whatever they were given
+        object.__setattr__(self, "columns", tuple(self.columns))
+        object.__setattr__(self, "patterns", tuple(self.patterns))
+
+    def __call__(self, study, dom):
+        dom.prune_columns(list(self.columns), list(self.patterns))
+
+
+@dataclass(frozen=True)
+class ReplaceInNames:
+    # (old, new) replaced in the column names, in order, as
+    # dom.data.columns.str.replace(old, new)
+    replacements: Tuple[Tuple[str, str], ...]
+
+    def __call__(self, study, dom):
+        columns = dom.data.columns
+        for old, new in self.replacements:
+            columns = columns.str.replace(old, new)
+        dom.data.columns = columns
+
+
+@dataclass(frozen=True)
+class Rename:
+    columns: Dict[str, str]
+
+    def __call__(self, study, dom):
+        dom.rename_columns(self.columns)
+
+
+@dataclass(frozen=True)
+class MapColumn:
+    # target column = source column values mapped by the dictionary
+    source: str
+    target: str
+    dictionary: Dict[str, str]
+
+    def __call__(self, study, dom):
+        dom.data[self.target] = dom.data[self.source].map(self.dictionary)
+
+
+@dataclass(frozen=True)
+class SexAge:
+    def __call__(self, study, dom):
+        study.apply_sex_age(dom)
+
+
+@dataclass(frozen=True)
+class CommonTransforms:
+    def __call__(self, study, dom):
+        study.apply_common_transforms(dom)
+
+
+@dataclass(frozen=True)
+class MakeTc:
+    # date columns converted to dates (common.make_tc), in order
+    columns: Tuple[str, ...]
+
+    def __call__(self, study, dom):
+        for column in self.columns:
+            common.make_tc(dom, column)
+
+
+@dataclass(frozen=True)
+class StudyDur:
+    # (start, end, output) columns of common.studyDUR, in order
+    durations: Tuple[Tuple[str, str, str], ...]
+
+    def __call__(self, study, dom):
+        for start, end, output in self.durations:
+            common.studyDUR(dom.data, start, end, output)
+
+
+@dataclass(frozen=True)
+class Apply:
+    # any other change of the domain: function(dom)
+    function: Callable[[Domain], Any]
+
+    def __call__(self, study, dom):
+        self.function(dom)
+
+
+@dataclass(frozen=True)
+class DomainMapping:
+    # name: cooked domain, raw: raw domain it is made from, read: raw
+    # columns read (None: all), steps: run in order after the prologue:
+    # copy of the raw domain, RecordActive filter deferred (active_only),
+    # DOMAIN constant (domain_value, default name), subjectId dropped
+    # (drop_subject_id). reference: the other raw domains the steps use
+    name: str
+    raw: str
+    steps: Tuple[Any, ...]
+    read: Optional[ColumnProjection] = None
+    reference: Tuple[str, ...] = ("dm", "sv")
+    domain_value: Optional[str] = None
+    active_only: bool = True
+    drop_subject_id: bool = True
+    # the steps merged by compile
+    compiled_steps: Tuple[Any, ...] = field(init=False, repr=False,
+                                            compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "compiled_steps", merge_steps(self.steps))
+
+    @property
+    def raw_domains(self):
+        return [self.raw, *self.reference]
+
+    @property
+    def raw_usecols(self):
+        return {self.raw: self.read} if self.read is not None else {}
+
+    def compile(self):
+        # the cook function of the mapping. In lazy mode
+        # (settings.lazy_domains, see Domain.explain) the DOMAIN constant,
+        # the drops and the renames between two transforms run as one
+        # projection, after the RecordActive filter, which runs before the
+        # first left or inner join
+        def cook(study):
+            dom = Domain(study, self.name)
+            dom.copy_data(study.get_raw_domain(self.raw, usecols=self.read))
+            if self.active_only:
+                dom.defer_filter(common.record_active)
+            dom.add_column_constant("DOMAIN", self.domain_value or self.name)
+            if self.drop_subject_id:
+                dom.drop_columns("subjectId")
+            for step in self.compiled_steps:
+                step(study, dom)
+            dom.apply_pending_filters()
+            dom.materialize()
+            return dom
+
+        return cook
+
+
+def merge_steps(steps):
+    # consecutive steps of the same kind run as one: drops (one pruning
+    # of names and patterns), replacements in names (one new index of
+    # names), date conversions and durations
+    merged = []
+    for step in steps:
+        previous = merged[-1] if merged else None
+        if type(step) is not type(previous):
+            merged.append(step)
+        elif isinstance(step, Drop):
+            merged[-1] = Drop(
+                tuple(dict.fromkeys(previous.columns + step.columns)),
+                tuple(dict.fromkeys(previous.patterns + step.patterns)))
+        elif isinstance(step, ReplaceInNames):
+            merged[-1] = ReplaceInNames(
+                previous.replacements + step.replacements)
+        elif isinstance(step, MakeTc):
+            merged[-1] = MakeTc(previous.columns + step.columns)
+        elif isinstance(step, StudyDur):
+            merged[-1] = StudyDur(previous.durations + step.durations)
+        else:
+            merged.append(step)
+    return tuple(merged)
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 
+import argparse
 import os
 import shutil
 import sys
@@ -8,78 +9,87 @@ import Rapiscan
 import sdw4_mapping
 import patches
 import patch_date_created
+import scheduler
 # import patch_read_data
 
-outf = settings.output_folder
 
-study = Rapiscan.Rapiscan()
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Cooks the domains of the study.")
+    parser.add_argument(
+        "--jobs", type=int, default=settings.cook_jobs,
+        help="processes cooking the domains at once"
+             f" (default {settings.cook_jobs})")
+    jobs = parser.parse_args(argv).jobs
 
-# This is a fail-safe.
-# If we are *not* in production, then we probably *should not* modify
-# the shared drives.  It is a bit of a kludge.
-if not settings.is_production:
-    if ("dfwpnfps14" in study.input_folder.lower()
-            or "sdw_share" in study.input_folder.lower()
-            or "dfwpnfps14" in study.archive_folder.lower()
-            or "sdw_share" in study.archive_folder.lower()):
-        raise Exception(
-            "Alter data on shared drives from non-prod???????")
-# ---end fail-safe---
+    outf = settings.output_folder
 
-patch_date_created.do_created_dates_procedure(
-    sas_folder=study.raw_input_folder,
-    output_folder=study.input_folder,
-    archive_folder_base=study.archive_folder,
-    cache_data=False)
+    study = Rapiscan.Rapiscan()
 
-study.cook_ae().to_csv(outf)
-study.cook_aereact().to_csv(outf)
-study.cook_aereact2().to_csv(outf)
-study.cook_cm().to_csv(outf)
-study.cook_cmr().to_csv(outf)
-study.cook_cmrev().to_csv(outf)
-study.cook_conmeth().to_csv(outf)
-study.cook_dm().to_csv(outf)
-study.cook_ds().to_csv(outf)
-study.cook_dseos().to_csv(outf)
-study.cook_ecgd().to_csv(outf)
-study.cook_eg().to_csv(outf)
-study.cook_egfr().to_csv(outf)
-study.cook_ex().to_csv(outf)
-study.cook_exg().to_csv(outf)
-study.cook_flu().to_csv(outf)
-study.cook_fpe().to_csv(outf)
-study.cook_ie().to_csv(outf)
-study.cook_lb().to_csv(outf)
-study.cook_mh().to_csv(outf)
-study.cook_mhyn().to_csv(outf)
-study.cook_pe().to_csv(outf)
-study.cook_pevcg().to_csv(outf)
-study.cook_poim().to_csv(outf)
-study.cook_povcg().to_csv(outf)
-study.cook_povcgjoint().to_csv(outf)
-study.cook_sae().to_csv(outf)
-study.cook_su().to_csv(outf)
-study.cook_sub().to_csv(outf)
-study.cook_sus().to_csv(outf)
-study.cook_sv().to_csv(outf)
-study.cook_vs().to_csv(outf)
-# study.cook_lbs().to_csv(outf)
+    # This is a fail-safe.
+    # If we are *not* in production, then we probably *should not* modify
+    # the shared drives.  It is a bit of a kludge.
+    if not settings.is_production:
+        if ("dfwpnfps14" in study.input_folder.lower()
+                or "sdw_share" in study.input_folder.lower()
+                or "dfwpnfps14" in study.archive_folder.lower()
+                or "sdw_share" in study.archive_folder.lower()):
+            raise Exception(
+                "Alter data on shared drives from non-prod???????")
+    # ---end fail-safe---
 
+    patch_date_created.do_created_dates_procedure(
+        sas_folder=study.raw_input_folder,
+        output_folder=study.input_folder,
+        archive_folder_base=study.archive_folder,
+        cache_data=False)
 
-if settings.should_update_datamart:
-    print("Updating datamart.")
-    sys.stdout.flush()  # don't mix output with subprocess
-    sdw4_mapping.cmr_loader(
-        folder=outf,
-        study_ref=settings.study_ref)
+    scheduler.cook_all(study, Rapiscan.cook_processors, outf, jobs=jobs)
+    if study.raw_domain_reader.memory_budget is not None:
+        print(f"{study.raw_domain_reader.evictions} raw domain(s) evicted,"
+              f" {sum(study.raw_domain_reader.sizes().values()) / 2**20:.1f}"
+              f" MiB cached at the end")
+    study.raw_domain_reader.shutdown()
 
-processed_folder = os.path.join(
-    study.raw_input_folder,
-    "processed")
-print(f"caching {outf} to {processed_folder}")
-try:
-    shutil.rmtree(processed_folder)
-except Exception as e:
-    print(f"while deleting old {processed_folder}: {e}")
-shutil.copytree(outf, processed_folder)
+    if study.raw_domain_reader.snapshot_cache is not None:
+        print(study.raw_domain_reader.snapshot_cache)
+    print("Date parse cache: {hits} hit(s), {misses} miss(es),"
+          " hit rate {hit_rate:.1%}".format(
+              **scheduler.date_parse_cache_stats(study)))
+    if study.date_parse_memo is not None:
+        study.date_parse_memo.close()
+        print(study.date_parse_memo)
+    if study.date_parse_report is not None:
+        print(study.date_parse_report)
+    print(f"{sum(study.rows_filtered_early.values())} row(s) filtered before"
+          f" joins: "
+          + ", ".join(f"{name} {rows}"
+                      for name, rows in study.rows_filtered_early.items()
+                      if rows))
+    if study.allocation_report is not None:
+        study.allocation_report.stop()
+        print(study.allocation_report)
+    if study.raw_domain_reader.memory_saved:
+        print(study.raw_domain_reader.memory_report())
+
+    if settings.should_update_datamart:
+        print("Updating datamart.")
+        sys.stdout.flush()  # don't mix output with subprocess
+        sdw4_mapping.cmr_loader(
+            folder=outf,
+            study_ref=settings.study_ref)
+
+    processed_folder = os.path.join(
+        study.raw_input_folder,
+        "processed")
+    print(f"caching {outf} to {processed_folder}")
+    try:
+        shutil.rmtree(processed_folder)
+    except Exception as e:
+        print(f"while deleting old {processed_folder}: {e}")
+    shutil.copytree(outf, processed_folder)
+
+
+# the worker processes of the scheduler import this module too
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,55 @@
+import logging
 import pandas as pd
 import sdw4_mapping
 import sdw4_mapping.common.utils
 import io
 
 
-def read_data(data_path, usecols, helper=lambda x: x):
+def read_data(data_path, usecols, helper=lambda x: x, snapshot_cache=None):
     if data_path is not None:
         try:
-            df = pd.read_csv(helper(data_path), 
-                        usecols = usecols,
-                        converters =
-                            sdw4_mapping.common.utils.StringConverter())
-
-        except Exception as e:
-            if isinstance(e, FileNotFoundError):
-                logging.error(f"Wrong data path: {data_path}")
-                df = None
+            def read():
+                source = helper(data_path)
+                try:
+                    return sdw4_mapping.common.utils.read_csv_strings(
+                                source,
+                                usecols = usecols)
+                finally:
+                    # close the views opened by the helper
+                    if source is not data_path and hasattr(source, "close"):
+                        source.close()
+
+            if snapshot_cache is not None and isinstance(data_path, str):
+                df = snapshot_cache.read(data_path, reader=read,
+                                         options=usecols)
+            else:
+                df = read()
+
+        except FileNotFoundError:
+            logging.error(f"Wrong data path: {data_path}")
+            df = None
     else:
         df = None
     return df
 
 
-def eof_line_helper(data_path):
-    if pd.core.dtypes.inference.is_file_like(data_path):
-        # Hopefully, an io.BytesIO or similar
-        data = data_path.read()
-    elif pd.core.dtypes.inference.iterable_not_string(data_path):
-        # Hopefully, a data structure which can be read into a dataframe
-        return data_path
-    else:
-        # Hopefully, a file name
-        with open(data_path, "rb") as fh:
-            data = fh.read()
+# How much of the end of the file is read at a time while
+# looking for the "EOF" trailer.
+EOF_TAIL_BLOCK_SIZE = 4096
+
+# Returned by find_eof_truncate_size() when the data given is only
+# the tail of the file and the scan needs to look further back.
+_NEED_MORE_DATA = object()
+
+
+def find_eof_truncate_size(data, complete=True):
+    """Size to truncate data to so that the trailing "EOF" line is
+    removed, None if there is no such line.
 
+    data is bytes or str.  If complete is False, data is only the
+    tail of the file, and _NEED_MORE_DATA is returned if the answer
+    depends on what is before it.
+    """
     if isinstance(data, bytes):
         eof = b"EOF"
         eols = list(b"\r\n")
@@ -45,16 +62,108 @@ def eof_line_helper(data_path):
     eols_and_spaces = eols + spaces
 
     n = len(data) - 1
-    truncate_size = None
     while n >= 0 and data[n] in eols_and_spaces:
         n -= 1
-    if n >= 2 and data[n-2:n+1].upper() == eof:
-        n -= 3
-        while n >= 0 and data[n] in spaces:
-            n -= 1
-        if n < 0 or data[n] in eols:
-            truncate_size = n + 1
+    if n < 2:
+        return None if complete else _NEED_MORE_DATA
+    if data[n-2:n+1].upper() != eof:
+        return None
+    n -= 3
+    while n >= 0 and data[n] in spaces:
+        n -= 1
+    if n < 0:
+        return 0 if complete else _NEED_MORE_DATA
+    if data[n] in eols:
+        return n + 1
+    return None
+
+
+def _tail_eof_truncate_size(fh, start, end, block_size=EOF_TAIL_BLOCK_SIZE):
+    # Reads only the last few KB of fh (between start and end),
+    # reading further back only if the tail is all blanks.
+    size = block_size
+    while True:
+        tail_start = max(start, end - size)
+        fh.seek(tail_start)
+        tail = fh.read(end - tail_start)
+        truncate_size = find_eof_truncate_size(
+            tail, complete=(tail_start == start))
+        if truncate_size is not _NEED_MORE_DATA:
+            if truncate_size is None:
+                return None
+            return tail_start + truncate_size - start
+        size *= 2
+
+
+class BoundedReader(io.RawIOBase):
+    """Read-only view of the first size bytes of a binary file,
+    from its current position."""
+
+    def __init__(self, raw, size, close_raw=True):
+        self.raw = raw
+        self.size = size
+        self.position = 0
+        self.close_raw = close_raw
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        remaining = self.size - self.position
+        if remaining <= 0:
+            return 0
+        view = memoryview(b)[:min(len(b), remaining)]
+        n = self.raw.readinto(view) or 0
+        self.position += n
+        return n
+
+    def close(self):
+        if not self.closed and self.close_raw:
+            self.raw.close()
+        super().close()
+
+
+def eof_line_helper(data_path):
+    """Hands pandas the data without its trailing "EOF" line.
+
+    For file names and seekable binary files only the tail of the
+    file is inspected; the data itself is streamed to pandas through
+    a BoundedReader (or passed as is when there is no trailer), so it
+    is never held in memory twice.
+    """
+    if pd.core.dtypes.inference.is_file_like(data_path):
+        # Hopefully, an io.BytesIO or similar
+        if (isinstance(data_path, (io.RawIOBase, io.BufferedIOBase))
+                and data_path.seekable()):
+            start = data_path.tell()
+            end = data_path.seek(0, io.SEEK_END)
+            truncate_size = _tail_eof_truncate_size(data_path, start, end)
+            data_path.seek(start)
+            if truncate_size is None:
+                return data_path
+            return io.BufferedReader(
+                BoundedReader(data_path, truncate_size, close_raw=False))
+        data = data_path.read()
+    elif pd.core.dtypes.inference.iterable_not_string(data_path):
+        # Hopefully, a data structure which can be read into a dataframe
+        return data_path
+    else:
+        # Hopefully, a file name
+        fh = open(data_path, "rb")
+        try:
+            end = fh.seek(0, io.SEEK_END)
+            truncate_size = _tail_eof_truncate_size(fh, 0, end)
+        except Exception:
+            fh.close()
+            raise
+        if truncate_size is None:
+            fh.close()
+            return data_path
+        fh.seek(0)
+        return io.BufferedReader(BoundedReader(fh, truncate_size))
 
+    # Not seekable or text: the whole data was read
+    truncate_size = find_eof_truncate_size(data)
     if isinstance(data, bytes):
         rslt = io.BytesIO(data)
         if truncate_size is not None:
@@ -71,8 +180,8 @@ def eof_line_helper(data_path):
 
 
 print("Patching sdw4_mapping.common.utils.read_data.")
-def patched_read_data(data_path, usecols):
+def patched_read_data(data_path, usecols, snapshot_cache=None):
     return read_data(data_path, usecols,
-       helper=eof_line_helper)
+       helper=eof_line_helper, snapshot_cache=snapshot_cache)
 
 sdw4_mapping.common.utils.read_data = patched_read_data
@@ -1,30 +1,16 @@
-from sdw4_mapping.core.domain import Domain
 from lib import common
-import pandas as pd
-import numpy as np
+from lib.mapping import (DomainMapping, SexAge, CommonTransforms, Drop,
+                         ReplaceInNames, Rename, MakeTc)
 
-# drop_lst = ['projectid', 'studyid', 'Folder', 'environmentName', 'StudySiteId', 'siteid',
-#             'Site', 'instanceId', 'InstanceName', 'InstanceRepeatNumber', 'folderid',
-#             'FolderSeq', 'TargetDays', 'DataPageId', 'DataPageName',
-#             'PageRepeatNumber', 'RecordDate', 'RecordId', 'RecordPosition',
-#             'MinCreated', 'MaxUpdated', 'SaveTS', 'StudyEnvSiteNumber']
+mapping = DomainMapping(
+    name="CMR", raw="cmr",
+    read=common.raw_projection(drop=common.drop_lst),
+    steps=(ReplaceInNames((("VS_", "VS"),)),
+           SexAge(), CommonTransforms(),
+           Drop(common.drop_lst, common.cols_drop_patterns),
+           MakeTc(("CMRDATIM", "CMREDTM")),
+           Rename({"CMRDATIM": "CMRSTDTC", "CMREDTM": "CMRENDTC"})))
 
-
-def cook(study):
-    dom_raw = study.get_raw_domain("cmr")
-    dom = Domain(study, "CMR")
-    dom.data = dom_raw.data.copy()
-    dom.add_column_constant("DOMAIN", "CMR")
-    dom.drop_columns("subjectId")
-    dom.data.columns = dom.data.columns.str.replace("VS_", "VS")
-    # [dom.drop_columns(i) for i in drop_lst]
-    study.apply_sex_age(dom)
-    study.apply_common_transforms(dom)
-    dom.drop_columns(common.drop_lst)
-    dom.drop_columns(common.cols_drop(dom.data))
-    common.make_tc(dom, 'CMRDATIM')
-    common.make_tc(dom, 'CMREDTM')
-    dom.rename_columns({'CMRDATIM': 'CMRSTDTC', "CMREDTM": "CMRENDTC"})
-    dom.filter_rows(lambda r: r["RecordActive"] == '1')
-
-    return dom
+raw_domains = mapping.raw_domains
+raw_usecols = mapping.raw_usecols
+cook = mapping.compile()
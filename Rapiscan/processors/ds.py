@@ -1,8 +1,11 @@
 from sdw4_mapping.core.domain import Domain
 from lib import common
+from sdw4_mapping.transformations.conditions import equals, notnull
 import pandas as pd
 import numpy as np
 
+raw_domains = ["ds_ic", "sf", "impprep", "flu", "sae", "ds_eos", "sv", "dm"]
+
 
 def cook(study):
     parts = [
@@ -25,8 +28,8 @@ def cook(study):
 
 def cook_dsscrn(study):
     dom = Domain(study, "DS")
-    dom.data = study.get_raw_domain("ds_ic").data.copy()
-    dom.filter_rows(lambda r: r["RecordActive"] == '1')
+    dom.copy_data(study.get_raw_domain("ds_ic"))
+    dom.filter_rows(common.record_active)
     dom.add_column_constant("DOMAIN", "DS")
     dom.drop_columns("subjectId")
     study.apply_common_transforms(dom)
@@ -35,11 +38,10 @@ def cook_dsscrn(study):
     common.make_tc(dom, "DSSTDTC")
 
     # dom.filter_rows(lambda r: not pd.isnull(r["domSTDTC"]))
-    dom.filter_rows(lambda r: pd.notnull(r["DSSTDTC"]))
+    dom.filter_rows(notnull("DSSTDTC"))
     dom.add_column_constant("DSDECOD", "Screened")
 
     common.studyDUR(dom.data, "RFSTDTC", "DSSTDTC", "DSSTDY")
-    dom.data["DSSTDY"] = dom.data["DSSTDY"].apply(lambda x: x if pd.isnull(x) or int(x) != 0 else 1)
 
     dom.set_columns(["subjectId", "SITEID", "visitId", "DOMAIN",
                      "DSDECOD", "DSSTDTC", "DSSTDY", "RFSTDTC", "DateCreated", "DataPageName","DataPageId"])
@@ -49,20 +51,19 @@ def cook_dsscrn(study):
 
 def cook_rand(study):
     dom = Domain(study, "DS")
-    dom.data = study.get_raw_domain("sv").data.copy()
-    dom.filter_rows(lambda r: r["RecordActive"] == '1')
+    dom.copy_data(study.get_raw_domain("sv"))
+    dom.filter_rows(common.record_active)
     dom.add_column_constant("DOMAIN", "DS")
     dom.drop_columns("subjectId")
     dom.data = dom.data[dom.data['Folder'] == 'VCHECKIN'].copy()
     study.apply_common_transforms(dom)
 
-    dom.filter_rows(lambda r: not pd.isnull(r["S_SV_VISDAT"]))
+    dom.filter_rows(notnull("S_SV_VISDAT"))
     dom.add_column_constant("DSDECOD", "Randomised")
     dom.rename_columns({"S_SV_VISDAT": "DSSTDTC"})
     common.make_tc(dom, "DSSTDTC")
 
     common.studyDUR(dom.data, "RFSTDTC", "DSSTDTC", "DSSTDY")
-    dom.data["DSSTDY"] = dom.data["DSSTDY"].apply(lambda x: x if pd.isnull(x) or int(x) != 0 else 1)
     dom.set_columns(["subjectId", "SITEID", "visitId", "DOMAIN",
                      "DSDECOD", "DSSTDTC", "DSSTDY", "RFSTDTC", "DateCreated", "DataPageName", "DataPageId"])
     return dom
@@ -70,19 +71,18 @@ def cook_rand(study):
 
 def cook_dsscrf(study):
     dom = Domain(study, "DS")
-    dom.data = study.get_raw_domain("sf").data.copy()
-    dom.filter_rows(lambda r: r["RecordActive"] == '1')
+    dom.copy_data(study.get_raw_domain("sf"))
+    dom.filter_rows(common.record_active)
     dom.add_column_constant("DOMAIN", "DS")
     dom.drop_columns("subjectId")
     study.apply_common_transforms(dom)
 
     dom.rename_columns({"SFDAT": "DSSTDTC"})
-    dom.filter_rows(lambda r: pd.notnull(r["DSSTDTC"]))
+    dom.filter_rows(notnull("DSSTDTC"))
     dom.add_column_constant("DSDECOD", "Screen Failed")
     common.make_tc(dom, "DSSTDTC")
 
     common.studyDUR(dom.data, "RFSTDTC", "DSSTDTC", "DSSTDY")
-    dom.data["DSSTDY"] = dom.data["DSSTDY"].apply(lambda x: x if pd.isnull(x) or int(x) != 0 else 1)
 
     dom.set_columns(["subjectId", "SITEID", "visitId", "DOMAIN",
                      "DSDECOD", "DSSTDTC", "DSSTDY", "RFSTDTC", "DateCreated", "DataPageName", "DataPageId"])
@@ -92,8 +92,8 @@ def cook_dsscrf(study):
 
 def cook_dsCMRE(study):
     ds = Domain(study, "DS")
-    ds.data = study.get_raw_domain("impprep").data.copy()
-    ds.filter_rows(lambda r: r["RecordActive"] == '1')
+    ds.copy_data(study.get_raw_domain("impprep"))
+    ds.filter_rows(common.record_active)
     ds.add_column_constant("DOMAIN", "DS")
     ds.drop_columns("subjectId")
     study.apply_common_transforms(ds)
@@ -102,11 +102,10 @@ def cook_dsCMRE(study):
     common.make_tc(ds, "DSSTDTC")
 
     # ds.filter_rows(lambda r: not pd.isnull(r["DSSTDTC"]))
-    ds.filter_rows(lambda r: r["CMRSCAN"] == "Yes")
+    ds.filter_rows(equals("CMRSCAN", "Yes"))
     ds.add_column_constant("DSDECOD", "Subjects eligible for CMR exam")
 
     common.studyDUR(ds.data, "RFSTDTC", "DSSTDTC", "DSSTDY")
-    ds.data["DSSTDY"] = ds.data["DSSTDY"].apply(lambda x: x if pd.isnull(x) or int(x) != 0 else 1)
 
     ds.set_columns(["subjectId", "SITEID", "visitId", "DOMAIN",
                     "DSDECOD", "DSSTDTC", "DSSTDY", "RFSTDTC", "DateCreated", "DataPageName", "DataPageId"])
@@ -116,8 +115,8 @@ def cook_dsCMRE(study):
 
 def cook_dsCMRNE(study):
     ds = Domain(study, "DS")
-    ds.data = study.get_raw_domain("impprep").data.copy()
-    ds.filter_rows(lambda r: r["RecordActive"] == '1')
+    ds.copy_data(study.get_raw_domain("impprep"))
+    ds.filter_rows(common.record_active)
     ds.add_column_constant("DOMAIN", "DS")
     ds.drop_columns("subjectId")
     study.apply_common_transforms(ds)
@@ -125,11 +124,10 @@ def cook_dsCMRNE(study):
     common.make_tc(ds, "DSSTDTC")
 
     # ds.filter_rows(lambda r: not pd.isnull(r["DSSTDTC"]))
-    ds.filter_rows(lambda r: r["CMRSCAN"] == "No")
+    ds.filter_rows(equals("CMRSCAN", "No"))
     ds.add_column_constant("DSDECOD", "Subjects  not eligible for CMR exam")
 
     common.studyDUR(ds.data, "RFSTDTC", "DSSTDTC", "DSSTDY")
-    ds.data["DSSTDY"] = ds.data["DSSTDY"].apply(lambda x: x if pd.isnull(x) or int(x) != 0 else 1)
 
     ds.set_columns(["subjectId", "SITEID", "visitId", "DOMAIN",
                     "DSDECOD", "DSSTDTC", "DSSTDY", "RFSTDTC", "DateCreated", "DataPageName", "DataPageId"])
@@ -139,8 +137,8 @@ def cook_dsCMRNE(study):
 
 def cook_dsfw(study):
     ds = Domain(study, "DS")
-    ds.data = study.get_raw_domain("flu").data.copy()
-    ds.filter_rows(lambda r: r["RecordActive"] == '1')
+    ds.copy_data(study.get_raw_domain("flu"))
+    ds.filter_rows(common.record_active)
     ds.add_column_constant("DOMAIN", "DS")
     ds.drop_columns("subjectId")
     study.apply_common_transforms(ds)
@@ -148,11 +146,10 @@ def cook_dsfw(study):
     common.make_tc(ds, "DSSTDTC")
 
     # ds.filter_rows(lambda r: not pd.isnull(r["DSSTDTC"]))
-    ds.filter_rows(lambda r: r["FLUDIED"] == "Yes")
+    ds.filter_rows(equals("FLUDIED", "Yes"))
     ds.add_column_constant("DSDECOD", "Death")
 
     common.studyDUR(ds.data, "RFSTDTC", "DSSTDTC", "DSSTDY")
-    ds.data["DSSTDY"] = ds.data["DSSTDY"].apply(lambda x: x if pd.isnull(x) or int(x) != 0 else 1)
 
     ds.set_columns(["subjectId", "SITEID", "visitId", "DOMAIN",
                     "DSDECOD", "DSSTDTC", "DSSTDY", "RFSTDTC", "DateCreated", "DataPageName", "DataPageId"])
@@ -162,8 +159,8 @@ def cook_dsfw(study):
 
 def cook_dsAEDTH(study):
     ds = Domain(study, "DS")
-    ds.data = study.get_raw_domain("sae").data.copy()
-    ds.filter_rows(lambda r: r["RecordActive"] == '1')
+    ds.copy_data(study.get_raw_domain("sae"))
+    ds.filter_rows(common.record_active)
     ds.add_column_constant("DOMAIN", "DS")
     ds.drop_columns("subjectId")
     study.apply_common_transforms(ds)
@@ -171,11 +168,10 @@ def cook_dsAEDTH(study):
     common.make_tc(ds, "DSSTDTC")
 
     # ds.filter_rows(lambda r: not pd.isnull(r["DSSTDTC"]))
-    ds.filter_rows(lambda r: r["S_AE_AESDTH"] == "Yes")
+    ds.filter_rows(equals("S_AE_AESDTH", "Yes"))
     ds.add_column_constant("DSDECOD", "Death")
 
     common.studyDUR(ds.data, "RFSTDTC", "DSSTDTC", "DSSTDY")
-    ds.data["DSSTDY"] = ds.data["DSSTDY"].apply(lambda x: x if pd.isnull(x) or int(x) != 0 else 1)
 
     ds.set_columns(["subjectId", "SITEID", "visitId", "DOMAIN",
                     "DSDECOD", "DSSTDTC", "DSSTDY", "RFSTDTC", "DateCreated", "DataPageName", "DataPageId"])
@@ -185,8 +181,8 @@ def cook_dsAEDTH(study):
 
 def cook_dsSTYC(study):
     ds = Domain(study, "DS")
-    ds.data = study.get_raw_domain("ds_eos").data.copy()
-    ds.filter_rows(lambda r: r["RecordActive"] == '1')
+    ds.copy_data(study.get_raw_domain("ds_eos"))
+    ds.filter_rows(common.record_active)
     ds.add_column_constant("DOMAIN", "DS")
     ds.drop_columns("subjectId")
     ds.data.columns = ds.data.columns.str.replace("DS_", "DS")
@@ -194,11 +190,10 @@ def cook_dsSTYC(study):
     ds.rename_columns({"DSEOSSTDAT": "DSSTDTC", "DSEOSDECOD": "DSSCAT"})
     common.make_tc(ds, "DSSTDTC")
 
-    ds.filter_rows(lambda r: r["DSEOSNY"] == "Yes")
+    ds.filter_rows(equals("DSEOSNY", "Yes"))
     ds.add_column_constant("DSDECOD", "Study Completed")
 
     common.studyDUR(ds.data, "RFSTDTC", "DSSTDTC", "DSSTDY")
-    ds.data["DSSTDY"] = ds.data["DSSTDY"].apply(lambda x: x if pd.isnull(x) or int(x) != 0 else 1)
     ds.rename_columns({})
     ds.set_columns(["subjectId", "SITEID", "visitId", "DOMAIN",
                     "DSSCAT", "DSDECOD", "RFSTDTC",
@@ -210,8 +205,8 @@ def cook_dsSTYC(study):
 
 def cook_dsSTYD(study):
     ds = Domain(study, "DS")
-    ds.data = study.get_raw_domain("ds_eos").data.copy()
-    ds.filter_rows(lambda r: r["RecordActive"] == '1')
+    ds.copy_data(study.get_raw_domain("ds_eos"))
+    ds.filter_rows(common.record_active)
     ds.add_column_constant("DOMAIN", "DS")
     ds.drop_columns("subjectId")
     study.apply_common_transforms(ds)
@@ -220,11 +215,10 @@ def cook_dsSTYD(study):
 
     ds.rename_columns({"DS_EOSDECOD": "DSSCAT"})
 
-    ds.filter_rows(lambda r: r["DS_EOSNY"] == "No")
+    ds.filter_rows(equals("DS_EOSNY", "No"))
     ds.add_column_constant("DSDECOD", "Study Discontinued")
 
     common.studyDUR(ds.data, "RFSTDTC", "DSSTDTC", "DSSTDY")
-    ds.data["DSSTDY"] = ds.data["DSSTDY"].apply(lambda x: x if pd.isnull(x) or int(x) != 0 else 1)
 
     ds.set_columns(["subjectId", "SITEID", "visitId", "DOMAIN",
                     "DSSCAT", "DSDECOD", "RFSTDTC", "DateCreated", "DataPageName", "DataPageId"])
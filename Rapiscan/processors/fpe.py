@@ -1,26 +1,23 @@
-from sdw4_mapping.core.domain import Domain
 from lib import common
-import pandas as pd
-import numpy as np
+from lib.mapping import (DomainMapping, SexAge, CommonTransforms, Drop,
+                         Rename, MakeTc)
+
 drop_lst=['projectid', 'studyid', 'Folder','environmentName', 'StudySiteId', 'siteid',
             'Site','instanceId','InstanceName', 'InstanceRepeatNumber', 'folderid',
             'FolderSeq', 'TargetDays', 'DataPageId', 'DataPageName',
             'PageRepeatNumber', 'RecordDate', 'RecordId', 'RecordPosition',
             'MinCreated', 'MaxUpdated', 'SaveTS', 'StudyEnvSiteNumber' ]
-def cook(study):
-    dom_raw = study.get_raw_domain("fpe")
-    dom = Domain(study, "FPE")
-    dom.data = dom_raw.data.copy()
-    dom.add_column_constant("DOMAIN", "FPE")
-    dom.drop_columns("subjectId")
-    # dom.data.columns = dom.data.columns.str.replace("FPE_", "FPE")
-    [dom.drop_columns(i) for i in drop_lst]
-    study.apply_sex_age(dom)
-    study.apply_common_transforms(dom)
-    # dom.drop_columns(common.drop_lst)
-    # dom.drop_columns(common.cols_drop(dom.data))
-    common.make_tc(dom, 'FPE_EDAT')
-    dom.rename_columns({"FPE_EDAT": "FPEESTDTC"})
-    dom.data = dom.data.loc[:, ~dom.data.columns.str.contains('_RAW$|_STD$|_INT$|_YYYY$|_MM$|_DD$|_STD')]
-    dom.filter_rows(lambda r: r["RecordActive"] == '1')
-    return dom
+drop_patterns = ('_RAW$', '_STD$', '_INT$', '_YYYY$', '_MM$', '_DD$', '_STD')
+
+mapping = DomainMapping(
+    name="FPE", raw="fpe",
+    read=common.raw_projection(drop=drop_lst, drop_patterns=drop_patterns),
+    steps=(Drop(drop_lst),
+           SexAge(), CommonTransforms(),
+           MakeTc(("FPE_EDAT",)),
+           Rename({"FPE_EDAT": "FPEESTDTC"}),
+           Drop(patterns=drop_patterns)))
+
+raw_domains = mapping.raw_domains
+raw_usecols = mapping.raw_usecols
+cook = mapping.compile()
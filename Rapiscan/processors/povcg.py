@@ -1,20 +1,14 @@
-from sdw4_mapping.core.domain import Domain
 from lib import common
-import pandas as pd
-import numpy as np
+from lib.mapping import (DomainMapping, SexAge, CommonTransforms, Drop,
+                         ReplaceInNames)
 
+mapping = DomainMapping(
+    name="POVCGV", raw="povcgvit",
+    read=common.raw_projection(drop=common.drop_lst),
+    steps=(ReplaceInNames((("VS_", "VS"),)),
+           SexAge(), CommonTransforms(),
+           Drop(common.drop_lst, common.cols_drop_patterns)))
 
-def cook(study):
-    dom_raw = study.get_raw_domain("povcgvit")
-    dom = Domain(study, "POVCGV")
-    dom.data = dom_raw.data.copy()
-    dom.add_column_constant("DOMAIN", "POVCGV")
-    dom.drop_columns("subjectId")
-    dom.data.columns = dom.data.columns.str.replace("VS_", "VS")
-    # [dom.drop_columns(i) for i in drop_lst]
-    study.apply_sex_age(dom)
-    study.apply_common_transforms(dom)
-    dom.drop_columns(common.drop_lst)
-    dom.drop_columns(common.cols_drop(dom.data))
-    dom.filter_rows(lambda r: r["RecordActive"] == '1')
-    return dom
+raw_domains = mapping.raw_domains
+raw_usecols = mapping.raw_usecols
+cook = mapping.compile()
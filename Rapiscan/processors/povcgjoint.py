@@ -1,7 +1,23 @@
 from sdw4_mapping.core.domain import Domain
 from lib import common
+from lib.mapping import (DomainMapping, CommonTransforms, Drop,
+                         ReplaceInNames)
 import pandas as pd
-import numpy as np
+
+raw_domains = ["povcgvit", "poimpvs", "pevcgvit", "vs", "dm", "sv"]
+
+part_steps = (CommonTransforms(),
+              Drop(common.drop_lst, common.cols_drop_patterns),
+              ReplaceInNames((("S_VS_", ""), ("VS_", "VS"))))
+
+cook_POVCGVIT = DomainMapping(name="POVCGVIT", raw="povcgvit",
+                              domain_value="povcgvit",
+                              steps=part_steps).compile()
+cook_POIMPVS = DomainMapping(name="POIMPVS", raw="poimpvs",
+                             steps=part_steps).compile()
+cook_PEVCGVIT = DomainMapping(name="PEVCGVIT", raw="pevcgvit",
+                              steps=part_steps).compile()
+cook_VS = DomainMapping(name="VS", raw="vs", steps=part_steps).compile()
 
 
 def cook(study):
@@ -15,66 +31,8 @@ def cook(study):
 
     dom = Domain(study, "POVS")
     dom.data = pd.concat([p.data for p in parts], ignore_index=True)
+    dom.rows_filtered_early = sum(p.rows_filtered_early for p in parts)
     # dom.data.columns = dom.data.columns.str.replace("S_VS_", "")
     # dom.data.columns = dom.data.columns.str.replace("VS_", "VS")
 
     return dom
-
-
-def cook_POVCGVIT(study):
-    dom = Domain(study, "POVCGVIT")
-    dom.data = study.get_raw_domain("povcgvit").data.copy()
-    dom.add_column_constant("DOMAIN", "povcgvit")
-    dom.drop_columns("subjectId")
-    study.apply_common_transforms(dom)
-    dom.drop_columns(common.drop_lst)
-    dom.drop_columns(common.cols_drop(dom.data))
-    dom.data.columns = dom.data.columns.str.replace("S_VS_", "")
-    dom.data.columns = dom.data.columns.str.replace("VS_", "VS")
-    dom.filter_rows(lambda r: r["RecordActive"] == '1')
-    return dom
-
-
-def cook_POIMPVS(study):
-    dom = Domain(study, "POIMPVS")
-    dom.data = study.get_raw_domain("poimpvs").data.copy()
-    dom.add_column_constant("DOMAIN", "POIMPVS")
-    dom.drop_columns("subjectId")
-    study.apply_common_transforms(dom)
-    dom.drop_columns(common.drop_lst)
-    dom.drop_columns(common.cols_drop(dom.data))
-    dom.data.columns = dom.data.columns.str.replace("S_VS_", "")
-    dom.data.columns = dom.data.columns.str.replace("VS_", "VS")
-    dom.filter_rows(lambda r: r["RecordActive"] == '1')
-    return dom
-
-
-def cook_PEVCGVIT(study):
-    dom = Domain(study, "PEVCGVIT")
-    dom.data = study.get_raw_domain("pevcgvit").data.copy()
-    dom.add_column_constant("DOMAIN", "PEVCGVIT")
-    dom.drop_columns("subjectId")
-    study.apply_common_transforms(dom)
-    dom.drop_columns(common.drop_lst)
-    dom.drop_columns(common.cols_drop(dom.data))
-    dom.data.columns = dom.data.columns.str.replace("S_VS_", "")
-    dom.data.columns = dom.data.columns.str.replace("VS_", "VS")
-    dom.filter_rows(lambda r: r["RecordActive"] == '1')
-    return dom
-
-
-def cook_VS(study):
-    dom = Domain(study, "VS")
-    dom.data = study.get_raw_domain("vs").data.copy()
-    dom.add_column_constant("DOMAIN", "VS")
-    dom.drop_columns("subjectId")
-    study.apply_common_transforms(dom)
-    dom.drop_columns(common.drop_lst)
-    dom.drop_columns(common.cols_drop(dom.data))
-    dom.data.columns = dom.data.columns.str.replace("S_VS_", "")
-    dom.data.columns = dom.data.columns.str.replace("VS_", "VS")
-    dom.filter_rows(lambda r: r["RecordActive"] == '1')
-    return dom
-
-
-
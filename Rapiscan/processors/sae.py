@@ -1,32 +1,16 @@
-from sdw4_mapping.core.domain import Domain
 from lib import common
-import pandas as pd
-import numpy as np
+from lib.mapping import DomainMapping, SexAge, CommonTransforms, Drop, MakeTc
 
-# drop_lst=['projectid', 'studyid', 'Folder','environmentName', 'StudySiteId', 'siteid',
-#         'Site','instanceId','InstanceName', 'InstanceRepeatNumber', 'folderid',
-#         'FolderSeq', 'TargetDays', 'DataPageId', 'DataPageName',
-#         'PageRepeatNumber', 'RecordDate', 'RecordId', 'RecordPosition',
-#         'MinCreated', 'MaxUpdated', 'SaveTS', 'StudyEnvSiteNumber' ]
+mapping = DomainMapping(
+    name="SAE", raw="sae",
+    read=common.raw_projection(
+        drop=common.drop_lst, drop_patterns=common.cols_drop_patterns),
+    steps=(SexAge(), CommonTransforms(),
+           Drop(common.drop_lst, common.cols_drop_patterns),
+           MakeTc(("S_AE_AESTDAT", "I_SAEAWDT", "I_SAEPERMDT",
+                   "I_SAEIPERMDT", "I_SAESICREDT", "I_SAESIUPDT",
+                   "DTHDAT"))))
 
-def cook(study):
-        dom_raw = study.get_raw_domain("sae")
-        dom = Domain(study, "SAE")
-        dom.data = dom_raw.data.copy()
-        dom.add_column_constant("DOMAIN", "SAE")
-        dom.drop_columns("subjectId")
-
-        # [dom.drop_columns(i) for i in drop_lst]
-        study.apply_sex_age(dom)
-        study.apply_common_transforms(dom)
-        dom.drop_columns(common.drop_lst)
-        dom.drop_columns(common.cols_drop(dom.data))
-        common.make_tc(dom, 'S_AE_AESTDAT')
-        common.make_tc(dom, 'I_SAEAWDT')
-        common.make_tc(dom, 'I_SAEPERMDT')
-        common.make_tc(dom, 'I_SAEIPERMDT')
-        common.make_tc(dom, 'I_SAESICREDT')
-        common.make_tc(dom, 'I_SAESIUPDT')
-        common.make_tc(dom, 'DTHDAT')
-        dom.filter_rows(lambda r: r["RecordActive"] == '1')
-        return dom
+raw_domains = mapping.raw_domains
+raw_usecols = mapping.raw_usecols
+cook = mapping.compile()
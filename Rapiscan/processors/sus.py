@@ -1,27 +1,16 @@
-from sdw4_mapping.core.domain import Domain
 from lib import common
-import pandas as pd
-import numpy as np
+from lib.mapping import (DomainMapping, SexAge, CommonTransforms, Drop,
+                         ReplaceInNames, Rename, MakeTc)
 
-# drop_lst=['projectid', 'studyid', 'Folder','environmentName', 'StudySiteId', 'siteid',
-#             'Site','instanceId','InstanceName', 'InstanceRepeatNumber', 'folderid',
-#             'FolderSeq', 'TargetDays', 'DataPageId', 'DataPageName',
-#             'PageRepeatNumber', 'RecordDate', 'RecordId', 'RecordPosition',
-#             'MinCreated', 'MaxUpdated', 'SaveTS', 'StudyEnvSiteNumber' ]
+mapping = DomainMapping(
+    name="SUS", raw="sus",
+    read=common.raw_projection(drop=common.drop_lst),
+    steps=(ReplaceInNames((("SU_", "SU"),)),
+           SexAge(), CommonTransforms(),
+           Drop(common.drop_lst, common.cols_drop_patterns),
+           MakeTc(("SUSMDAT",)),
+           Rename({"SUSMDAT": "SUSMSTDTC"})))
 
-def cook(study):
-    dom_raw = study.get_raw_domain("sus")
-    dom = Domain(study, "SUS")
-    dom.data = dom_raw.data.copy()
-    dom.add_column_constant("DOMAIN", "SUS")
-    dom.drop_columns("subjectId")
-    dom.data.columns = dom.data.columns.str.replace("SU_", "SU")
-    # [dom.drop_columns(i) for i in drop_lst]
-    study.apply_sex_age(dom)
-    study.apply_common_transforms(dom)
-    dom.drop_columns(common.drop_lst)
-    dom.drop_columns(common.cols_drop(dom.data))
-    common.make_tc(dom, 'SUSMDAT')
-    dom.rename_columns({'SUSMDAT': 'SUSMSTDTC'})
-    dom.filter_rows(lambda r: r["RecordActive"] == '1')
-    return dom
+raw_domains = mapping.raw_domains
+raw_usecols = mapping.raw_usecols
+cook = mapping.compile()
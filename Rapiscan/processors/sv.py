@@ -1,27 +1,18 @@
-from sdw4_mapping.core.domain import Domain
 from lib import common
-import pandas as pd
-import numpy as np
+from lib.mapping import (DomainMapping, SexAge, CommonTransforms, Drop,
+                         Rename, MakeTc, StudyDur)
 
-# drop_lst=['projectid', 'studyid', 'Folder','environmentName', 'StudySiteId', 'siteid',
-#         'Site','instanceId','InstanceName', 'InstanceRepeatNumber', 'folderid',
-#         'FolderSeq', 'TargetDays', 'DataPageId', 'DataPageName',
-#         'PageRepeatNumber', 'RecordDate', 'RecordId', 'RecordPosition',
-#         'MinCreated', 'MaxUpdated', 'SaveTS', 'StudyEnvSiteNumber' ]
+mapping = DomainMapping(
+    name="SV", raw="sv",
+    read=common.raw_projection(
+        drop=common.drop_lst, drop_patterns=common.cols_drop_patterns),
+    reference=("dm",),
+    steps=(SexAge(), CommonTransforms(),
+           Drop(common.drop_lst, common.cols_drop_patterns),
+           Rename({'S_SV_VISDAT': 'VISSTDTC', 'DER_VISDAT': 'DERSTDTC'}),
+           MakeTc(("VISSTDTC",)),
+           StudyDur((("RFSTDTC", "VISSTDTC", "SVSTDY"),))))
 
-def cook(study):
-    dom_raw = study.get_raw_domain("sv")
-    dom = Domain(study, "SV")
-    dom.data = dom_raw.data.copy()
-    dom.add_column_constant("DOMAIN", "SV")
-    dom.drop_columns("subjectId")
-    # [dom.drop_columns(i) for i in drop_lst]
-    study.apply_sex_age(dom)
-    study.apply_common_transforms(dom)
-    dom.drop_columns(common.drop_lst)
-    dom.drop_columns(common.cols_drop(dom.data))
-    dom.rename_columns({'S_SV_VISDAT': 'VISSTDTC', 'DER_VISDAT': 'DERSTDTC'})
-    common.make_tc(dom, 'VISSTDTC')
-    common.studyDUR(dom.data, "RFSTDTC", "VISSTDTC", "SVSTDY")
-    dom.filter_rows(lambda r: r["RecordActive"] == '1')
-    return dom
+raw_domains = mapping.raw_domains
+raw_usecols = mapping.raw_usecols
+cook = mapping.compile()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+# Cooks the domains of a study, one after the other or on a process pool.
+#
+# The cooks and the raw domains they read (the processors' raw_domains)
+# form a graph. The reference domains (dm, sv), read by nearly every
+# cook, are loaded once in the main process, with the subject reference
+# and the demographics built from them, and shipped to each worker
+# process once (inherited on fork, pickled once per worker on spawn).
+# The other raw domains link the cooks reading the same file: the cooks
+# of one connected group run one after the other in one task, so each
+# raw domain is read by one worker only. The groups run concurrently,
+# the ones with the biggest input files first.
+#
+# Each cook writes its own CSV (named after its domain), so the output
+# doesn't depend on the order the tasks end in; the counters of the
+# workers (rows filtered early, date parse report, ...) are merged into
+# the study in cooking order. The workers only read the date parse memo,
+# the dates they parse are written to it by the main process.
+
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+from sdw4_mapping.common.date_memo import DateParseMemo
+import sdw4_mapping.transformations.date_conversions as sdw_dt
+
+# raw domains loaded once and shipped to the workers
+reference_domains = ("dm", "sv")
+
+# the study of the worker process, see _start_worker
+_study = None
+# convert_to_dt cache hits and misses of the worker already reported
+_date_parse_cache_seen = {"hits": 0, "misses": 0}
+
+
+def cook_groups(processors, reference=reference_domains):
+    # processors: name -> processor, in cooking order.
+    # Returns the names of the cooks linked by the raw domains they read
+    # (reference domains aside), one list per group, in cooking order.
+    order = list(processors)
+    groups = {name: [name] for name in order}
+    first_reader = {}
+    for name in order:
+        for raw in raw_domains(processors[name], reference):
+            first = first_reader.setdefault(raw, name)
+            if groups[first] is not groups[name]:
+                merged = groups[first] + groups[name]
+                for cook in merged:
+                    groups[cook] = merged
+    # each group once, when its first cook comes
+    return [sorted(groups[name], key=order.index) for name in order
+            if min(groups[name], key=order.index) == name]
+
+
+def raw_domains(processor, reference=reference_domains):
+    # the raw domains the processor reads, reference domains aside
+    return [raw for raw in getattr(processor, "raw_domains", [])
+            if raw not in reference]
+
+
+def input_size(study, raws):
+    # bytes of the raw domain files
+    size = 0
+    for raw in raws:
+        path = os.path.join(study.input_folder, f"{raw}.csv")
+        if os.path.exists(path):
+            size += os.path.getsize(path)
+    return size
+
+
+def cook_all(study, processors, output_folder, jobs=1, make_study=None):
+    # Cooks the processors (name -> processor, in cooking order) and
+    # writes their domains to output_folder. jobs <= 1 cooks them in
+    # this process, in order; else on a pool of jobs processes, each
+    # with its own study made by make_study(**study.options) (default:
+    # the class of study), which only reads the date parse memo: the
+    # new parsed dates are written by this process.
+    if jobs <= 1:
+        study.prefetch_raw_domains()
+        for name in processors:
+            study.cook(name).to_csv(output_folder)
+        return
+
+    groups = cook_groups(processors)
+    # group -> the raw domains it reads, reference domains aside
+    raws = {tuple(group): list(dict.fromkeys(
+        raw for name in group for raw in raw_domains(processors[name])))
+        for group in groups}
+    reference = study.reference_data(reference_domains)
+    memo = study.date_parse_memo
+    if memo is not None:
+        # written before the workers open it
+        memo.flush()
+    with ProcessPoolExecutor(
+            max_workers=jobs, initializer=_start_worker,
+            initargs=(make_study or type(study), study.options, reference,
+                      memo.path if memo is not None else None)) as pool:
+        futures = {}
+        for group in sorted(raws, key=lambda group: -input_size(
+                study, raws[group])):
+            futures[group] = pool.submit(
+                _cook_group, group, raws[group], output_folder)
+        # the counters in cooking order, whatever the order of the ends
+        for group in raws:
+            merge_stats(study, futures[group].result())
+    study.rows_filtered_early = {
+        name: study.rows_filtered_early[name] for name in processors
+        if name in study.rows_filtered_early}
+
+
+def _start_worker(make_study, options, reference, date_parse_memo):
+    global _study
+    _study = make_study(**dict(options, date_parse_memo=None))
+    if date_parse_memo is not None:
+        _study.date_parse_memo = DateParseMemo(
+            date_parse_memo, sdw_dt.date_parse_fingerprint(), read_only=True)
+    # not the memo of the main process (inherited on fork)
+    sdw_dt.set_date_parse_memo(_study.date_parse_memo)
+    _study.use_reference_data(reference)
+    info = sdw_dt.date_parse_cache_stats()
+    _date_parse_cache_seen.update(hits=info["hits"], misses=info["misses"])
+
+
+def _cook_group(group, raws, output_folder):
+    # runs in the worker: cooks the group in order, returns its counters
+    _study.raw_domain_reader.prefetch(
+        [(name, usecols) for name, usecols in _study.raw_domain_reads()
+         if name in raws],
+        max_workers=_study.prefetch_workers)
+    for name in group:
+        _study.cook(name).to_csv(output_folder)
+        logging.info(f"Cooked {name} in process {os.getpid()}")
+    return take_stats(_study)
+
+
+def take_stats(study):
+    # the counters of study since the last call, reset
+    reader = study.raw_domain_reader
+    with reader.lock:
+        stats = {"rows_filtered_early": study.rows_filtered_early,
+                 "memory_saved": reader.memory_saved}
+        reader.memory_saved = {}
+    study.rows_filtered_early = {}
+    if study.date_parse_report is not None:
+        stats["date_parse_report"] = study.date_parse_report.entries
+        study.date_parse_report.entries = {}
+    if study.allocation_report is not None:
+        stats["allocation_report"] = study.allocation_report.entries
+        study.allocation_report.entries = {}
+    if reader.snapshot_cache is not None:
+        stats["snapshot_cache"] = _take_counters(
+            reader.snapshot_cache, ("hits", "misses", "invalidations"))
+    if study.date_parse_memo is not None:
+        stats["date_parse_results"] = study.date_parse_memo.take_results()
+        stats["date_parse_memo"] = _take_counters(
+            study.date_parse_memo, ("hits", "misses", "stores"))
+    info = sdw_dt.date_parse_cache_stats()
+    stats["date_parse_cache"] = {
+        counter: info[counter] - _date_parse_cache_seen[counter]
+        for counter in ("hits", "misses")}
+    _date_parse_cache_seen.update(hits=info["hits"], misses=info["misses"])
+    return stats
+
+
+def _take_counters(counted, counters):
+    values = {counter: getattr(counted, counter) for counter in counters}
+    for counter in counters:
+        setattr(counted, counter, 0)
+    return values
+
+
+def merge_stats(study, stats):
+    # adds the counters of take_stats (of a worker) to study
+    reader = study.raw_domain_reader
+    study.rows_filtered_early.update(stats["rows_filtered_early"])
+    for name, saved in stats["memory_saved"].items():
+        reader.memory_saved[name] = reader.memory_saved.get(name, 0) + saved
+    if study.date_parse_report is not None:
+        for key, counters in stats.get("date_parse_report", {}).items():
+            entry = study.date_parse_report.entry(*key)
+            for counter, value in counters.items():
+                entry[counter] += value
+    if study.allocation_report is not None:
+        for step, counters in stats.get("allocation_report", {}).items():
+            entry = study.allocation_report.entries.setdefault(
+                step, {"peak": 0, "kept": 0})
+            entry["peak"] = max(entry["peak"], counters["peak"])
+            entry["kept"] += counters["kept"]
+    for counted, name in ((reader.snapshot_cache, "snapshot_cache"),
+                          (study.date_parse_memo, "date_parse_memo")):
+        if counted is not None:
+            for counter, value in stats.get(name, {}).items():
+                setattr(counted, counter, getattr(counted, counter) + value)
+    for counter, value in stats["date_parse_cache"].items():
+        study.worker_date_parse_cache[counter] += value
+    if study.date_parse_memo is not None:
+        study.date_parse_memo.add_results(stats.get("date_parse_results", {}))
+
+
+def date_parse_cache_stats(study):
+    # sdw_dt.date_parse_cache_stats with the hits and misses of the
+    # workers which cooked for study
+    info = sdw_dt.date_parse_cache_stats()
+    hits = info["hits"] + study.worker_date_parse_cache["hits"]
+    misses = info["misses"] + study.worker_date_parse_cache["misses"]
+    calls = hits + misses
+    return dict(info, hits=hits, misses=misses,
+                hit_rate=hits / calls if calls else 0.0)
@@ -1,10 +1,15 @@
 import os
 import pathlib
 import json
+import multiprocessing
 import datetime
 import platform
 import production_settings
 
+# output folder of the main process, inherited by the worker processes of
+# the scheduler before this module sets it again (see get_output_folder)
+_main_output_folder = os.environ.get('SDW4_DATA_OUTPUT_DIR')
+
 # default for development on Mohan's laptop
 # _base intended to be private to this file
 _base = r"C:\Users\hkumar3\work\XMR\Rapiscan_Prod"
@@ -12,6 +17,48 @@ input_folder = os.path.join(_base, "input")
 output_folder = os.path.join(_base, "output")
 study_ref = None
 should_update_datamart = False
+# keep a snapshot beside each preprocessed CSV so unchanged exports
+# are not parsed again on the next run
+use_snapshot_cache = True
+# threads reading the raw domains in the background (0 reads them
+# one by one when first needed)
+prefetch_workers = 4
+# raw domain columns stored as pandas categoricals (they repeat a
+# handful of values on every row); max_categories also encodes any
+# other column with at most that many distinct values (None: off)
+categorical_columns = ["RecordActive", "Folder", "FolderName",
+                       "SiteNumber", "InstanceName", "DataPageName",
+                       "project"]
+max_categories = None
+# bytes the cached raw domains may use (e.g. 4 * 2**30), the least
+# recently used ones are evicted above it (None: keep everything);
+# evicted domains are spilled to cache_spill_folder when set (a fast
+# local disk), else read again when needed
+cache_memory_budget = None
+cache_spill_folder = None
+# drop each raw domain once the last processor reading it is cooked
+release_raw_domains = True
+# sqlite file keeping the parsed date strings from one run to the next
+# (e.g. os.path.join(_base, "date_parse_memo.sqlite"); None: off), it
+# is emptied when dateparser or the parsing settings change
+date_parse_memo = None
+# print rows, parse paths (vectorized, dateparser, ...) and time of the
+# date conversions per domain and column at the end of the run
+date_parse_report = True
+# cooked domains share the column buffers of the cached raw domains
+# instead of copying them, until they replace a column
+copy_on_write = True
+# print the memory allocated by each cook (peak and kept) at the end of
+# the run, measured with tracemalloc (slows the run down)
+allocation_report = False
+# cooks record the column operations, filters, joins and date conversions
+# of their domains and run them at once, optimized (merged projections,
+# filters before joins, constant columns added last)
+lazy_domains = False
+# processes cooking the domains at once (main.py --jobs), the cooks
+# reading the same raw domains run in the same process (1: one after the
+# other in the main process)
+cook_jobs = 1
 
 os.environ['SDW4_DATA_INPUT_DIR'] = input_folder
 os.environ['SDW4_DATA_OUTPUT_DIR'] = output_folder
@@ -35,6 +82,11 @@ print(f"study_name={study_name}")
 
 
 def get_output_folder(base_path=None, now=None):
+    # the worker processes of the scheduler import this module again
+    # when spawned: they write to the folder of the main process instead
+    # of making a new one
+    if multiprocessing.parent_process() is not None:
+        return _main_output_folder
     base_path = base_path
     now = datetime.datetime.now()
     # implements 'basepath/YYYY/mm/YYYY-mm-dd-HHMMSS-millis'
@@ -0,0 +1,21 @@
+import pandas as pd
+from lib import common
+
+
+def test_study_dur():
+    df = pd.DataFrame({
+        "START": ["2020-01-02", "2020-01-02", None, "2020-01-05"],
+        "END": ["2020-01-02", "2020-01-01", "2020-01-03", "2020-01-09"]})
+    common.studyDUR(df, "START", "END", "DUR")
+    assert df["DUR"].tolist() == [1, -1, pd.NA, 5]
+    assert str(df["DUR"].dtype) == "Int64"
+
+
+def test_study_dur_keeps_values_of_missing_dates():
+    # as the former .loc assignments: only the rows with both dates change
+    df = pd.DataFrame({
+        "START": ["2020-01-02", None, None],
+        "END": ["2020-01-04", "2020-01-03", None],
+        "DUR": [7.0, 4.0, None]})
+    common.studyDUR(df, "START", "END", "DUR")
+    assert df["DUR"].tolist() == [3, 4, pd.NA]
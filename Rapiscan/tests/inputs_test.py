@@ -0,0 +1,55 @@
+import os
+
+import pandas as pd
+from sdw4_mapping import Study
+from inputs import InputReader
+
+NAMES = ["ae", "cm", "lb", "vs"]
+
+
+def write_domains(folder, rows=200):
+    # domains of the same size
+    for name in NAMES:
+        pd.DataFrame({
+            "Subject": [str(i) for i in range(rows)],
+            "VALUE": [f"{name}{i}" for i in range(rows)],
+        }).to_csv(os.path.join(folder, f"{name}.csv"), index=False)
+
+
+def held_size(reader):
+    # bytes of the cached domains and of the finished reads ahead
+    domains = list(reader.cache.values()) + [
+        future.result() for future in reader.pending.values()
+        if future.done()]
+    return sum(reader.domain_size(domain) for domain in domains)
+
+
+def test_prefetch_within_memory_budget(tmp_path):
+    write_domains(str(tmp_path))
+    study = Study(id="test_study", input_folder=str(tmp_path))
+    size = InputReader.domain_size(InputReader(study).read("ae"))
+    reader = InputReader(study, memory_budget=size * 3 // 2)
+    try:
+        reader.prefetch(NAMES, max_workers=1)
+        for name in NAMES:
+            for future in list(reader.pending.values()):
+                future.result()
+            # the budget, and the domain just used or read ahead over it
+            assert held_size(reader) <= reader.memory_budget + size
+            assert reader.get(name).data["VALUE"][0] == f"{name}0"
+        assert not reader.pending and not reader.queued
+        assert list(reader.cache) == ["vs"]
+    finally:
+        reader.shutdown()
+
+
+def test_prefetch_without_memory_budget(tmp_path):
+    write_domains(str(tmp_path))
+    reader = InputReader(Study(id="test_study", input_folder=str(tmp_path)))
+    try:
+        reader.prefetch(NAMES, max_workers=1)
+        assert list(reader.pending) == NAMES and not reader.queued
+        assert [reader.get(name).data["VALUE"][0] for name in NAMES] == [
+            f"{name}0" for name in NAMES]
+    finally:
+        reader.shutdown()
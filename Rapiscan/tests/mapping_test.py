@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+from sdw4_mapping.core.domain import Domain, set_lazy
+from lib import common
+from lib.mapping import (DomainMapping, Drop, MakeTc, Rename, SexAge,
+                         StudyDur, merge_steps)
+import processors.ae
+from tests.study import FrameStudy, raw_domains
+
+
+def cook_ae_imperative(study):
+    # processors/ae.py before it was a DomainMapping
+    dom_raw = study.get_raw_domain(
+        "ae", usecols=common.raw_projection(drop=processors.ae.drop_lst))
+    dom = Domain(study, "AE")
+    dom.copy_data(dom_raw)
+    dom.defer_filter(common.record_active)
+    dom.add_column_constant("DOMAIN", "AE")
+    dom.drop_columns("subjectId")
+    dom.drop_columns(processors.ae.drop_lst)
+    study.apply_sex_age(dom)
+    study.apply_common_transforms(dom)
+    # the same renames
+    dom.rename_columns(next(step.columns
+                            for step in processors.ae.mapping.steps
+                            if isinstance(step, Rename)))
+    common.make_tc(dom, "AESTDTC")
+    common.make_tc(dom, "AEENDTC")
+    common.make_tc(dom, "RFSTDTC")
+    common.studyDUR(dom.data, "RFSTDTC", "AESTDTC", "AESTDY")
+    common.studyDUR(dom.data, "RFSTDTC", "AEENDTC", "AEENDY")
+    common.studyDUR(dom.data, "AESTDTC", "AEENDTC", "AEDUR")
+    dom.apply_pending_filters()
+    return dom
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_ae_mapping_same_as_imperative(lazy):
+    set_lazy(lazy)
+    try:
+        mapped = processors.ae.cook(FrameStudy(raw_domains())).data
+        expected = cook_ae_imperative(FrameStudy(raw_domains())).data
+    finally:
+        set_lazy(False)
+    pd.testing.assert_frame_equal(mapped.reset_index(drop=True),
+                                  expected.reset_index(drop=True))
+    assert mapped["AETERM"].tolist() == ["Headache", "Rash", "Cough"]
+
+
+def test_cook_not_lazy_by_default():
+    mapping = DomainMapping(name="AE", raw="ae", steps=())
+    dom = mapping.compile()(FrameStudy(raw_domains()))
+    assert not dom.lazy
+    assert not dom.plan
+    assert dom.data["DOMAIN"].unique().tolist() == ["AE"]
+    assert "subjectId" not in dom.data.columns
+
+
+def test_merge_steps():
+    steps = merge_steps((
+        Drop(("a", "b")), Drop(("b", "c"), ("_RAW",)),
+        SexAge(),
+        MakeTc(("X",)), MakeTc(("Y",)),
+        StudyDur((("X", "Y", "D"),)),
+        Rename({"a": "b"}), Rename({"c": "d"})))
+    assert steps == (
+        Drop(("a", "b", "c"), ("_RAW",)),
+        SexAge(),
+        MakeTc(("X", "Y")),
+        StudyDur((("X", "Y", "D"),)),
+        Rename({"a": "b"}), Rename({"c": "d"}))
+
+
+def test_merge_steps_lists_and_tuples():
+    # e.g. Drop(common.drop_lst, common.cols_drop_patterns), then a tuple
+    steps = merge_steps((Drop(["a", "b"], ["_RAW"]), Drop(("c",), ("_STD",))))
+    assert steps == (Drop(("a", "b", "c"), ("_RAW", "_STD")),)
+    assert Drop(["a"]) == Drop(("a",))
+    hash(Drop(["a"], ["_RAW"]))
@@ -0,0 +1,64 @@
+import io
+
+import sdw4_mapping.common.utils
+_read_data = sdw4_mapping.common.utils.read_data
+from patch_read_data import (BoundedReader, _tail_eof_truncate_size,
+                             eof_line_helper, find_eof_truncate_size,
+                             read_data)
+# importing the module patches sdw4_mapping
+sdw4_mapping.common.utils.read_data = _read_data
+
+DATA = b"a,b\r\n1,2\r\n"
+
+
+def tail_truncate_size(data, block_size):
+    fh = io.BytesIO(data)
+    return _tail_eof_truncate_size(fh, 0, len(data), block_size=block_size)
+
+
+def test_marker_across_blocks():
+    data = DATA + b"EOF\r\n"
+    # the first tails ("\n", "F\r\n", ...) only hold part of the trailer
+    for block_size in (1, 2, 3, 4, 5, 6):
+        assert tail_truncate_size(data, block_size) == len(DATA)
+    assert find_eof_truncate_size(data) == len(DATA)
+
+
+def test_no_marker():
+    assert tail_truncate_size(DATA, 2) is None
+    assert find_eof_truncate_size(DATA) is None
+    assert find_eof_truncate_size(DATA + b"NOEOF\n") is None
+    assert eof_line_helper(io.BytesIO(DATA)).read() == DATA
+
+
+def test_shorter_than_one_block():
+    assert tail_truncate_size(b"EOF", 4096) == 0
+    assert tail_truncate_size(b"\nEOF\n", 4096) == 1
+    assert tail_truncate_size(b"\n \n", 4096) is None
+    assert tail_truncate_size(b"", 4096) is None
+
+
+def test_marker_with_trailing_bytes():
+    # blanks after the trailer are removed with it
+    data = DATA + b"eof  \r\n \n\n"
+    assert tail_truncate_size(data, 2) == len(DATA)
+    assert find_eof_truncate_size(data.decode()) == len(DATA)
+    # anything else: not a trailer
+    assert tail_truncate_size(DATA + b"EOF;\n", 2) is None
+    assert tail_truncate_size(DATA + b"EOF\nx", 2) is None
+
+
+def test_bounded_reader():
+    raw = io.BytesIO(DATA + b"EOF\n")
+    reader = BoundedReader(raw, len(DATA), close_raw=False)
+    assert io.BufferedReader(reader).read() == DATA
+    assert not raw.closed
+
+
+def test_read_data(tmp_path):
+    path = tmp_path / "ae.csv"
+    path.write_bytes(DATA + b"EOF\r\n")
+    df = read_data(str(path), usecols=None, helper=eof_line_helper)
+    assert df.to_dict("list") == {"a": ["1"], "b": ["2"]}
+    assert read_data(str(tmp_path / "missing.csv"), usecols=None,
+                     helper=eof_line_helper) is None
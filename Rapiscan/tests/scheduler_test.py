@@ -0,0 +1,75 @@
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+from sdw4_mapping.common.allocation_report import AllocationReport
+from sdw4_mapping.common.date_memo import DateParseMemo
+from sdw4_mapping.common.date_report import DateParseReport
+from sdw4_mapping.common.snapshot import SnapshotCache
+import scheduler
+
+
+def processor(*raw_domains):
+    return SimpleNamespace(raw_domains=list(raw_domains))
+
+
+def test_cook_groups():
+    processors = {
+        "ae": processor("ae", "dm", "sv"),
+        "sae": processor("sae", "dm", "sv"),
+        "flu": processor("flu", "dm", "sv"),
+        "ds": processor("ds_ic", "flu", "sae", "sv", "dm"),
+        "vs": processor("vs", "dm", "sv"),
+        "povcgjoint": processor("povcgvit", "vs", "dm", "sv"),
+        "povcg": processor("povcgvit", "dm", "sv"),
+        "dm": processor("dm"),
+        "sv": processor("sv", "dm"),
+    }
+    assert scheduler.cook_groups(processors) == [
+        ["ae"], ["sae", "flu", "ds"], ["vs", "povcgjoint", "povcg"],
+        ["dm"], ["sv"]]
+
+
+def study(tmp_path):
+    return SimpleNamespace(
+        rows_filtered_early={"ae": 1},
+        raw_domain_reader=SimpleNamespace(memory_saved={"ae": 10},
+                                          snapshot_cache=SnapshotCache()),
+        date_parse_report=DateParseReport(),
+        allocation_report=AllocationReport(),
+        date_parse_memo=DateParseMemo(
+            os.path.join(tmp_path, "memo.sqlite"), "fingerprint"),
+        worker_date_parse_cache={"hits": 0, "misses": 0})
+
+
+def test_merge_stats(tmp_path):
+    parent = study(tmp_path)
+    parent.date_parse_report.entry("AE", "AESTDTC")["rows"] = 5
+    parent.allocation_report.entries["ae"] = {"peak": 100, "kept": 10}
+    stats = {
+        "rows_filtered_early": {"cm": 2},
+        "memory_saved": {"ae": 5, "cm": 3},
+        "date_parse_report": {
+            ("AE", "AESTDTC"): dict.fromkeys(DateParseReport.counters, 1),
+            ("CM", "CMSTDTC"): dict.fromkeys(DateParseReport.counters, 2)},
+        "allocation_report": {"ae": {"peak": 50, "kept": 20},
+                              "cm": {"peak": 70, "kept": 7}},
+        "snapshot_cache": {"hits": 2, "misses": 1, "invalidations": 0},
+        "date_parse_memo": {"hits": 3, "misses": 4, "stores": 4},
+        "date_parse_results": {
+            ("2016", 1): (1, datetime(2016, 1, 1).isoformat())},
+        "date_parse_cache": {"hits": 6, "misses": 7}}
+    scheduler.merge_stats(parent, stats)
+
+    assert parent.rows_filtered_early == {"ae": 1, "cm": 2}
+    assert parent.raw_domain_reader.memory_saved == {"ae": 15, "cm": 3}
+    assert parent.date_parse_report.entries[("AE", "AESTDTC")]["rows"] == 6
+    assert parent.date_parse_report.entries[("CM", "CMSTDTC")]["calls"] == 2
+    assert parent.allocation_report.entries == {
+        "ae": {"peak": 100, "kept": 30}, "cm": {"peak": 70, "kept": 7}}
+    assert parent.raw_domain_reader.snapshot_cache.hits == 2
+    assert parent.date_parse_memo.stores == 4
+    assert parent.date_parse_memo.get("2016", True) == (
+        True, datetime(2016, 1, 1))
+    assert parent.worker_date_parse_cache == {"hits": 6, "misses": 7}
+    parent.date_parse_memo.close()
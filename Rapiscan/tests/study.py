@@ -0,0 +1,60 @@
+import pandas as pd
+from sdw4_mapping import Study
+from sdw4_mapping.core.domain import Domain
+from lib import common
+
+
+class FrameStudy(Study):
+    # a study reading its raw domains from frames (name -> DataFrame),
+    # with the transforms of Rapiscan.Rapiscan
+    def __init__(self, raw_domains):
+        super().__init__(id="test_study", input_folder="./data/input/")
+        self.frames = raw_domains
+
+    def get_raw_domain(self, domain_name, usecols=None):
+        domain = Domain(self, domain_name)
+        data = self.frames[domain_name]
+        domain.data = (data if usecols is None
+                       else usecols.apply(data) if hasattr(usecols, "apply")
+                       else data[list(usecols)])
+        return domain
+
+    def apply_common_transforms(self, domain):
+        common.apply_common_transforms(
+            domain=domain,
+            demographics=self.get_raw_domain("dm"),
+            subject_visits=self.get_raw_domain("sv"))
+
+    def apply_sex_age(self, domain):
+        dm = self.frames["dm"]
+        dm2 = Domain(self, "DM2")
+        dm2.data = (dm[["Subject", "S_DM_SEX", "S_DM_AGE"]]
+                    .rename(columns={"S_DM_SEX": "SEX", "S_DM_AGE": "AGE"})
+                    .drop_duplicates())
+        common.apply_sex_age(domain, dm2)
+
+
+def raw_domains():
+    # ae, dm and sv of three subjects, subject 3 without check-in
+    dm = pd.DataFrame({
+        "Subject": ["1", "2", "3"], "subjectId": ["s1", "s2", "s3"],
+        "S_DM_SEX": ["F", "M", "F"], "S_DM_AGE": ["30", "40", "50"],
+        "S_DM_AGEY_STD": ["30", "40", "50"], "SEX": ["F", "M", "F"]})
+    sv = pd.DataFrame({
+        "Subject": ["1", "2", "2"],
+        "Folder": ["VCHECKIN", "VCHECKIN", "V2"],
+        "S_SV_VISDAT_INT": ["2020-01-02", "2020-02-03", "2020-03-04"]})
+    ae = pd.DataFrame({
+        "Subject": ["1", "1", "2", "3"],
+        "subjectId": ["s1", "s1", "s2", "s3"],
+        "RecordActive": ["1", "0", "1", "1"],
+        "projectid": ["p", "p", "p", "p"],
+        "Folder": ["AE", "AE", "AE", "AE"],
+        "SiteNumber": ["01", "01", "02", "02"],
+        "FolderName": ["Adverse", "Adverse", "Adverse", "Adverse"],
+        "project": ["CCD", "CCD", "CCD", "CCD"],
+        "S_AE_AETERM": ["Headache", "Nausea", "Rash", "Cough"],
+        "S_AE_AESTDAT": ["2020-01-05", "2020-01-01", "", "2020-04-01"],
+        "S_AE_AEENDAT": ["2020-01-07", "", "2020-02-10", "2020-04-02"],
+        "S_AE_AESEV": ["MILD", "MILD", "SEVERE", "MODERATE"]})
+    return {"ae": ae, "dm": dm, "sv": sv}
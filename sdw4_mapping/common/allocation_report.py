@@ -0,0 +1,61 @@
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict
+
+import pandas as pd
+
+
+class AllocationReport:
+    """
+    Measures the memory allocated by the steps of a run (e.g. the cooks) with tracemalloc, numpy and pandas buffers
+    included. Per step:
+    - peak: the most memory allocated at once during the step, above the memory allocated at its start;
+    - kept: the memory still allocated at its end (e.g. its output and the caches it filled).
+    tracemalloc is started by the first step and slows the run down until stop: the report is meant to compare runs
+    (e.g. with and without copy-on-write). Steps can't be nested.
+    """
+
+    def __init__(self) -> None:
+        self.entries: Dict[str, Dict[str, int]] = {}
+        self._started = False
+
+    def __str__(self):
+        df = self.to_frame()
+        if df.empty:
+            return 'Allocation report: no step measured'
+        df[['peak', 'kept']] = df[['peak', 'kept']] / 2 ** 20
+        return 'Allocation report (MiB):\n' + df.to_string(index=False, float_format=lambda mib: f'{mib:.1f}')
+
+    @contextmanager
+    def measure(self, step: str):
+        """
+        Measures the allocations of the code run in the with block as the step.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            after, peak = tracemalloc.get_traced_memory()
+            entry = self.entries.setdefault(step, {'peak': 0, 'kept': 0})
+            entry['peak'] = max(entry['peak'], peak - before)
+            entry['kept'] += after - before
+
+    def stop(self) -> None:
+        """
+        Stops tracemalloc if the report started it.
+        """
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns one row per step, in bytes, the highest peak first.
+        """
+        rows = [{'step': step, **entry} for step, entry in self.entries.items()]
+        df = pd.DataFrame(rows, columns=['step', 'peak', 'kept'])
+        return df.sort_values('peak', ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,132 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+
+class DateParseMemo:
+    """
+    Keeps the results of date parsing across runs in a sqlite file: (raw string, start) -> parsed datetime or the
+    string returned for an unparseable value.
+    The memo is versioned by a fingerprint of the parser and its settings: when the fingerprint changes (e.g. after a
+    dateparser upgrade), the stored results are removed.
+    Only results which don't depend on the day of the run are stored: a datetime is stored if its year is written in
+    the raw string (partial dates get the current year, dateparser resolves relative dates from today) and it has no
+    timezone, an unparseable value is stored if the result is the raw string itself (not a partial date completed with
+    the current year).
+    New results are written by batches of flush_size and on flush/close.
+    A read-only memo (e.g. of a worker process, while the main process writes) never writes the file: it keeps its
+    new results until take_results, for add_results of the writing memo.
+    """
+
+    flush_size = 1000
+
+    def __init__(self, path: str, fingerprint: str, read_only: bool = False) -> None:
+        self.path = path
+        self.fingerprint = fingerprint
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self._pending: Dict[Tuple[str, int], Tuple[int, str]] = {}
+        self._lock = threading.Lock()
+        if read_only:
+            # opened after the writing memo, which removed the results of other parser settings
+            self._connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+            stored = self._connection.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+            if stored is None or stored[0] != fingerprint:
+                raise ValueError(f'Date parse memo {path} was made with other parser settings')
+            return
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS parsed (raw TEXT, start INTEGER, is_date INTEGER, '
+                                 'value TEXT, PRIMARY KEY (raw, start)) WITHOUT ROWID')
+        stored = self._connection.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if stored is None or stored[0] != fingerprint:
+            if stored is not None:
+                self.invalidations += 1
+                logging.info(f'Date parse memo {path} was made with other parser settings, removing its results')
+            self._connection.execute('DELETE FROM parsed')
+            self._connection.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+        self._connection.commit()
+
+    def __str__(self):
+        return (f'Date parse memo: {self.hits} hit(s), {self.misses} miss(es), {self.stores} new result(s), '
+                f'{self.invalidations} invalidation(s)')
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'stores': self.stores, 'invalidations': self.invalidations}
+
+    def get(self, raw: str, start: bool) -> Tuple[bool, Any]:
+        """
+        Returns (True, result) if the result of raw is stored, else (False, None).
+        """
+        with self._lock:
+            row = self._pending.get((raw, int(start)))
+            if row is None:
+                row = self._connection.execute('SELECT is_date, value FROM parsed WHERE raw = ? AND start = ?',
+                                               (raw, int(start))).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+        is_date, value = row
+        return True, datetime.fromisoformat(value) if is_date else value
+
+    def put(self, raw: str, start: bool, result: Any) -> None:
+        """
+        Stores the result of raw if it doesn't depend on the day of the run.
+        """
+        if isinstance(result, datetime):
+            if result.tzinfo is not None or str(result.year) not in raw:
+                return
+            row = (1, result.isoformat())
+        elif result == raw:
+            row = (0, result)
+        else:
+            return
+        with self._lock:
+            self._pending[(raw, int(start))] = row
+            self.stores += 1
+            if len(self._pending) >= self.flush_size:
+                self._flush()
+
+    def take_results(self) -> Dict[Tuple[str, int], Tuple[int, str]]:
+        """
+        Returns the new results not written yet and forgets them, for add_results of another memo.
+        """
+        with self._lock:
+            results, self._pending = self._pending, {}
+        return results
+
+    def add_results(self, results: Dict[Tuple[str, int], Tuple[int, str]]) -> None:
+        """
+        Stores the results of take_results of another memo (counted as stores there).
+        """
+        with self._lock:
+            self._pending.update(results)
+            if len(self._pending) >= self.flush_size:
+                self._flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._connection.close()
+
+    def _flush(self) -> None:
+        if self._pending and not self.read_only:
+            self._connection.executemany('INSERT OR REPLACE INTO parsed VALUES (?, ?, ?, ?)',
+                                         [key + row for key, row in self._pending.items()])
+            self._connection.commit()
+            self._pending = {}
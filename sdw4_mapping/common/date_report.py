@@ -0,0 +1,46 @@
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+
+class DateParseReport:
+    """
+    Counts and times the date conversions of a run per domain and column, to find the columns making runs slow.
+    Counters:
+    - calls, rows, seconds: conversions of the column, rows in and wall time;
+    - fast: rows converted by a vectorized way (pandas.to_datetime, dominant format, known layouts);
+    - one by one: rows converted value by value by convert_to_dt (each distinct value once);
+    - cached: convert_to_dt calls answered by its cache or by the date parse memo;
+    - regexp, dateparser: values completed by _check_regexp and values parsed by dateparser;
+    - failures: values dateparser couldn't parse, or rows a given format couldn't convert.
+    Conversions out of a domain/column scope (e.g. add_dy) are reported with empty domain and column.
+    """
+
+    counters = ['calls', 'rows', 'fast', 'one by one', 'cached', 'regexp', 'dateparser', 'failures', 'seconds']
+
+    def __init__(self) -> None:
+        self.entries: Dict[Tuple[Optional[str], Optional[str]], Dict[str, float]] = {}
+
+    def __str__(self):
+        df = self.to_frame()
+        if df.empty:
+            return 'Date parse report: no date conversion'
+        return 'Date parse report:\n' + df.to_string(index=False, float_format=lambda seconds: f'{seconds:.3f}')
+
+    def entry(self, domain: Optional[str], column: Optional[str]) -> Dict[str, float]:
+        """
+        Returns the counters of (domain, column), to be increased in place.
+        """
+        key = (domain, column)
+        if key not in self.entries:
+            self.entries[key] = dict.fromkeys(self.counters, 0)
+        return self.entries[key]
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns one row per domain and column, the slowest first.
+        """
+        rows = [{'domain': domain or '', 'column': column or '', **counters}
+                for (domain, column), counters in self.entries.items()]
+        df = pd.DataFrame(rows, columns=['domain', 'column'] + self.counters)
+        return df.sort_values('seconds', ascending=False, kind='stable').reset_index(drop=True)
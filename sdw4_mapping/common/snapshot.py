@@ -0,0 +1,117 @@
+import glob
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict
+
+import pandas as pd
+
+
+class SnapshotCache:
+    """
+    Keeps a columnar snapshot of every csv file read through read_data, by default beside the csv itself.
+    Snapshots are keyed by the content hash of the csv and by the read options (e.g. usecols), so re-runs on unchanged
+    exports load the snapshot instead of tokenizing the csv again. When the csv content changes, snapshots of the old
+    content are removed (invalidated) and a new one is written.
+    Snapshots are stored with pandas pickle format: it needs no optional dependency and round-trips object columns
+    (strings and None) exactly as they were read.
+    """
+
+    suffix = '.snapshot'
+    hash_chunk_size = 1024 * 1024
+
+    def __init__(self, folder: str = None) -> None:
+        self.folder = folder
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f'Snapshot cache: {self.hits} hit(s), {self.misses} miss(es), {self.invalidations} invalidation(s)'
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations}
+
+    def read(self, data_path: str, reader: Callable[[], pd.DataFrame], options: Any = None) -> pd.DataFrame:
+        """
+        Returns the snapshot of data_path for the given read options if the csv content didn't change,
+        otherwise calls reader, stores its result as a new snapshot and returns it.
+        """
+        content_hash = file_hash(data_path, chunk_size=self.hash_chunk_size)
+        snapshot_path = self._snapshot_path(data_path, content_hash, options)
+
+        if os.path.exists(snapshot_path):
+            try:
+                df = pd.read_pickle(snapshot_path)
+                with self._lock:
+                    self.hits += 1
+                logging.debug(f'Loaded {data_path} from snapshot {snapshot_path}')
+                return df
+            except Exception as e:
+                logging.warning(f'Could not load snapshot {snapshot_path}, reading csv instead: {e}')
+
+        with self._lock:
+            self.misses += 1
+        self.invalidate(data_path, keep_hash=content_hash)
+        df = reader()
+        if df is not None:
+            self._write(df, snapshot_path)
+        return df
+
+    def invalidate(self, data_path: str, keep_hash: str = None) -> None:
+        """
+        Removes snapshots of data_path. If keep_hash is set, snapshots of that csv content are kept.
+        """
+        for path in glob.glob(glob.escape(self._snapshot_base(data_path)) + '.*' + self.suffix):
+            if keep_hash is not None and path.startswith(self._snapshot_base(data_path) + '.' + keep_hash[:16] + '.'):
+                continue
+            try:
+                os.remove(path)
+                with self._lock:
+                    self.invalidations += 1
+                logging.debug(f'Removed outdated snapshot {path}')
+            except OSError as e:
+                logging.warning(f'Could not remove outdated snapshot {path}: {e}')
+
+    def _snapshot_base(self, data_path: str) -> str:
+        if self.folder is None:
+            return data_path
+        return os.path.join(self.folder, os.path.basename(data_path))
+
+    def _snapshot_path(self, data_path: str, content_hash: str, options: Any) -> str:
+        options_hash = hashlib.sha1(_options_key(options).encode('utf-8')).hexdigest()
+        return f'{self._snapshot_base(data_path)}.{content_hash[:16]}.{options_hash[:8]}{self.suffix}'
+
+    def _write(self, df: pd.DataFrame, snapshot_path: str) -> None:
+        tmp_path = snapshot_path + '.tmp'
+        try:
+            if self.folder is not None:
+                os.makedirs(self.folder, exist_ok=True)
+            df.to_pickle(tmp_path)
+            os.replace(tmp_path, snapshot_path)
+        except Exception as e:
+            logging.warning(f'Could not write snapshot {snapshot_path}: {e}')
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def file_hash(data_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Returns sha1 hex digest of the file content, reading the file by chunks.
+    """
+    sha1 = hashlib.sha1()
+    with open(data_path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _options_key(options: Any) -> str:
+    if options is None:
+        return ''
+    if isinstance(options, (list, tuple, set)):
+        return repr(sorted(options))
+    return repr(options)
@@ -1,26 +1,37 @@
 import logging
 import os
+import re
 import sys
 import atexit
-from typing import List, Union
+from functools import lru_cache
+from typing import List, Union, Callable, Iterable, Optional, Pattern, Tuple
 
 import pandas as pd
 
 from sdw4_mapping.common.logging_stack import LoggingHandlerStackHandler
+from sdw4_mapping.common.snapshot import SnapshotCache
 
 logger_initialized = False
 
 
-def read_data(data_path: str, usecols: List[str]) -> Union[pd.DataFrame, None]:
+def read_data(data_path: str, usecols: Union[List[str], Callable[[str], bool]],
+              snapshot_cache: SnapshotCache = None) -> Union[pd.DataFrame, None]:
     """
     Reads data from single csv file, returns pd.DataFrame.
     If file doesn't exist, ithrows an exception and warns user, returns None.
-    Uses String Converter to convert all the data to the string format.
-    Columns to read can be specified by "usecols" parameter.
+    Reads all the data in the string format (see read_csv_strings).
+    Columns to read can be specified by "usecols" parameter (list of columns or ColumnProjection).
+    If snapshot cache is given, the data is loaded from the snapshot of the file when the file content didn't change.
     """
     if data_path is not None:
         if os.path.exists(data_path):
-            df = pd.read_csv(filepath_or_buffer=data_path, usecols=usecols, converters=StringConverter())
+            def read():
+                return read_csv_strings(data_path, usecols=usecols)
+
+            if snapshot_cache is not None:
+                df = snapshot_cache.read(data_path, reader=read, options=usecols)
+            else:
+                df = read()
         else:
             logging.error(f'Wrong data path: {data_path}')
             df = None
@@ -29,6 +40,99 @@ def read_data(data_path: str, usecols: List[str]) -> Union[pd.DataFrame, None]:
     return df
 
 
+def read_csv_strings(filepath_or_buffer, usecols: Union[List[str], Callable[[str], bool]] = None,
+                     engine: str = 'c') -> pd.DataFrame:
+    """
+    Reads csv with all the values as strings, empty values stay empty strings (nothing is converted to NaN).
+    Gives the same result as reading with StringConverter, but lets the C (or pyarrow) parser produce the strings
+    instead of calling python str converter for every cell.
+    """
+    if engine == 'pyarrow':
+        # pyarrow engine doesn't support na_filter, no na values gives the same result
+        return pd.read_csv(filepath_or_buffer, usecols=usecols, dtype=str, engine=engine,
+                           keep_default_na=False, na_values=[])
+    return pd.read_csv(filepath_or_buffer, usecols=usecols, dtype=str, engine=engine,
+                       keep_default_na=False, na_filter=False)
+
+
+@lru_cache(maxsize=None)
+def compile_patterns(patterns: Tuple[str, ...]) -> Optional[Pattern]:
+    """
+    Returns one regular expression searching any of the patterns (None if there is no pattern). Compiled once per
+    tuple of patterns, so the projections and prunings of all the domains share it.
+    """
+    return re.compile('|'.join(patterns)) if patterns else None
+
+
+class ColumnProjection:
+    """
+    Columns to read from csv, can be given as "usecols" parameter to read_data (pandas calls it with every column name).
+    Keeps columns from "columns" list (all the columns if None) except columns from "drop" list and columns matching
+    one of "drop_patterns" regular expressions. Patterns are searched anywhere in the column name, like str.contains.
+    Columns from "keep" list are always read.
+    """
+
+    def __init__(self, columns: Iterable[str] = None, drop: Iterable[str] = None,
+                 drop_patterns: Iterable[str] = None, keep: Iterable[str] = None) -> None:
+        self.columns = None if columns is None else frozenset(columns)
+        self.drop = frozenset(drop or [])
+        self.drop_patterns = tuple(drop_patterns or [])
+        self.keep = frozenset(keep or [])
+        self._regex = compile_patterns(self.drop_patterns)
+
+    def __call__(self, column: str) -> bool:
+        if column in self.keep:
+            return True
+        if self.columns is not None and column not in self.columns:
+            return False
+        if column in self.drop:
+            return False
+        return self._regex is None or self._regex.search(column) is None
+
+    def __repr__(self):
+        columns = None if self.columns is None else sorted(self.columns)
+        return (f'ColumnProjection(columns={columns}, drop={sorted(self.drop)}, '
+                f'drop_patterns={list(self.drop_patterns)}, keep={sorted(self.keep)})')
+
+    def __eq__(self, other):
+        return isinstance(other, ColumnProjection) and repr(self) == repr(other)
+
+    def __hash__(self):
+        return hash(repr(self))
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Projects already loaded data, gives the same columns as reading the csv with this projection.
+        """
+        return df[[column for column in df.columns if self(column)]]
+
+
+def encode_categories(df: pd.DataFrame, columns: List[str] = None, max_categories: int = None) -> pd.DataFrame:
+    """
+    Stores string columns which repeat a few values as pandas categoricals, to save memory. Changes df in place.
+    Encodes the columns from "columns" list found in the data and, if "max_categories" is set, every other string column
+    with at most max_categories distinct values (and less distinct values than half of the rows).
+    Values don't change: comparisons, str accessor, joins and to_csv give the same results as for strings.
+    """
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        if columns is not None and column in columns:
+            df[column] = df[column].astype('category')
+        elif max_categories is not None:
+            n_unique = df[column].nunique(dropna=False)
+            if n_unique <= max_categories and n_unique * 2 < len(df):
+                df[column] = df[column].astype('category')
+    return df
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """
+    Returns the memory used by the data in bytes, including python string objects.
+    """
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
 def save_to_csv(df: pd.DataFrame, domain_name: str, output_folder: str) -> None:
     """
     Saves csv to output folder. Name of the output file is a domain name.
@@ -43,6 +147,7 @@ def save_to_csv(df: pd.DataFrame, domain_name: str, output_folder: str) -> None:
 class StringConverter(dict):
     """
     Converter for pd.read_csv method to convert all the values in csv to string format while reading.
+    It forces python converter call for every cell, read_csv_strings gives the same result faster.
     """
 
     def __contains__(self, item):
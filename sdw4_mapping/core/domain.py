@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import logging
-from typing import List, Union, Dict, Any, Callable, Optional
+from typing import List, Union, Dict, Any, Callable, Optional, Tuple
 
 import pandas as pd
+from sdw4_mapping.common.snapshot import SnapshotCache
 from sdw4_mapping.common.utils import save_to_csv, read_data
+from sdw4_mapping.core.plan import Plan, Step, Operation, Filter
 from sdw4_mapping.core.study import Study
-from sdw4_mapping.transformations import preparation as sdw_pr, date_conversions as sdw_dt, specific as sdw_sp
+from sdw4_mapping.transformations import preparation as sdw_pr, date_conversions as sdw_dt, specific as sdw_sp, \
+    conditions as sdw_cd
 from sdw4_mapping.transformations.preparation import TUnpivotAttr, TUnpivotColumnConfig
 
 
@@ -26,6 +29,51 @@ def add_usubjid(df: pd.DataFrame, subjid_column: str = 'subjectId', studyid_colu
     return df
 
 
+# Domain.copy_data shares the column buffers of the source instead of copying them, see set_copy_on_write
+_copy_on_write = False
+
+
+def set_copy_on_write(enabled: bool) -> None:
+    """
+    Switches the copy-on-write mode of Domain.copy_data: a domain made from another one (e.g. a cooked domain from a
+    cached raw domain) shares the column buffers of the other one until it replaces its columns, instead of copying
+    the whole data.
+    """
+    global _copy_on_write
+    _copy_on_write = enabled
+
+
+# new domains record their operations in a plan instead of running them, see set_lazy
+_lazy = False
+
+
+def set_lazy(enabled: bool) -> None:
+    """
+    Switches the lazy mode of the new domains: column operations (add_column_constant, drop_columns, prune_columns,
+    rename_columns, set_columns), filters by conditions, joins and date conversions are recorded in a plan, which is
+    optimized and run when the data is needed (data attribute, to_csv). Domain.explain prints the optimized plan.
+    The other operations run the plan first and then run as usual.
+    """
+    global _lazy
+    _lazy = enabled
+
+
+def _join_row_wise(how: str, keys: Any, kwargs: dict) -> bool:
+    """
+    Whether each row of the join comes from one left row (left or inner join on keys).
+    """
+    return how in ('left', 'inner') and keys is not None and all(key in ('left_on', 'right_on') for key in kwargs)
+
+
+def _join_filter_commutes(right: pd.DataFrame, requested: List[str], how: str, keys: Any, kwargs: dict) -> bool:
+    """
+    Whether filters of the left columns give the same before the join as after it: the join is row wise and keeps
+    the dtypes (missing right rows give NaN, which changes the dtype of the int and bool columns).
+    """
+    return _join_row_wise(how, keys, kwargs) and \
+        all(right[column].dtype.kind not in 'iub' for column in requested if column in right)
+
+
 class Domain:
     """
     The Study Domain file is used to collect all operational data that pertain to a Human Subject Research Study
@@ -34,10 +82,58 @@ class Domain:
     For more information about the methods of the class please check submodules.
     """
 
-    def __init__(self, study: Study, name: str, data_path: str = None, usecols: List[str] = None) -> None:
+    def __init__(self, study: Study, name: str, data_path: str = None,
+                 usecols: Union[List[str], Callable[[str], bool]] = None,
+                 snapshot_cache: SnapshotCache = None) -> None:
         self.name = name
         self.study = study
-        self.data = read_data(data_path=data_path, usecols=usecols)
+        self.lazy = _lazy
+        self.data = read_data(data_path=data_path, usecols=usecols, snapshot_cache=snapshot_cache)
+        # filters of defer_filter not applied yet: (condition, its columns when deferred)
+        self.pending_filters: List[Tuple[sdw_cd.Condition, pd.DataFrame]] = []
+        self.rows_filtered_early = 0
+        # False while the data shares its column buffers with another domain (copy_data in copy-on-write mode)
+        self.owns_data = True
+
+    @property
+    def data(self) -> pd.DataFrame:
+        self.materialize()
+        return self._data
+
+    @data.setter
+    def data(self, data: pd.DataFrame) -> None:
+        # the operations recorded on the replaced data can't change the new one
+        self.plan = Plan()
+        self._data = data
+
+    def materialize(self) -> None:
+        """
+        Runs the operations recorded in lazy mode (see set_lazy), if any.
+        """
+        if self.plan:
+            plan, self.plan = self.plan, Plan()
+            self._data = plan.run(self._data)
+
+    def explain(self) -> None:
+        """
+        Prints the optimized plan of the operations recorded in lazy mode (see set_lazy), without running it.
+        """
+        if self.plan:
+            print(f'Plan of "{self.name}":\n' + self.plan.explain(self._data))
+        else:
+            print(f'Plan of "{self.name}": no operation recorded')
+
+    def _run(self, step: Step) -> None:
+        if self.lazy:
+            self.plan.add(step)
+        else:
+            self.data = step.run(self.data)
+
+    def _run_column_operation(self, description: str, function: Callable[[pd.DataFrame], pd.DataFrame]) -> None:
+        if self.lazy:
+            self.plan.add_column_operation(description, function)
+        else:
+            self.data = function(self.data)
 
     def __str__(self):
         df_info = 'Domain: ' + self.name + '\n' + \
@@ -57,6 +153,28 @@ class Domain:
         self.data['DOMAIN'] = self.name
         self.data = add_usubjid(self.data)
 
+    def copy_data(self, source: Domain):
+        """
+        Sets the data to a copy of the data of the source domain, which stays unchanged.
+        In copy-on-write mode (see set_copy_on_write) the copy is shallow: the data shares the column buffers of the
+        source until its columns are replaced. Domain methods and transformations never write values in place, they
+        replace the columns they change; call own_data before writing values in place (e.g. data.loc[rows, column] =).
+        """
+        if _copy_on_write:
+            self.data = source.data.copy(deep=False)
+            self.owns_data = False
+        else:
+            self.data = source.data.copy()
+            self.owns_data = True
+
+    def own_data(self):
+        """
+        Copies the data if it shares its column buffers with another domain, so it can be changed in place.
+        """
+        if not self.owns_data:
+            self.data = self.data.copy()
+            self.owns_data = True
+
     @classmethod
     def union(cls, domains: Union[List[Domain]]) -> Domain:
         """
@@ -79,13 +197,27 @@ class Domain:
         """
         Converts whole column from string to datetime format.
         """
-        self.data = sdw_dt.convert_date_smart(df=self.data, date_column=date_column, start=start, only_date=only_date)
+        def convert(df: pd.DataFrame) -> pd.DataFrame:
+            with sdw_dt.date_parse_scope(self.name, date_column, len(df)):
+                return sdw_dt.convert_date_smart(df=df, date_column=date_column, start=start, only_date=only_date)
+
+        self._run(self._conversion(f'convert_date {date_column}', convert, date_column))
 
     def convert_date_format(self, date_column: str, date_format: Union[List[str], str] = "%Y-%m-%d"):
         """
         Converts whole column from string to datetime format when exact format is known.
         """
-        self.data = sdw_dt.convert_date_format(df=self.data, date_column=date_column, date_format=date_format)
+        def convert(df: pd.DataFrame) -> pd.DataFrame:
+            with sdw_dt.date_parse_scope(self.name, date_column, len(df)):
+                return sdw_dt.convert_date_format(df=df, date_column=date_column, date_format=date_format)
+
+        self._run(self._conversion(f'convert_date_format {date_column}', convert, date_column))
+
+    @staticmethod
+    def _conversion(description: str, convert: Callable[[pd.DataFrame], pd.DataFrame], date_column: str) -> Step:
+        # a conversion can depend on all the values of the column (e.g. the inferred format): filters stay after it
+        return Operation(description, convert, reads=frozenset([date_column]), writes=frozenset([date_column]),
+                         constants_commute=True, keeps_columns=True)
 
     def add_age_from_birth_year(self, column_birth_year: str, column_age: str = "AGE"):
         """
@@ -122,13 +254,17 @@ class Domain:
         """
         Renames columns.
         """
-        self.data = sdw_pr.rename_columns(df=self.data, columns=columns)
+        self._run_column_operation(f'rename {columns}', lambda df: sdw_pr.rename_columns(df=df, columns=columns))
 
     def add_column_constant(self, column: str, value: Any):
         """
         Adds column with a constant value.
         """
-        self.data = sdw_pr.add_column_constant(df=self.data, column=column, value=value)
+        if pd.api.types.is_scalar(value):
+            self._run_column_operation(f'add {column} = {value!r}',
+                                       lambda df: sdw_pr.add_column_constant(df=df, column=column, value=value))
+        else:
+            self.data = sdw_pr.add_column_constant(df=self.data, column=column, value=value)
 
     def map_column(self, source_column: str, dictionary: Dict[Union[str, None], Union[str, None]],
                    default_value: Any = False):
@@ -149,13 +285,59 @@ class Domain:
         """
         Drops columns from data.
         """
-        self.data = sdw_pr.drop_columns(df=self.data, columns=columns)
+        self._run_column_operation(f'drop {columns}', lambda df: sdw_pr.drop_columns(df=df, columns=columns))
+
+    def prune_columns(self, columns: List[str] = None, patterns: List[str] = None):
+        """
+        Drops columns by names and by regular expressions (e.g. suffixes '_RAW$') at once.
+        """
+        self._run_column_operation(f'prune {columns or []} {patterns or []}',
+                                   lambda df: sdw_pr.prune_columns(df=df, columns=columns or [],
+                                                                   patterns=patterns or []))
 
-    def filter_rows(self, filter_function: Callable, column: str = None):
+    def filter_rows(self, filter_function: Union[sdw_cd.Condition, Callable], column: str = None):
         """
-        Filters data values by custom filter function.
+        Filters data values by a condition or by custom filter function.
         """
-        self.data = sdw_pr.filter_rows(df=self.data, filter_function=filter_function, column=column)
+        if isinstance(filter_function, sdw_cd.Condition) and column is None:
+            self._run(Filter(filter_function))
+        else:
+            self.data = sdw_pr.filter_rows(df=self.data, filter_function=filter_function, column=column)
+
+    def defer_filter(self, condition: sdw_cd.Condition):
+        """
+        Filters rows by the condition like filter_rows at the end of the cook, but as early as it can: right before the
+        next left or inner join, which then skips the rows filtered out (e.g. inactive records).
+        The filter is moved before it only while the columns of the condition keep the values they had when it was
+        deferred, else it waits for apply_pending_filters (called by to_csv). It is never moved before a right or
+        outer join (the right rows without a match would escape it) nor a date conversion (which can depend on all
+        the values of the column, e.g. the inferred format).
+        Rows filtered before a join are counted in rows_filtered_early.
+        """
+        columns = [column for column in condition.columns if column in self.data]
+        self.pending_filters.append((condition, self.data[columns]))
+
+    def apply_pending_filters(self):
+        """
+        Filters rows by the deferred conditions which weren't applied yet.
+        """
+        for condition, _ in self.pending_filters:
+            self._run(Filter(condition))
+        self.pending_filters = []
+
+    def _push_down_filters(self, operation: str):
+        pending = []
+        for condition, raw in self.pending_filters:
+            if len(raw.columns) == len(condition.columns) and raw.columns.isin(self.data.columns).all() and \
+                    self.data.index.equals(raw.index) and self.data[raw.columns].equals(raw):
+                num_rows_before = len(self.data)
+                self.data = sdw_pr.filter_rows(df=self.data, filter_function=condition)
+                self.rows_filtered_early += num_rows_before - len(self.data)
+                logging.info(f'"{self.name}": {num_rows_before - len(self.data)} rows filtered by {condition} before '
+                             f'{operation}.')
+            else:
+                pending.append((condition, raw))
+        self.pending_filters = pending
 
     def apply(self, func: Callable):
         """
@@ -167,7 +349,7 @@ class Domain:
         """
         Leaves only columns from the list user gives and/or renames them.
         """
-        self.data = sdw_pr.set_columns(df=self.data, columns=columns)
+        self._run_column_operation(f'set columns {columns}', lambda df: sdw_pr.set_columns(df=df, columns=columns))
 
     def unpivot(self, id_columns: List[str], value_columns: List[str], key: str = 'variable',
                 value_name: str = 'value'):
@@ -220,14 +402,35 @@ class Domain:
             right_domain_name = right.name
             right = right.data
 
-        num_rows_before = len(self.data)
-        self.data = sdw_pr.join(left=self.data, right=right, on=on, columns=columns, right_filter=right_filter, how=how,
-                                suffix=suffix, **kwargs)
-        num_rows_after = len(self.data)
-
-        if num_rows_before != num_rows_after:
-            logging.warning(
-                f'After joining "{self.name}" (left) and "{right_domain_name}" (right): Row count changed from {num_rows_before} to {num_rows_after}.')
+        keys = on if on is not None else kwargs.get('left_on')
+        requested = columns if isinstance(columns, list) else list(columns.keys())
+        filter_commutes = _join_filter_commutes(right, requested, how, keys, kwargs)
+        # the right rows without a match of a right or outer join have no values of the filter columns, and int or
+        # bool columns of a left join may become float: the filters stay pending for these
+        if filter_commutes:
+            self._push_down_filters(f'join with "{right_domain_name}"')
+
+        def join_data(df: pd.DataFrame) -> pd.DataFrame:
+            num_rows_before = len(df)
+            df = sdw_pr.join(left=df, right=right, on=on, columns=columns, right_filter=right_filter, how=how,
+                             suffix=suffix, **kwargs)
+            num_rows_after = len(df)
+
+            if num_rows_before != num_rows_after:
+                logging.warning(
+                    f'After joining "{self.name}" (left) and "{right_domain_name}" (right): Row count changed from {num_rows_before} to {num_rows_after}.')
+            return df
+
+        targets = columns if isinstance(columns, list) else list(columns.values())
+        suffix_name = '_JOIN' if suffix is None else suffix
+        writes = {target + suffix_name for target in targets} | set(targets) | \
+                 {column + '_JOIN' for column in right.columns}
+        self._run(Operation(f'join {requested} of "{right_domain_name}" on {keys}', join_data,
+                            reads=frozenset([keys] if isinstance(keys, str) else keys or []), writes=frozenset(writes),
+                            filter_commutes=filter_commutes, constants_commute=_join_row_wise(how, keys, kwargs),
+                            schema_function=lambda df: sdw_pr.join(left=df, right=right.iloc[:0], on=on, columns=columns,
+                                                                   right_filter=right_filter, how=how, suffix=suffix,
+                                                                   **kwargs)))
 
     def add_conditional_value(self, value: Any, condition: Callable, output_column: str, default_value: Any = False):
         """
@@ -297,4 +500,5 @@ class Domain:
         """
         if output_folder is None:
             output_folder = self.study.output_folder
+        self.apply_pending_filters()
         save_to_csv(df=self.data, domain_name=self.name, output_folder=output_folder)
@@ -0,0 +1,385 @@
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import pandas as pd
+
+from sdw4_mapping.transformations.conditions import Condition
+from sdw4_mapping.transformations.preparation import filter_rows
+
+
+class Step(ABC):
+    """
+    Operation of a plan: run returns the new data.
+    A filter can be moved before the step if filter_commutes and the step doesn't write the filter columns; constant
+    columns can be added after the step if constants_commute and the step doesn't read or write them.
+    "reads" and "writes" are the columns the step reads and the columns it can add or change (None: any column),
+    keeps_columns is True if the step doesn't change the columns (only their values or the rows).
+    """
+
+    filter_commutes = False
+    constants_commute = False
+    keeps_columns = False
+    reads: Optional[FrozenSet[str]] = None
+    writes: Optional[FrozenSet[str]] = None
+
+    @abstractmethod
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        pass
+
+    def schema(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns the data without rows (columns and dtypes) after the step, from the one before.
+        """
+        return self.run(df)
+
+
+class Operation(Step):
+    """
+    Step running a function of the data, e.g. a join or a date conversion.
+    """
+
+    def __init__(self, description: str, function: Callable[[pd.DataFrame], pd.DataFrame],
+                 reads: Optional[FrozenSet[str]] = None, writes: Optional[FrozenSet[str]] = None,
+                 filter_commutes: bool = False, constants_commute: bool = False,
+                 keeps_columns: bool = False,
+                 schema_function: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None) -> None:
+        self.description = description
+        self.function = function
+        self.reads = reads
+        self.writes = writes
+        self.filter_commutes = filter_commutes
+        self.constants_commute = constants_commute
+        self.keeps_columns = keeps_columns
+        # gives the same columns as the function for data without rows, cheaper (e.g. a join with no right row)
+        self.schema_function = schema_function or function
+
+    def __str__(self):
+        return self.description
+
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.function(df)
+
+    def schema(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df if self.keeps_columns else self.schema_function(df)
+
+
+class Filter(Step):
+    """
+    Keeps the rows satisfying the condition.
+    """
+
+    constants_commute = True
+    keeps_columns = True
+    writes = frozenset()
+
+    def __init__(self, condition: Condition) -> None:
+        self.condition = condition
+        self.reads = condition.columns
+
+    def __str__(self):
+        return f'filter {self.condition}'
+
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        return filter_rows(df, self.condition)
+
+    def schema(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df
+
+
+class ColumnOperations(Step):
+    """
+    Consecutive column operations, e.g. preparation.add_column_constant (of a scalar), drop_columns, prune_columns,
+    rename_columns or set_columns: functions of the data which only add constant columns, remove, rename or reorder
+    columns. They are compiled to one Projection for the columns they get.
+    """
+
+    def __init__(self) -> None:
+        self.operations: List[Tuple[str, Callable[[pd.DataFrame], pd.DataFrame]]] = []
+
+    def __str__(self):
+        return ', '.join(description for description, _ in self.operations)
+
+    def compile(self, columns: pd.Index) -> 'Projection':
+        """
+        Runs the operations on one row whose values are the positions of the columns, and returns the Projection
+        giving the same columns in one take.
+        """
+        tracer = pd.DataFrame([[_Source(position) for position in range(len(columns))]], columns=columns,
+                              dtype=object)
+        for _, function in self.operations:
+            tracer = function(tracer)
+        outputs = []
+        for position, name in enumerate(tracer.columns):
+            value = tracer.iat[0, position]
+            if isinstance(value, _Source):
+                outputs.append((name, value.position, None))
+            else:
+                outputs.append((name, None, value))
+        return Projection(outputs, description=str(self))
+
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.compile(df.columns).run(df)
+
+
+class _Source:
+    # value of the tracer row of ColumnOperations.compile: position of an input column
+    __slots__ = ['position']
+
+    def __init__(self, position: int) -> None:
+        self.position = position
+
+
+class Projection(Step):
+    """
+    Output columns taken from the input columns by position in one take, and constant columns inserted after:
+    outputs are (name, input position, None) or (name, None, constant value).
+    """
+
+    def __init__(self, outputs: List[Tuple[Any, Optional[int], Any]], description: str = '') -> None:
+        self.outputs = outputs
+        self.description = description
+
+    def __str__(self):
+        columns = sum(source is not None for _, source, _ in self.outputs)
+        constants = ', '.join(f'{name} = {value!r}' for name, source, value in self.outputs if source is None)
+        text = f'project {columns} columns' + (f', add constants {constants}' if constants else '')
+        return text + (f' (from {self.description})' if self.description else '')
+
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        positions = [source for _, source, _ in self.outputs if source is not None]
+        names = [name for name, source, _ in self.outputs if source is not None]
+        if positions == list(range(df.shape[1])) and names == list(df.columns):
+            if len(names) == len(self.outputs):
+                return df
+            result = df.copy(deep=False)
+        else:
+            result = df.take(positions, axis=1)
+            result.columns = names
+        for position, (name, source, value) in enumerate(self.outputs):
+            if source is None:
+                result.insert(position, name, value, allow_duplicates=True)
+        return result
+
+    def is_identity(self, columns: pd.Index) -> bool:
+        """
+        Returns True if the projection gives the same columns.
+        """
+        return [(name, source) for name, source, _ in self.outputs] == list(zip(columns, range(len(columns))))
+
+    def then(self, other: 'Projection') -> 'Projection':
+        """
+        Returns the projection giving the same columns as this one followed by the other.
+        """
+        outputs = []
+        for name, source, value in other.outputs:
+            if source is None:
+                outputs.append((name, None, value))
+            else:
+                _, first_source, first_value = self.outputs[source]
+                outputs.append((name, first_source, first_value))
+        return Projection(outputs, description='; '.join(filter(None, [self.description, other.description])))
+
+    def constants(self) -> Tuple['Projection', 'Constants']:
+        """
+        Splits the projection in the projection of the input columns and the constant columns added after.
+        """
+        columns = Projection([output for output in self.outputs if output[1] is not None], self.description)
+        constants = Constants([(position, name, value) for position, (name, source, value) in enumerate(self.outputs)
+                               if source is None])
+        return columns, constants
+
+
+class Constants(Step):
+    """
+    Inserts constant columns: items are (position, name, value), inserted in that order.
+    """
+
+    filter_commutes = True
+
+    def __init__(self, items: List[Tuple[int, Any, Any]]) -> None:
+        self.items = items
+        self.reads = frozenset()
+        self.writes = frozenset(name for _, name, _ in items)
+
+    def __str__(self):
+        return 'add constants ' + ', '.join(f'{name} = {value!r}' for _, name, value in self.items)
+
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy(deep=False)
+        for position, name, value in self.items:
+            df.insert(position, name, value, allow_duplicates=True)
+        return df
+
+    def as_projection(self, columns: List[Any]) -> Projection:
+        """
+        Returns the same step as a projection of data with the columns.
+        """
+        outputs: List[Tuple[Any, Optional[int], Any]] = [(name, position, None) for position, name in enumerate(columns)]
+        for position, name, value in self.items:
+            outputs.insert(position, (name, None, value))
+        return Projection(outputs)
+
+
+class Plan:
+    """
+    Operations recorded on a lazy Domain, run at once when its data is needed.
+    Before the run, the plan is optimized for the columns of the data:
+    - consecutive column operations (constants, drops, renames, projections) are merged in one projection;
+    - filters are moved before the projections and the joins which don't write their columns, so these only get the
+      rows kept (not before date conversions, which can depend on all the values of a column);
+    - constant columns are added after the filters, joins and conversions which don't use them, so these don't copy
+      them.
+    Gives the same data as running the operations one by one, except the index labels (a filter moved before a join
+    keeps the index the join would have reset).
+    """
+
+    def __init__(self) -> None:
+        self.steps: List[Step] = []
+        # (step, columns and dtypes before it) -> data without rows after it, while optimizing
+        self._schema_cache: Dict[Tuple[Step, tuple], pd.DataFrame] = {}
+
+    def __bool__(self):
+        return bool(self.steps)
+
+    def add_column_operation(self, description: str, function: Callable[[pd.DataFrame], pd.DataFrame]) -> None:
+        if not self.steps or not isinstance(self.steps[-1], ColumnOperations):
+            self.steps.append(ColumnOperations())
+        self.steps[-1].operations.append((description, function))
+
+    def add(self, step: Step) -> None:
+        self.steps.append(step)
+
+    def optimize(self, df: pd.DataFrame) -> List[Step]:
+        """
+        Returns the optimized steps for the data.
+        """
+        steps: List[Step] = []
+        schema = df.iloc[:0]
+        self._schema_cache = {}
+        try:
+            for step in self.steps:
+                compiled = step.compile(schema.columns).constants() if isinstance(step, ColumnOperations) else [step]
+                for compiled_step in compiled:
+                    if isinstance(compiled_step, Constants) and not compiled_step.items or \
+                            isinstance(compiled_step, Projection) and compiled_step.is_identity(schema.columns):
+                        continue
+                    schema = self._schema(compiled_step, schema)
+                    steps.append(compiled_step)
+            steps = self._push_down_filters(steps, df.iloc[:0])
+            steps = self._lift_constants(steps, df.iloc[:0])
+            return self._merge_projections(steps, df.iloc[:0])
+        finally:
+            self._schema_cache = {}
+
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        for step in self.optimize(df):
+            df = step.run(df)
+        return df
+
+    def explain(self, df: pd.DataFrame) -> str:
+        return '\n'.join(f'{number}. {step}' for number, step in enumerate(self.optimize(df), 1))
+
+    def _schema(self, step: Step, schema: pd.DataFrame) -> pd.DataFrame:
+        key = (step, tuple(zip(schema.columns, schema.dtypes)))
+        if key not in self._schema_cache:
+            # the step runs again on the data: its warnings are logged then
+            with _quiet():
+                self._schema_cache[key] = step.schema(schema)
+        return self._schema_cache[key]
+
+    def _schemas(self, steps: List[Step], schema: pd.DataFrame) -> List[pd.DataFrame]:
+        # the data without rows before each step
+        schemas = []
+        for step in steps:
+            schemas.append(schema)
+            schema = self._schema(step, schema)
+        return schemas
+
+    def _push_down_filters(self, steps: List[Step], schema: pd.DataFrame) -> List[Step]:
+        steps = list(steps)
+        moved = True
+        while moved:
+            moved = False
+            schemas = self._schemas(steps, schema)
+            for i in range(1, len(steps)):
+                step, previous = steps[i], steps[i - 1]
+                if isinstance(step, Filter) and self._filter_commutes(step, previous, schemas[i - 1]):
+                    steps[i - 1], steps[i] = step, previous
+                    moved = True
+                    break
+        return steps
+
+    @staticmethod
+    def _filter_commutes(step: Filter, previous: Step, schema: pd.DataFrame) -> bool:
+        columns = step.condition.columns
+        if not all(list(schema.columns).count(column) == 1 for column in columns):
+            return False
+        if isinstance(previous, Projection):
+            # the filter columns are taken from the input columns of the same name
+            names = [name for name, _, _ in previous.outputs]
+            return all(names.count(column) == 1 and
+                       previous.outputs[names.index(column)][1] == list(schema.columns).index(column)
+                       for column in columns)
+        if isinstance(previous, Filter):
+            return False
+        return previous.filter_commutes and previous.writes is not None and not columns & previous.writes
+
+    def _lift_constants(self, steps: List[Step], schema: pd.DataFrame) -> List[Step]:
+        steps = list(steps)
+        moved = True
+        while moved:
+            moved = False
+            schemas = self._schemas(steps, schema)
+            for i in range(len(steps) - 1):
+                step, following = steps[i], steps[i + 1]
+                if isinstance(step, Constants) and self._constants_commute(step, following, schemas[i]):
+                    steps[i], steps[i + 1] = following, step
+                    moved = True
+                    break
+        return steps
+
+    @staticmethod
+    def _constants_commute(step: Constants, following: Step, schema: pd.DataFrame) -> bool:
+        if isinstance(following, (Projection, Constants)) or not following.constants_commute:
+            return False
+        if following.reads is None or following.writes is None:
+            return False
+        if step.writes & (following.reads | following.writes) or step.writes & set(schema.columns):
+            return False
+        # the following step keeps the positions of the columns: it keeps them or appends the columns it adds
+        return following.keeps_columns or not following.writes & set(schema.columns)
+
+    def _merge_projections(self, steps: List[Step], schema: pd.DataFrame) -> List[Step]:
+        # consecutive constants are inserted by one step, constants next to a projection become part of it,
+        # consecutive projections are composed
+        merged: List[Tuple[Step, pd.DataFrame]] = []
+        for step, before in zip(steps, self._schemas(steps, schema)):
+            if isinstance(step, Constants) and merged and isinstance(merged[-1][0], Constants):
+                previous, before = merged.pop()
+                step = Constants(previous.items + step.items)
+            if isinstance(step, Constants) and merged and isinstance(merged[-1][0], Projection):
+                step = step.as_projection(list(before.columns))
+            elif isinstance(step, Projection) and merged and isinstance(merged[-1][0], Constants):
+                constants, before = merged.pop()
+                step = constants.as_projection(list(before.columns)).then(step)
+            if isinstance(step, Projection) and merged and isinstance(merged[-1][0], Projection):
+                previous, before = merged.pop()
+                step = previous.then(step)
+            merged.append((step, before))
+        return [step for step, _ in merged]
+
+
+@contextmanager
+def _quiet():
+    # drops the log records of the current thread
+    thread = threading.get_ident()
+    log_filter = logging.Filter()
+    log_filter.filter = lambda record: record.thread != thread
+    logging.getLogger().addFilter(log_filter)
+    try:
+        yield
+    finally:
+        logging.getLogger().removeFilter(log_filter)
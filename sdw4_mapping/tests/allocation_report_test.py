@@ -0,0 +1,21 @@
+import numpy as np
+
+from sdw4_mapping.common.allocation_report import AllocationReport
+
+
+def test_allocation_report():
+    report = AllocationReport()
+    kept = []
+    with report.measure('big'):
+        kept.append(np.ones(2 ** 20))
+        np.ones(2 ** 21)
+    with report.measure('small'):
+        np.ones(2 ** 10)
+    report.stop()
+
+    df = report.to_frame()
+    assert df['step'].tolist() == ['big', 'small']
+    big = report.entries['big']
+    assert big['peak'] >= 8 * (2 ** 20 + 2 ** 21)
+    assert 8 * 2 ** 20 <= big['kept'] < 8 * 2 ** 21
+    assert 'Allocation report (MiB)' in str(report)
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+from sdw4_mapping.core.domain import Domain, set_copy_on_write
+from sdw4_mapping.core.study import Study
+
+test_study = Study(id='test_study')
+
+
+def test_copy_data_copy_on_write():
+    source = Domain(study=test_study, name='source')
+    source.data = pd.DataFrame({'Subject': ['1', '2'], 'VALUE': [1.0, 2.0]})
+    set_copy_on_write(True)
+    try:
+        test_domain = Domain(study=test_study, name='test')
+        test_domain.copy_data(source)
+    finally:
+        set_copy_on_write(False)
+    assert not test_domain.owns_data
+    assert np.shares_memory(test_domain.data['VALUE'].to_numpy(), source.data['VALUE'].to_numpy())
+
+    test_domain.data['VALUE'] = test_domain.data['VALUE'] * 2
+    test_domain.add_column_constant('DOMAIN', 'test')
+    test_domain.own_data()
+    test_domain.data.loc[0, 'Subject'] = '3'
+    assert test_domain.owns_data
+    assert source.data.columns.tolist() == ['Subject', 'VALUE']
+    assert source.data['VALUE'].tolist() == [1.0, 2.0]
+    assert source.data['Subject'].tolist() == ['1', '2']
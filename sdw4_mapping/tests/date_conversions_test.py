@@ -1,6 +1,9 @@
 import numpy as np
 from dateutil.relativedelta import relativedelta
 from sdw4_mapping.transformations.date_conversions import *
+from sdw4_mapping.common.date_report import DateParseReport
+from sdw4_mapping.transformations.date_conversions import _apply_unique, _parse_known_layouts, \
+    _parse_dominant_format
 
 
 def test_add_age_from_birth_year_successful():
@@ -37,6 +40,20 @@ def test_add_dy_successful():
     assert df['CMSTDY'].values.tolist() == ['-698']
 
 
+def test_add_duration_not_converted():
+    test_df = pd.DataFrame({'START_DATE': ['2018-06-01', pd.NaT, '2018-06-01', 'not a date', '2018-06-01 12:00'],
+                            'END_DATE': ['2018-06-01', '2020-06-02', pd.NaT, '2020-06-02', '2018-06-01']})
+    test_df = add_duration(test_df, 'START_DATE', 'END_DATE')
+    assert test_df['DURATION'].values.tolist() == ['0', None, None, None, '-1']
+
+
+def test_add_dy_study_day_convention():
+    df = pd.DataFrame({'CMSTDTC': ['29 Nov 2017', '30 Nov 2017', '28 Nov 2017', None, 'not a date'],
+                       'RFSTDTC': ['29 Nov 2017'] * 5})
+    df = add_dy(df=df, dtc_column='CMSTDTC')
+    assert df['CMSTDY'].values.tolist() == ['1', '2', '-1', 'nan', 'None']
+
+
 def test_convert_date_smart():
     df = pd.DataFrame({
         'idx': [0, 1, 2, 3, 4, 5, 6, 7],
@@ -288,3 +305,102 @@ def test_convert_date_smart_float():
     test_df = convert_date_smart(test_df, date_column='TC', start=True)  # try-catсh is date column not in the data
     test_df = convert_date_smart(test_df, date_column='DTC', start=True)
     assert all(test_df['DTC'].values == date_strings)
+
+
+def test_apply_unique_same_as_apply():
+    parsed = {'01 Jan 2016': datetime(2016, 1, 1), '29 Nov 2017': datetime(2017, 11, 29), 'UNK': 'UNK'}
+    calls = []
+
+    def parse(value):
+        calls.append(value)
+        return parsed.get(value, value)
+
+    for values in [['01 Jan 2016', '29 Nov 2017', '01 Jan 2016'], ['01 Jan 2016', None, pd.NaT],
+                   ['01 Jan 2016', 'UNK'], [np.nan, np.nan], []]:
+        series = pd.Series(values, dtype=object, name='date')
+        assert _apply_unique(series, parse).equals(series.apply(parse))
+        assert _apply_unique(series, parse).dtype == series.apply(parse).dtype
+
+    calls.clear()
+    _apply_unique(pd.Series(['01 Jan 2016', '29 Nov 2017'] * 50), parse)
+    assert calls == ['01 Jan 2016', '29 Nov 2017']
+
+
+def test_convert_to_dt_cache():
+    before = date_parse_cache_stats()
+    assert convert_to_dt('17 Mar 2015 10:20:30', start=True) == datetime(2015, 3, 17, 10, 20, 30)
+    assert convert_to_dt('17 Mar 2015 10:20:30', start=True) == datetime(2015, 3, 17, 10, 20, 30)
+    stats = date_parse_cache_stats()
+    assert stats['hits'] >= before['hits'] + 1
+    assert 0 < stats['hit_rate'] <= 1
+    assert stats['size'] <= stats['max_size'] == DATE_PARSE_CACHE_SIZE
+
+
+def test_parse_known_layouts_same_as_convert_to_dt():
+    values = pd.Series(['UN UNK 2016', '03JAN2020:14:19:05.000', '02---2016', '29/---/2017', '2016-----', '2015/---/--',
+                        '15-FEB-----', 'UN-FEB-2016', '1912', '31---2016', '30FEB2020:00:00:00.000',
+                        '01JAN2020:24:00:00.000', '01XYZ2020:00:00:00.000', '29 Nov 2017', None])
+    for start in [True, False]:
+        converted = _parse_known_layouts(values, start)
+        assert converted[:10].notna().all() and converted[10:].isna().all()
+        for value, result in zip(values, converted):
+            if not pd.isna(result):
+                assert result.to_pydatetime() == convert_to_dt(value, start)
+    assert _parse_known_layouts(values, start=False)[4] == pd.Timestamp(2016, 12, 31)
+
+
+def test_parse_dominant_format():
+    values = pd.Series(['05SEP2021', '02MAR2019', '17mar2022', 'UN UNK 2022', '31FEB2020', '2020-01-01'] * 3, dtype=object)
+    converted = _parse_dominant_format(values, start=True)
+    assert converted[:3].tolist() == [pd.Timestamp(2021, 9, 5), pd.Timestamp(2019, 3, 2), pd.Timestamp(2022, 3, 17)]
+    assert converted[3:6].isna().all()
+
+    # day/month order is ambiguous, left to convert_to_dt
+    assert _parse_dominant_format(pd.Series(['01/02/2020', '03/04/2020']), start=True).isna().all()
+
+
+def test_parse_dominant_format_inexact():
+    # partial dates and microseconds out of the sample are imputed and cut by convert_to_dt, not taken as they are
+    dates = [f'2020-{month:02}-{day:02}' for month in range(1, 13) for day in range(1, 26)]
+    outliers = ['2021-02', '2021-03-04 10:11:12.987654', 'UN UNK 2021']
+    values = pd.Series(dates + outliers, dtype=object)
+    converted = _parse_dominant_format(values, start=False)
+    assert converted[:len(dates)].tolist() == [pd.Timestamp(date) for date in dates]
+    assert converted[len(dates):].isna().all()
+
+    df = convert_date_smart(pd.DataFrame({'AEENDAT': values}), date_column='AEENDAT')
+    assert df['AEENDAT'].tolist() == [convert_to_dt(value, start=False) for value in values]
+    assert df['AEENDAT'][len(dates)] == datetime(2021, 2, 28)
+    assert df['AEENDAT'][len(dates) + 1] == datetime(2021, 3, 4, 10, 11, 12)
+
+
+def test_date_parse_report():
+    report = DateParseReport()
+    set_date_parse_report(report)
+    try:
+        # strings not parsed by other tests, so not in the convert_to_dt cache
+        df = pd.DataFrame({'date': ['2016-01-07', '2016-01-07', '07 Jan 2016', 'not a date at all', None]})
+        with date_parse_scope('AE', 'date', len(df)):
+            convert_date_smart(df, date_column='date')
+        convert_date_format(pd.DataFrame({'date': ['2016-01-01']}), date_column='date', date_format='%Y-%m-%d')
+    finally:
+        set_date_parse_report(None)
+    counters = report.entry('AE', 'date')
+    assert (counters['calls'], counters['rows'], counters['fast'], counters['one by one']) == (1, 5, 0, 5)
+    assert (counters['dateparser'], counters['failures']) == (3, 1)
+    assert report.entry(None, 'date')['fast'] == 1
+    assert set(report.to_frame()['domain']) == {'AE', ''}
+
+
+def test_date_parse_report_cached():
+    report = DateParseReport()
+    set_date_parse_report(report)
+    try:
+        with date_parse_scope('CM', 'date', 3):
+            # a string not parsed by other tests: parsed once, then answered by the cache
+            values = [convert_to_dt('11 Feb 2013 cached') for _ in range(3)]
+    finally:
+        set_date_parse_report(None)
+    assert values[0] == values[1] == values[2]
+    counters = report.entry('CM', 'date')
+    assert (counters['cached'], counters['dateparser']) == (2, 1)
@@ -0,0 +1,69 @@
+import os
+from datetime import datetime
+
+from sdw4_mapping.common.date_memo import DateParseMemo
+from sdw4_mapping.transformations.date_conversions import convert_to_dt, date_parse_fingerprint, set_date_parse_memo
+
+
+def test_date_memo_across_runs(tmp_path):
+    path = os.path.join(tmp_path, 'memo.sqlite')
+    values = ['01 Jan 2016', 'UN UNK 2015', '2012-06-01T10:55:50', 'not a date']
+
+    memo = DateParseMemo(path, date_parse_fingerprint())
+    set_date_parse_memo(memo)
+    try:
+        first = [convert_to_dt(value, start) for value in values for start in (True, False)]
+        memo.close()
+        memo = DateParseMemo(path, date_parse_fingerprint())
+        set_date_parse_memo(memo)
+        second = [convert_to_dt(value, start) for value in values for start in (True, False)]
+    finally:
+        set_date_parse_memo(None)
+        memo.close()
+    assert second == first
+    assert memo.stats == {'hits': 8, 'misses': 0, 'stores': 0, 'invalidations': 0}
+
+
+def test_date_memo_only_stores_results_independent_of_run_date(tmp_path):
+    memo = DateParseMemo(os.path.join(tmp_path, 'memo.sqlite'), 'fingerprint')
+    memo.put('2016', True, datetime(2016, 1, 1))
+    memo.put('01/---/----', True, datetime(datetime.now().year, 1, 1))
+    memo.put('not a date', True, 'not a date')
+    memo.put('31/APR/----', True, f'{datetime.now().year}-4-31 00:00:00')
+    assert memo.get('2016', True) == (True, datetime(2016, 1, 1))
+    assert memo.get('2016', False) == (False, None)
+    assert memo.get('01/---/----', True) == (False, None)
+    assert memo.get('not a date', True) == (True, 'not a date')
+    assert memo.get('31/APR/----', True) == (False, None)
+    memo.close()
+
+
+def test_date_memo_invalidation(tmp_path):
+    path = os.path.join(tmp_path, 'memo.sqlite')
+    memo = DateParseMemo(path, 'dateparser 1')
+    memo.put('2016', True, datetime(2016, 1, 1))
+    memo.close()
+
+    memo = DateParseMemo(path, 'dateparser 2')
+    assert memo.get('2016', True) == (False, None)
+    assert memo.invalidations == 1
+    memo.close()
+
+
+def test_date_memo_read_only(tmp_path):
+    path = os.path.join(tmp_path, 'memo.sqlite')
+    memo = DateParseMemo(path, 'fingerprint')
+    memo.put('2016', True, datetime(2016, 1, 1))
+    memo.flush()
+
+    worker = DateParseMemo(path, 'fingerprint', read_only=True)
+    assert worker.get('2016', True) == (True, datetime(2016, 1, 1))
+    worker.put('2017', True, datetime(2017, 1, 1))
+    worker.close()
+    assert memo.get('2017', True) == (False, None)
+
+    memo.add_results(worker.take_results())
+    memo.close()
+    memo = DateParseMemo(path, 'fingerprint')
+    assert memo.get('2017', True) == (True, datetime(2017, 1, 1))
+    memo.close()
@@ -0,0 +1,74 @@
+import pandas as pd
+from sdw4_mapping.core.domain import Domain
+from sdw4_mapping.core.study import Study
+from sdw4_mapping.transformations.conditions import equals
+
+test_study = Study(id='test_study')
+
+
+def test_defer_filter():
+    demographics = pd.DataFrame({'Subject': ['1', '2'], 'SEX': ['F', 'M']})
+    data = pd.DataFrame({'Subject': ['1', '2', '1'], 'RecordActive': ['1', '0', '1'], 'DAT': ['2016', '2017', 'x']})
+
+    # pushed before the join
+    test_domain = Domain(study=test_study, name='test')
+    test_domain.data = data.copy()
+    test_domain.defer_filter(equals('RecordActive', '1'))
+    test_domain.add_column_constant('DOMAIN', 'test')
+    test_domain.join(demographics, on=['Subject'], columns=['SEX'])
+    assert test_domain.rows_filtered_early == 1
+    assert test_domain.pending_filters == []
+    assert test_domain.data['SEX'].tolist() == ['F', 'F']
+
+    # RecordActive changed before the join: filtered at the end, by its last values
+    test_domain = Domain(study=test_study, name='test')
+    test_domain.data = data.copy()
+    test_domain.defer_filter(equals('RecordActive', '1'))
+    test_domain.data['RecordActive'] = '1'
+    test_domain.join(demographics, on=['Subject'], columns=['SEX'])
+    test_domain.data['RecordActive'] = ['1', '0', '0']
+    assert len(test_domain.pending_filters) == 1
+    test_domain.apply_pending_filters()
+    assert test_domain.rows_filtered_early == 0
+    assert test_domain.data['Subject'].tolist() == ['1']
+
+
+def test_defer_filter_right_join(tmp_path):
+    demographics = pd.DataFrame({'Subject': ['1', '2', '3'], 'SEX': ['F', 'M', 'F']})
+    data = pd.DataFrame({'Subject': ['1', '2'], 'RecordActive': ['1', '0'], 'DAT': ['2016-01-02', '2017-03-04']})
+
+    # the right rows without a match (subject 3) are filtered at the end too, like without defer_filter
+    test_domain = Domain(study=test_study, name='test')
+    test_domain.data = data.copy()
+    test_domain.defer_filter(equals('RecordActive', '1'))
+    test_domain.convert_date('DAT')
+    test_domain.join(demographics, on=['Subject'], columns=['SEX'], how='right')
+    assert test_domain.rows_filtered_early == 0
+    assert len(test_domain.pending_filters) == 1
+    test_domain.to_csv(str(tmp_path))
+    output = pd.read_csv(tmp_path / 'test.csv', dtype=str)
+    assert output['Subject'].tolist() == ['1']
+    assert output['SEX'].tolist() == ['F']
+
+
+
+def test_defer_filter_int_join():
+    demographics = pd.DataFrame({'Subject': ['1'], 'N': [3]})
+    data = pd.DataFrame({'Subject': ['1', '2'], 'RecordActive': ['1', '0']})
+
+    # the join of subject 2 (no match) makes N float: the filter stays after it, like without defer_filter
+    domains = []
+    for defer in [False, True]:
+        test_domain = Domain(study=test_study, name='test')
+        test_domain.data = data.copy()
+        if defer:
+            test_domain.defer_filter(equals('RecordActive', '1'))
+        test_domain.join(demographics, on=['Subject'], columns=['N'])
+        if defer:
+            assert len(test_domain.pending_filters) == 1
+            test_domain.apply_pending_filters()
+        else:
+            test_domain.filter_rows(equals('RecordActive', '1'))
+        domains.append(test_domain.data)
+    assert domains[1]['N'].tolist() == [3.0] and domains[1]['N'].dtype.kind == 'f'
+    assert domains[1].equals(domains[0])
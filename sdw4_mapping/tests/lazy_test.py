@@ -0,0 +1,30 @@
+import pandas as pd
+from sdw4_mapping.core.domain import Domain, set_lazy
+from sdw4_mapping.core.study import Study
+from sdw4_mapping.transformations.conditions import equals
+
+test_study = Study(id='test_study')
+
+
+def test_lazy():
+    demographics = pd.DataFrame({'Subject': ['1', '2'], 'SEX': ['F', 'M']})
+    data = pd.DataFrame({'Subject': ['1', '2', '1'], 'RecordActive': ['1', '0', '1'], 'Z': ['z', 'z', 'z']})
+    domains = []
+    for lazy in [False, True]:
+        set_lazy(lazy)
+        try:
+            test_domain = Domain(study=test_study, name='test')
+            test_domain.data = data.copy()
+            test_domain.add_column_constant('DOMAIN', 'test')
+            test_domain.drop_columns('Z')
+            test_domain.join(demographics, on=['Subject'], columns={'SEX': 'GENDER'})
+            test_domain.filter_rows(equals('RecordActive', '1'))
+        finally:
+            set_lazy(False)
+        assert len(test_domain.plan.steps) == (3 if lazy else 0)
+        domains.append(test_domain)
+
+    domains[1].explain()
+    eager, lazy = domains[0].data, domains[1].data
+    assert not domains[1].plan
+    assert lazy.reset_index(drop=True).equals(eager.reset_index(drop=True))
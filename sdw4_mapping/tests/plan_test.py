@@ -0,0 +1,49 @@
+import pandas as pd
+
+from sdw4_mapping.core.plan import Constants, Filter, Operation, Plan, Projection
+from sdw4_mapping.transformations import preparation as sdw_pr
+from sdw4_mapping.transformations.conditions import equals
+
+
+def _data() -> pd.DataFrame:
+    return pd.DataFrame({'A': ['1', '0', '1'], 'K': ['a', 'b', 'c'], 'Z': ['z', 'z', 'z']})
+
+
+def test_column_operations_merged():
+    plan = Plan()
+    plan.add_column_operation('add', lambda df: sdw_pr.add_column_constant(df, 'DOMAIN', 'X'))
+    plan.add_column_operation('drop', lambda df: sdw_pr.drop_columns(df, 'Z'))
+    plan.add_column_operation('rename', lambda df: sdw_pr.rename_columns(df, {'A': 'ACT', 'K': 'DOMAIN'}))
+    plan.add_column_operation('set', lambda df: sdw_pr.set_columns(df, ['DOMAIN', 'ACT', 'NEW']))
+
+    steps = plan.optimize(_data())
+    assert len(steps) == 1 and isinstance(steps[0], Projection)
+    df = plan.run(_data())
+    assert df.columns.tolist() == ['DOMAIN', 'ACT', 'NEW']
+    assert df['DOMAIN'].tolist() == ['a', 'b', 'c']
+    assert df['NEW'].isna().all()
+
+
+def test_filter_pushed_down_and_constants_added_last():
+    right = pd.DataFrame({'K': ['a', 'b'], 'V': ['va', 'vb']})
+
+    def join(df):
+        return sdw_pr.join(df, right, on='K', columns=['V'])
+
+    plan = Plan()
+    plan.add_column_operation('add', lambda df: sdw_pr.add_column_constant(df, 'DOMAIN', 'X'))
+    plan.add(Operation('join', join, reads=frozenset(['K']), writes=frozenset(['V', 'V_JOIN', 'K_JOIN']),
+                       filter_commutes=True, constants_commute=True))
+    plan.add(Filter(equals('A', '1')))
+
+    steps = plan.optimize(_data())
+    assert [type(step) for step in steps] == [Filter, Operation, Constants]
+    assert '1. filter A == \'1\'' in plan.explain(_data())
+
+    expected = sdw_pr.filter_rows(join(sdw_pr.add_column_constant(_data(), 'DOMAIN', 'X')), equals('A', '1'))
+    df = plan.run(_data())
+    assert df.reset_index(drop=True).equals(expected.reset_index(drop=True))
+
+    # the filter reads a joined column: it stays after the join
+    plan.steps[-1] = Filter(equals('V', 'va'))
+    assert [type(step) for step in plan.optimize(_data())] == [Operation, Filter, Constants]
@@ -2,7 +2,8 @@ import numpy as np
 import pandas as pd
 from sdw4_mapping.transformations.preparation import map_column, add_column_constant, rename_columns, copy_columns, \
     drop_columns, filter_rows, unpivot, set_columns, join, add_conditional_value, compute_ratio, split, get_substring, \
-    to_uppercase, unpivot2_bulk, unpivot2
+    to_uppercase, unpivot2_bulk, unpivot2, prune_columns
+from sdw4_mapping.transformations.conditions import equals, is_in, isnull, notnull
 
 
 def test_rename_columns_successful():
@@ -81,6 +82,15 @@ def test_drop_columns_one_successful():
     assert test_df.columns.tolist() == ['idx', 'VALUES']
 
 
+def test_prune_columns_successful():
+    test_df = pd.DataFrame([[0, '15 Sep 2017', '2017', 'Sep', '1']],
+                           columns=['idx', 'VALUES', 'VALUES_YYYY', 'VALUES_MM', 'RecordActive'])
+    pruned_df = prune_columns(df=test_df, columns=['idx', 'absent'], patterns=['_YYYY$', '_MM$'])
+    assert pruned_df.columns.tolist() == ['VALUES', 'RecordActive']
+    assert test_df.columns.tolist() == ['idx', 'VALUES', 'VALUES_YYYY', 'VALUES_MM', 'RecordActive']
+    assert prune_columns(df=test_df, columns=['absent'], patterns=['_DD$']) is test_df
+
+
 def test_filter_successful():
     test_df = pd.DataFrame([[0, None], [1, '15 Sep 2017'], [2, None]], columns=['idx', 'VALUES'])
     test_df = filter_rows(df=test_df, filter_function=pd.notnull, column='VALUES')
@@ -102,6 +112,38 @@ def test_filter_lambda_successful():
     assert test_df['VALUES'].values[0] == '15 Sep 2017'
 
 
+def test_filter_condition_successful():
+    test_df = pd.DataFrame({
+        'idx': [0, 1, 2, 3, 4],
+        'ACTIVE': ['1', '0', '1', '1', None],
+        'VALUES': [None, '15 Sep 2017', '15 Sep 2017', 'example', np.nan],
+        'DATE': pd.to_datetime(['2017-09-15', None, '2017-09-15', '2017-09-16', None]),
+    })
+    conditions = [
+        equals('ACTIVE', '1'),
+        equals('DATE', '2017-09-15'),
+        is_in('VALUES', ['15 Sep 2017', 'example']),
+        notnull('VALUES'),
+        isnull('DATE'),
+        equals('ACTIVE', '1') & notnull('VALUES'),
+        ~equals('ACTIVE', '1') | equals('VALUES', 'example'),
+    ]
+    functions = [
+        lambda r: r['ACTIVE'] == '1',
+        lambda r: r['DATE'] == '2017-09-15',
+        lambda r: r['VALUES'] in ['15 Sep 2017', 'example'],
+        lambda r: pd.notnull(r['VALUES']),
+        lambda r: pd.isnull(r['DATE']),
+        lambda r: r['ACTIVE'] == '1' and pd.notnull(r['VALUES']),
+        lambda r: not r['ACTIVE'] == '1' or r['VALUES'] == 'example',
+    ]
+    for condition, function in zip(conditions, functions):
+        expected = filter_rows(df=test_df, filter_function=function)
+        assert filter_rows(df=test_df, filter_function=condition).equals(expected), str(condition)
+        assert [condition(row) for _, row in test_df.iterrows()] == [function(row) for _, row in test_df.iterrows()]
+    assert (equals('ACTIVE', '1') & notnull('VALUES')).columns == {'ACTIVE', 'VALUES'}
+
+
 def test_unpivot():
     test_df = pd.DataFrame({
         'name': ['Alice', 'Bob'],
@@ -267,6 +309,40 @@ def test_join_left_right_on():
     assert df['values_JOIN'].values.tolist() == [4.0, None, 6.0]
 
 
+def test_join_key_index():
+    left = pd.DataFrame({'idnum': ['1', '2', None, '4'], 'value': [1, 2, 3, 4]}, index=[3, 3, 1, 0])
+    right = pd.DataFrame({'idnum': ['2', '1', '3'], 'value': [20, 10, 30], 'other': ['b', 'a', 'c']})
+
+    # many-to-one joins look the left keys up in the same index of the right keys
+    df = join(left, right, on=['idnum'], columns=['value'])
+    assert list(df.columns) == ['idnum', 'value', 'value_JOIN']
+    assert df['value_JOIN'].tolist()[:2] == [10, 20]
+    assert df['value_JOIN'].isna().tolist() == [False, False, True, True]
+    assert df.index.tolist() == [0, 1, 2, 3]
+    df = join(df, right, on='idnum', columns={'other': 'OTHER'})
+    assert df['OTHER'].tolist() == ['a', 'b', None, None]
+
+    # duplicated right keys are merged as before: a left row per matching right row
+    right = pd.concat([right, right.iloc[:1]], ignore_index=True)
+    df = join(left, right, on=['idnum'], columns=['value'])
+    assert df['value'].tolist() == [1, 2, 2, 3, 4]
+    assert df['value_JOIN'].tolist()[:3] == [10, 20, 20]
+    assert df['value_JOIN'].isna().sum() == 2
+
+
+def test_join_key_index_after_key_change():
+    left = pd.DataFrame({'idnum': ['1', '2']})
+    right = pd.DataFrame({'idnum': ['1', '2'], 'value': ['a', 'b']})
+    assert join(left, right, on='idnum', columns=['value'])['value'].tolist() == ['a', 'b']
+
+    # a key changed in place (same buffer): the index of the right keys is built again
+    right.loc[0, 'idnum'] = '2'
+    right.loc[1, 'idnum'] = '1'
+    assert join(left, right, on='idnum', columns=['value'])['value'].tolist() == ['b', 'a']
+    right['idnum'].to_numpy()[0] = '3'
+    assert join(left, right, on='idnum', columns=['value'])['value'].tolist() == ['b', None]
+
+
 def test_add_conditional_value():
     test_df = pd.DataFrame({
         'idx': [0, 1, 2],
@@ -0,0 +1,45 @@
+import os
+
+import pandas as pd
+from sdw4_mapping.common.snapshot import SnapshotCache
+from sdw4_mapping.common.utils import read_data
+
+
+def _write_csv(path, rows):
+    pd.DataFrame(rows, columns=['Subject', 'AESTDAT']).to_csv(path, index=False)
+
+
+def test_snapshot_hit_and_miss(tmp_path):
+    data_path = os.path.join(tmp_path, 'ae.csv')
+    _write_csv(data_path, [['1001', '01JAN2020'], ['1002', '']])
+    cache = SnapshotCache()
+
+    first = read_data(data_path, usecols=None, snapshot_cache=cache)
+    second = read_data(data_path, usecols=None, snapshot_cache=cache)
+    assert cache.stats == {'hits': 1, 'misses': 1, 'invalidations': 0}
+    assert second.equals(first)
+    assert second['AESTDAT'].values.tolist() == ['01JAN2020', '']
+
+
+def test_snapshot_per_usecols(tmp_path):
+    data_path = os.path.join(tmp_path, 'ae.csv')
+    _write_csv(data_path, [['1001', '01JAN2020']])
+    cache = SnapshotCache()
+
+    read_data(data_path, usecols=None, snapshot_cache=cache)
+    df = read_data(data_path, usecols=['Subject'], snapshot_cache=cache)
+    assert df.columns.tolist() == ['Subject']
+    assert cache.misses == 2
+
+
+def test_snapshot_invalidation(tmp_path):
+    data_path = os.path.join(tmp_path, 'ae.csv')
+    _write_csv(data_path, [['1001', '01JAN2020']])
+    cache = SnapshotCache(folder=os.path.join(tmp_path, 'snapshots'))
+    read_data(data_path, usecols=None, snapshot_cache=cache)
+
+    _write_csv(data_path, [['1001', '02JAN2020']])
+    df = read_data(data_path, usecols=None, snapshot_cache=cache)
+    assert df['AESTDAT'].values.tolist() == ['02JAN2020']
+    assert cache.stats == {'hits': 0, 'misses': 2, 'invalidations': 1}
+    assert len(os.listdir(os.path.join(tmp_path, 'snapshots'))) == 1
@@ -1,7 +1,9 @@
+import io
 import os
 
 import pandas as pd
-from sdw4_mapping.common.utils import save_to_csv, StringConverter
+from sdw4_mapping.common.utils import save_to_csv, StringConverter, read_csv_strings, ColumnProjection, \
+    encode_categories, memory_usage
 from sdw4_mapping.core.study import Study
 
 
@@ -26,3 +28,49 @@ def test_string_converter():
     test_df = pd.read_csv(test_study.input_folder + 'AE.csv', converters=StringConverter())
     assert isinstance(test_df[test_df.columns[4]][0], str)
     assert isinstance(test_df[test_df.columns[7]][0], str)
+
+
+def test_read_csv_strings_same_as_string_converter():
+    csv = 'a,b,c,d\n1,,NA, x \n"",nan,"q,r",N/A\n2.50,NULL,,\n'
+    expected = pd.read_csv(io.StringIO(csv), converters=StringConverter())
+    test_df = read_csv_strings(io.StringIO(csv))
+    assert test_df.equals(expected)
+    assert test_df.values.tolist() == [['1', '', 'NA', ' x '], ['', 'nan', 'q,r', 'N/A'], ['2.50', 'NULL', '', '']]
+
+
+def test_read_csv_strings_usecols_and_empty():
+    test_df = read_csv_strings(io.StringIO('a,b,c\n1,2,3\n'), usecols=['a', 'c'])
+    assert test_df.columns.tolist() == ['a', 'c']
+    assert test_df['c'].values.tolist() == ['3']
+
+    expected = pd.read_csv(io.StringIO('a,b\n'), converters=StringConverter())
+    assert read_csv_strings(io.StringIO('a,b\n')).equals(expected)
+
+
+def test_column_projection():
+    csv = 'Subject,subjectId,AESTDAT,AESTDAT_RAW,S_DM_AGEY_STD,Site\n1001,1,01JAN2020,1/1/2020,30,A\n'
+    projection = ColumnProjection(drop=['subjectId', 'Site'], drop_patterns=['_RAW', '_STD'], keep=['S_DM_AGEY_STD'])
+    test_df = read_csv_strings(io.StringIO(csv), usecols=projection)
+    assert test_df.columns.tolist() == ['Subject', 'AESTDAT', 'S_DM_AGEY_STD']
+    assert projection.apply(read_csv_strings(io.StringIO(csv))).equals(test_df)
+
+    assert ColumnProjection(columns=['AESTDAT', 'Subject']).apply(test_df).columns.tolist() == ['Subject', 'AESTDAT']
+    assert projection == ColumnProjection(drop=['Site', 'subjectId'], drop_patterns=['_RAW', '_STD'],
+                                          keep=['S_DM_AGEY_STD'])
+    assert projection != ColumnProjection(drop=['Site', 'subjectId'])
+
+
+def test_encode_categories():
+    test_df = pd.DataFrame({'RecordActive': ['1', '1', '0', '1', '1'], 'Folder': ['V1', 'V1', 'V2', 'V1', 'V2'],
+                            'RecordId': ['1', '2', '3', '4', '5']})
+    before = memory_usage(test_df)
+    encode_categories(test_df, columns=['RecordActive'])
+    assert test_df['RecordActive'].dtype == 'category'
+    assert test_df['Folder'].dtype == object
+    assert test_df[test_df['RecordActive'] == '1']['RecordId'].tolist() == ['1', '2', '4', '5']
+    assert test_df.to_csv(index=False).splitlines()[3] == '0,V2,3'
+
+    encode_categories(test_df, max_categories=2)
+    assert test_df['Folder'].dtype == 'category'
+    assert test_df['RecordId'].dtype == object
+    assert memory_usage(test_df) < before
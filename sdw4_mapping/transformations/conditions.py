@@ -0,0 +1,164 @@
+from abc import ABC, abstractmethod
+from typing import Any, FrozenSet, Iterable
+
+import numpy as np
+import pandas as pd
+
+
+class Condition(ABC):
+    """
+    Condition on the rows of a dataframe for filter_rows, evaluated on whole columns instead of row by row.
+    Conditions are made by equals, is_in, notnull and isnull and combined by & (and), | (or) and ~ (not), e.g.
+
+        equals('RecordActive', '1') & notnull('DSSTDTC')
+
+    keeps the same rows as lambda r: r['RecordActive'] == '1' and pd.notnull(r['DSSTDTC']).
+    A condition can also be called on a row like a filter function.
+    """
+
+    @abstractmethod
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Returns a boolean array, True for the rows satisfying the condition.
+        """
+
+    @property
+    @abstractmethod
+    def columns(self) -> FrozenSet[str]:
+        """
+        Columns the condition reads.
+        """
+
+    def __call__(self, row: pd.Series) -> bool:
+        return bool(self.mask(row.to_frame().T)[0])
+
+    def __and__(self, other: 'Condition') -> 'Condition':
+        return _And(self, other)
+
+    def __or__(self, other: 'Condition') -> 'Condition':
+        return _Or(self, other)
+
+    def __invert__(self) -> 'Condition':
+        return _Not(self)
+
+    def __repr__(self):
+        return str(self)
+
+
+class _ColumnCondition(Condition):
+
+    def __init__(self, column: str) -> None:
+        self.column = column
+
+    @property
+    def columns(self) -> FrozenSet[str]:
+        return frozenset([self.column])
+
+
+class _Equals(_ColumnCondition):
+
+    def __init__(self, column: str, value: Any) -> None:
+        super().__init__(column)
+        self.value = value
+
+    def __str__(self):
+        return f'{self.column} == {self.value!r}'
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        series = df[self.column]
+        if series.dtype.kind in 'mM':
+            # pandas would parse a string value as a date, a row value is compared as it is
+            return series.to_numpy(dtype=object) == self.value
+        return (series == self.value).to_numpy(dtype=bool)
+
+
+class _IsIn(_ColumnCondition):
+
+    def __init__(self, column: str, values: Iterable[Any]) -> None:
+        super().__init__(column)
+        self.values = list(values)
+
+    def __str__(self):
+        return f'{self.column} in {self.values!r}'
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        return df[self.column].isin(self.values).to_numpy(dtype=bool)
+
+
+class _NotNull(_ColumnCondition):
+
+    def __str__(self):
+        return f'{self.column} is not null'
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        return df[self.column].notna().to_numpy(dtype=bool)
+
+
+class _Not(Condition):
+
+    def __init__(self, condition: Condition) -> None:
+        self.condition = condition
+
+    def __str__(self):
+        return f'not ({self.condition})'
+
+    @property
+    def columns(self) -> FrozenSet[str]:
+        return self.condition.columns
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        return ~self.condition.mask(df)
+
+
+class _And(Condition):
+
+    def __init__(self, left: Condition, right: Condition) -> None:
+        self.left = left
+        self.right = right
+
+    def __str__(self):
+        return f'({self.left}) and ({self.right})'
+
+    @property
+    def columns(self) -> FrozenSet[str]:
+        return self.left.columns | self.right.columns
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        return self.left.mask(df) & self.right.mask(df)
+
+
+class _Or(_And):
+
+    def __str__(self):
+        return f'({self.left}) or ({self.right})'
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        return self.left.mask(df) | self.right.mask(df)
+
+
+def equals(column: str, value: Any) -> Condition:
+    """
+    Rows where the column equals the value, as row[column] == value.
+    """
+    return _Equals(column, value)
+
+
+def is_in(column: str, values: Iterable[Any]) -> Condition:
+    """
+    Rows where the column has one of the values.
+    """
+    return _IsIn(column, values)
+
+
+def notnull(column: str) -> Condition:
+    """
+    Rows where the column is not null (None, NaN, NaT), as pd.notnull(row[column]).
+    """
+    return _NotNull(column)
+
+
+def isnull(column: str) -> Condition:
+    """
+    Rows where the column is null (None, NaN, NaT), as pd.isnull(row[column]).
+    """
+    return _Not(_NotNull(column))
@@ -1,10 +1,34 @@
+import calendar
+import json
 import logging
 import re
+import threading
+import time
 from calendar import monthrange
 from datetime import date, datetime
-from typing import Optional, Union
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple, Union
 import dateparser
+import numpy as np
 import pandas as pd
+from sdw4_mapping.common.date_memo import DateParseMemo
+from sdw4_mapping.common.date_report import DateParseReport
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+# Number of (string, start) pairs kept by the convert_to_dt cache
+DATE_PARSE_CACHE_SIZE = 65536
+# Version of convert_to_dt parsing, part of the date parse memo fingerprint: change it when parsing changes
+DATE_PARSE_VERSION = 1
+# Number of distinct values of a column sampled to find its dominant format
+FORMAT_SAMPLE_SIZE = 100
+# Formats of SAS exports pandas doesn't guess, tried when it can't guess a format
+SAS_DATE_FORMATS = ['%d%b%Y', '%d%b%Y:%H:%M:%S']
 
 
 def convert_to_dt(dt: Union[str, date, None], start: bool = True) -> Optional[str]:
@@ -14,25 +38,134 @@ def convert_to_dt(dt: Union[str, date, None], start: bool = True) -> Optional[st
     Before dataparser checks for patterns using _check_regexp method.
     Cuts timezone and microseconds if exist.
     Some invalid parsing will be set as None.
+    Results for strings are kept in a process-wide LRU cache, see date_parse_cache_stats, and in the date parse memo
+    across runs if one is set by set_date_parse_memo.
+    """
+    if isinstance(dt, str):
+        _scope.parsed = False
+        converted_dt = _parse_dt_cached(dt, start)
+        # answered by the cache or the memo unless _parse_dt_memo parsed it
+        if not _scope.parsed:
+            _count('cached')
+        return converted_dt
+    return _parse_dt(dt, start)
+
+
+def date_parse_cache_stats() -> Dict[str, Union[int, float]]:
+    """
+    Returns hits, misses, hit rate and size of the convert_to_dt cache.
+    """
+    info = _parse_dt_cached.cache_info()
+    calls = info.hits + info.misses
+    return {'hits': info.hits, 'misses': info.misses, 'hit_rate': info.hits / calls if calls else 0.0,
+            'size': info.currsize, 'max_size': info.maxsize}
+
+
+def set_date_parse_memo(memo: Optional[DateParseMemo]) -> None:
+    """
+    Makes convert_to_dt look up strings in the memo before parsing them and store the new results in it (None stops
+    using a memo). Clears the convert_to_dt cache.
+    """
+    global _date_parse_memo
+    _date_parse_memo = memo
+    _parse_dt_cached.cache_clear()
+
+
+def date_parse_fingerprint() -> str:
+    """
+    Returns the fingerprint of the date parsing: version of the parsing code, dateparser version and its settings.
+    """
+    return json.dumps({'version': DATE_PARSE_VERSION, 'dateparser': dateparser.__version__,
+                       'settings': [_dateparser_settings(True), _dateparser_settings(False)]}, sort_keys=True)
+
+
+def set_date_parse_report(report: Optional[DateParseReport]) -> None:
+    """
+    Makes the date conversions count and time themselves in the report (None stops reporting).
     """
+    global _date_parse_report
+    _date_parse_report = report
+
+
+@contextmanager
+def date_parse_scope(domain: Optional[str], column: str, rows: int):
+    """
+    Reports the date conversions run inside to (domain, column), with the rows in and the wall time.
+    In nested scopes, the conversions are reported to the outermost one.
+    """
+    report = _date_parse_report
+    if report is None or getattr(_scope, 'entry', None) is not None:
+        yield
+        return
+    entry = report.entry(domain, column)
+    entry['calls'] += 1
+    entry['rows'] += rows
+    _scope.entry = entry
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry['seconds'] += time.perf_counter() - started
+        _scope.entry = None
+
+
+def _count(counter: str, value: int = 1) -> None:
+    report = _date_parse_report
+    if report is not None:
+        entry = getattr(_scope, 'entry', None)
+        if entry is None:
+            entry = report.entry(None, None)
+        entry[counter] += value
+
+
+def _dateparser_settings(start: bool) -> Dict[str, str]:
+    return {'PREFER_DAY_OF_MONTH': 'first' if start else 'last', 'PREFER_DATES_FROM': 'past'}
+
+
+def _parse_dt_memo(dt: str, start: bool = True) -> Optional[str]:
+    memo = _date_parse_memo
+    if memo is None:
+        _scope.parsed = True
+        return _parse_dt(dt, start)
+    found, converted_dt = memo.get(dt, start)
+    if not found:
+        _scope.parsed = True
+        converted_dt = _parse_dt(dt, start)
+        memo.put(dt, start, converted_dt)
+    return converted_dt
+
+
+def _parse_dt(dt: Union[str, date, None], start: bool = True) -> Optional[str]:
     converted_dt = dt
     if dt is not None and not isinstance(dt, date):
-        dt = _check_regexp(dt, start=start)
+        checked_dt = _check_regexp(dt, start=start)
+        if checked_dt != dt:
+            _count('regexp')
+        dt = checked_dt
         if not isinstance(dt, date) and dt is not None:
+            _count('dateparser')
             try:
-                converted_dt = dateparser.parse(dt, settings={'PREFER_DAY_OF_MONTH': 'first' if start else 'last',
-                                                              'PREFER_DATES_FROM': 'past'})
+                converted_dt = dateparser.parse(dt, settings=_dateparser_settings(start))
                 if converted_dt is None:
+                    _count('failures')
                     logging.debug(f'Wrong date format: {dt}')
                     return dt
                 else:
                     if converted_dt.microsecond != 0:
                         converted_dt = converted_dt.replace(microsecond=0).replace(tzinfo=None)
             except ValueError:
+                _count('failures')
                 logging.debug(f'Wrong date format: {dt}')
     return converted_dt
 
 
+_parse_dt_cached = lru_cache(maxsize=DATE_PARSE_CACHE_SIZE)(_parse_dt_memo)
+_date_parse_memo: Optional[DateParseMemo] = None
+_date_parse_report: Optional[DateParseReport] = None
+# date_parse_scope entry of the thread, and whether _parse_dt_memo parsed the last string of convert_to_dt
+_scope = threading.local()
+
+
 def convert_date_smart(df: pd.DataFrame, date_column: str, only_date: bool = False, start: bool = None) -> pd.DataFrame:
     """
     Tries to identify date format automatically and convert column values.
@@ -40,52 +173,254 @@ def convert_date_smart(df: pd.DataFrame, date_column: str, only_date: bool = Fal
     period (year or month) will be used to fill gaps in partial date, else - the beginning of the period. Also user can
     set this parameter "start" by himself to True or False.
     Firstly uses pandas.to_datetime function, if even one values from column wasn't converted successfully, raises an exception.
-    If an exceptions raised, tries to convert to datetime format with  using convert_to_dt method.
-    But it is much slower!!! Because dateparser parses date by date.
+    If an exceptions raised, converts the distinct values of the column: the ones in the dominant format of the column
+    (found on a sample) by pandas.to_datetime with that format, the ones in layouts known by _check_regexp directly,
+    and the others by convert_to_dt method.
+    But it is much slower!!! Because dateparser parses date by date (each distinct value is parsed only once).
+    Logs how many rows were converted each way.
     By setting only_date to True, can cut converted datetimes to dates.
+    Counts and times itself in the date parse report if one is set by set_date_parse_report.
     Returns dataframe with converted values in the column.
     """
-    try:
-        if start is None:
-            start = False if date_column.endswith("ENDTC") or date_column.endswith("ENDAT") else True
-
-        if pd.api.types.is_string_dtype(df[date_column]):
-            df[date_column] = df[date_column].str.strip()
+    with date_parse_scope(None, date_column, len(df)):
         try:
-            df[date_column] = pd.to_datetime(df[date_column], errors='raise', infer_datetime_format=True)
-        except:
-            logging.debug("Couldn't parse date column by pandas.to_datetime, trying to parse date by date...")
-            df[date_column] = df[date_column].apply(convert_to_dt, args=(start,))
+            if start is None:
+                start = False if date_column.endswith("ENDTC") or date_column.endswith("ENDAT") else True
 
-        if only_date:
-            df[date_column] = df[date_column].dt.date
-    except Exception as e:
-        if date_column not in df.columns:
-            logging.error(f'There is no such column {date_column} in the data!')
-        else:
-            logging.error(e)
+            if pd.api.types.is_string_dtype(df[date_column]):
+                df[date_column] = df[date_column].str.strip()
+            try:
+                df[date_column] = pd.to_datetime(df[date_column], errors='raise', infer_datetime_format=True)
+                logging.info(f'Converted {date_column} rows - pandas.to_datetime: {len(df)}')
+                _count('fast', len(df))
+            except:
+                logging.debug("Couldn't parse date column by pandas.to_datetime, trying to parse date by date...")
+                counts = {}
+                vectorized = [('dominant format', lambda values: _parse_dominant_format(values, start)),
+                              ('known layouts', lambda values: _parse_known_layouts(values, start))]
+                df[date_column] = _apply_unique(df[date_column], lambda value: convert_to_dt(value, start),
+                                                vectorized=vectorized, counts=counts)
+                logging.info(f'Converted {date_column} rows - ' +
+                             ', '.join(f'{way}: {rows}' for way, rows in counts.items()))
+                _count('fast', counts.get('dominant format', 0) + counts.get('known layouts', 0))
+                _count('one by one', counts['one by one'])
+
+            if only_date:
+                df[date_column] = df[date_column].dt.date
+        except Exception as e:
+            if date_column not in df.columns:
+                logging.error(f'There is no such column {date_column} in the data!')
+            else:
+                logging.error(e)
     return df
 
 
+def _apply_unique(series: pd.Series, function: Callable, vectorized: List[Tuple[str, Callable]] = (),
+                  counts: Dict[str, int] = None) -> pd.Series:
+    """
+    Gives the same result as series.apply(function), but calls the function once per distinct value.
+    Null values (None, NaN, NaT) are passed to the function once per type.
+    "vectorized" is a list of (name, converter) tried in order before the function: a converter gets all the
+    distinct values left at once and returns datetimes for those it can convert (NaT for the others).
+    If "counts" dictionary is given, the number of rows converted by each way is added to it.
+    """
+    codes, mapped = _map_unique(series, function, vectorized=vectorized, counts=counts)
+    result = mapped.take(codes)
+
+    # like apply, a column of NaN only is float
+    if len(result) and pd.api.types.infer_dtype(result, skipna=False) == 'floating':
+        result = result.astype(float)
+    return pd.Series(result, index=series.index, name=series.name)
+
+
+def _map_unique(series: pd.Series, function: Callable, vectorized: List[Tuple[str, Callable]] = (),
+                counts: Dict[str, int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calls the function once per distinct value of the series (once per type of null value) and returns codes and
+    results: the result for the row i is results[codes[i]]. "vectorized" and "counts" are the same as in _apply_unique.
+    """
+    # on an object array, factorize keeps the distinct values as they are (a pandas Index could infer datetimes)
+    codes, uniques = pd.factorize(series.to_numpy() if series.dtype == object else series)
+    uniques = np.asarray(uniques, dtype=object)
+    rows = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    mapped = np.empty(len(uniques), dtype=object)
+    pending = np.ones(len(uniques), dtype=bool)
+    for name, converter in vectorized:
+        if not pending.any():
+            break
+        converted = converter(pd.Series(uniques[pending], dtype=object))
+        done = converted.notna().to_numpy()
+        positions = np.flatnonzero(pending)[done]
+        mapped[positions] = converted[done].dt.to_pydatetime()
+        pending[positions] = False
+        if counts is not None:
+            counts[name] = int(rows[positions].sum())
+    mapped[pending] = [function(value) for value in uniques[pending]]
+    if counts is not None:
+        counts['one by one'] = int(rows[pending].sum()) + int((codes == -1).sum())
+
+    null_positions = np.flatnonzero(codes == -1)
+    if len(null_positions):
+        values = series.to_numpy(dtype=object)
+        null_codes = {}
+        null_results = []
+        for position in null_positions:
+            value = values[position]
+            if type(value) not in null_codes:
+                null_codes[type(value)] = len(mapped) + len(null_results)
+                null_results.append(function(value))
+            codes[position] = null_codes[type(value)]
+        nulls = np.empty(len(null_results), dtype=object)
+        nulls[:] = null_results
+        mapped = np.concatenate([mapped, nulls])
+    return codes, mapped
+
+
+def _parse_dominant_format(values: pd.Series, start: bool) -> pd.Series:
+    """
+    Finds the most common format on a sample of the values and converts all the values in that format at once by
+    pandas.to_datetime, NaT for the others (not written exactly in that format).
+    Only full dates formats without microseconds and timezone, with month name or year first (no day/month order
+    ambiguity) are used, and only if the sample converted this way gives the same as convert_to_dt: convert_to_dt
+    imputes partial dates and cuts microseconds, its results are kept.
+    """
+    strings = values[values.map(type) == str]
+    if strings.empty:
+        return pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    sample = strings.sample(min(FORMAT_SAMPLE_SIZE, len(strings)), random_state=0)
+    formats = Counter(_guess_format(value) for value in sample)
+    date_format, occurrences = formats.most_common(1)[0]
+    if (date_format is None or occurrences * 2 < len(sample)
+            or not all(directive in date_format for directive in ('%Y', '%d'))
+            or not ('%b' in date_format or '%B' in date_format or date_format.startswith('%Y-%m-%d'))
+            or any(directive in date_format for directive in ('%f', '%z', '%Z'))):
+        return pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+
+    converted = pd.to_datetime(strings, format=date_format, errors='coerce')
+    # to_datetime also takes partial or longer strings for the ISO formats (e.g. '2021-02' or microseconds): only the
+    # strings written exactly in the format are kept, the others are left to convert_to_dt
+    exact = converted.dt.strftime(date_format).str.upper() == strings.str.upper()
+    converted = converted.where(exact).reindex(values.index)
+    checked = converted[sample.index].dropna()
+    if any(convert_to_dt(values[index], start) != timestamp.to_pydatetime() for index, timestamp in checked.items()):
+        logging.debug(f'Format {date_format} gives other dates than convert_to_dt, not used')
+        return pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    return converted
+
+
+def _guess_format(value: str) -> Optional[str]:
+    date_format = guess_datetime_format(value)
+    if date_format is None:
+        for sas_format in SAS_DATE_FORMATS:
+            try:
+                datetime.strptime(value, sas_format)
+                return sas_format
+            except ValueError:
+                pass
+    return date_format
+
+
+# Layouts recognized by _check_regexp, in the same order: patterns, then slices of year, month, day and time parts.
+# None means the part is missing and imputed like _combine_partial_date does.
+_KNOWN_LAYOUTS = [
+    ([r"UN UNK \d\d\d\d*$"], slice(-4, None), None, None, None),
+    ([r"\d{2}\w{3}\d{4}:\d{2}:\d{2}:\d{2}.\d{3}"], slice(5, 9), slice(2, 5), slice(0, 2),
+     (slice(10, 12), slice(13, 15), slice(16, 18))),
+    ([r"\d{2}---\d{4}", r"\d{2}[-/]---[-/]\d{4}"], slice(-4, None), None, slice(0, 2), None),
+    ([r"\d{4}-----", r"\d{4}[-/]---[-/]--"], slice(0, 4), None, None, None),
+    ([r"\d{2}[-/]\w{3}[-/]----"], None, slice(3, 6), slice(0, 2), None),
+    ([r"UN[-/\s+]\w{3}[-/\s+]\d{2}"], slice(-4, None), slice(3, 6), None, None),
+]
+
+_MONTH_ABBREVIATIONS = {name.upper(): number for number, name in enumerate(calendar.month_abbr) if name}
+
+
+def _parse_known_layouts(values: pd.Series, start: bool) -> pd.Series:
+    """
+    Vectorized convert_to_dt for the strings in one of the layouts recognized by _check_regexp (and 4 characters
+    years). Extracts date parts of all the values at once, imputes missing parts like _combine_partial_date and builds
+    datetimes directly instead of passing a rewritten string to dateparser.
+    Returns datetimes, NaT for values in no known layout or with parts which are not plain numbers (or month names)
+    of a valid date: convert_to_dt must be used for them.
+    """
+    year, month, day = (pd.Series(np.nan, index=values.index) for _ in range(3))
+    hour, minute, second = (pd.Series(0.0, index=values.index) for _ in range(3))
+    unmatched = values.map(type) == str
+
+    def number(parts: pd.Series) -> pd.Series:
+        return pd.to_numeric(parts.where(parts.str.fullmatch(r'[0-9]+', na=False)), errors='coerce')
+
+    def month_number(parts: pd.Series) -> pd.Series:
+        return number(parts).fillna(parts.str.upper().map(_MONTH_ABBREVIATIONS))
+
+    # the last one is any other 4 characters string, taken as a year
+    for patterns, year_part, month_part, day_part, time_parts in _KNOWN_LAYOUTS + [(None, slice(None), None, None, None)]:
+        strings = values.where(unmatched, '')
+        if patterns is None:
+            match = unmatched & (strings.str.len() == 4)
+        else:
+            match = unmatched & strings.str.match('|'.join(f'(?:{pattern})' for pattern in patterns))
+        if not match.any():
+            continue
+        unmatched &= ~match
+        matched = values[match]
+        year[match] = number(matched.str[year_part]) if year_part is not None else datetime.now().year
+        month[match] = month_number(matched.str[month_part]) if month_part is not None else 1 if start else 12
+        if day_part is not None:
+            day[match] = number(matched.str[day_part])
+        if time_parts is not None:
+            for column, time_part in zip((hour, minute, second), time_parts):
+                column[match] = number(matched.str[time_part])
+
+    # to_datetime would carry over hour 24 or minute 60, dateparser rejects them
+    hour[hour > 23] = np.nan
+    minute[minute > 59] = np.nan
+    second[second > 59] = np.nan
+
+    missing_day = day.isna() & year.notna() & month.notna()
+    if start:
+        day[missing_day] = 1
+    else:
+        day[missing_day] = _to_datetime(pd.DataFrame({'year': year, 'month': month, 'day': 1})[missing_day]) \
+            .dt.days_in_month
+    return _to_datetime(pd.DataFrame({'year': year, 'month': month, 'day': day,
+                                      'hour': hour, 'minute': minute, 'second': second}))
+
+
+def _to_datetime(parts: pd.DataFrame) -> pd.Series:
+    # assembles the rows with all the parts, NaT if the parts are not a valid datetime
+    complete = parts.notna().all(axis=1)
+    result = pd.Series(pd.NaT, index=parts.index, dtype='datetime64[ns]')
+    if complete.any():
+        result[complete] = pd.to_datetime(parts[complete].astype('int64'), errors='coerce')
+    return result
+
+
 def convert_date_format(df: pd.DataFrame, date_column: str,
                         date_format: Optional[str] = None, only_date=False) -> pd.DataFrame:
     """
     Converts date column values using pandas.to_datetime with date format that user gave. If date_format is None,
     pandas tries to guess it.
+    Counts and times itself in the date parse report if one is set by set_date_parse_report.
     """
-    if pd.api.types.is_string_dtype(df[date_column]):
-        df[date_column] = df[date_column].str.strip()
-    try:
-        df[date_column] = pd.to_datetime(df[date_column], format=date_format, errors='ignore')
-    except Exception as e:
-        logging.error(f'Format {date_format} is wrong, {e}')
-        return df
+    with date_parse_scope(None, date_column, len(df)):
+        if pd.api.types.is_string_dtype(df[date_column]):
+            df[date_column] = df[date_column].str.strip()
+        try:
+            df[date_column] = pd.to_datetime(df[date_column], format=date_format, errors='ignore')
+        except Exception as e:
+            logging.error(f'Format {date_format} is wrong, {e}')
+            _count('failures', len(df))
+            return df
+        # with errors='ignore', the column is left as it was if a value doesn't match the format
+        converted = pd.api.types.is_datetime64_any_dtype(df[date_column])
+        _count('fast' if converted else 'failures', len(df))
 
-    if only_date:
-        df[date_column] = df[date_column].dt.date
+        if only_date:
+            df[date_column] = df[date_column].dt.date
 
-    if pd.api.types.is_datetime64_any_dtype(df[date_column]):
-        df[date_column] = df[date_column].apply(lambda x: x.replace(microsecond=0).replace(tzinfo=None))
+        if pd.api.types.is_datetime64_any_dtype(df[date_column]):
+            df[date_column] = df[date_column].apply(lambda x: x.replace(microsecond=0).replace(tzinfo=None))
     return df
 
 
@@ -136,25 +471,32 @@ def add_duration(df: pd.DataFrame, column_start: str, column_end: str, column_du
     """
     Calculates study duration. Firstly trying to convert birth date from string to date using "date format" parameter.
     Throws an exception every time when couldn't convert and returns None.
+    Each distinct date of both columns is converted once and durations are computed for the whole columns at once.
     """
 
-    def calculate_dur(row: pd.DataFrame) -> str:
-        start = convert_to_dt(row[column_start])
-        end = convert_to_dt(row[column_end])
-
-        if isinstance(start, date) and isinstance(end, date):
+    def calculate_dur(start, end) -> str:
+        if (isinstance(start, date) and pd.notnull(start)
+                and isinstance(end, date) and pd.notnull(end)):
             delta = str((end - start).days)
         else:
             delta = None
         return delta
 
-    df[column_dur] = df.apply(calculate_dur, axis=1, result_type="reduce")
+    starts, ends = _map_unique(df[column_start], convert_to_dt), _map_unique(df[column_end], convert_to_dt)
+    start_dts, end_dts = _to_datetime64(*starts), _to_datetime64(*ends)
+    if start_dts is None or end_dts is None:
+        # dates without time, timezones or dates out of datetime64 range: day by day
+        durations = [calculate_dur(start, end) for start, end in zip(starts[1].take(starts[0]), ends[1].take(ends[0]))]
+    else:
+        durations = _days_to_str(_days(start_dts, end_dts))
+    df[column_dur] = pd.Series(durations, index=df.index, dtype=object)
     return df
 
 
 def add_dy(df, dtc_column, dy_column=None):
     """
     Calculates a study day variable like *Domain*STUDY, which is the difference between RFSTDTC and *Domain*STDTC.
+    Each distinct date of both columns is converted once and study days are computed for the whole columns at once.
     """
     if not dtc_column.endswith("DTC") and dy_column is None:
         error_msg = f'Invalid column name {dtc_column} (must end with "DTC", or specify dy_column)'
@@ -164,25 +506,90 @@ def add_dy(df, dtc_column, dy_column=None):
     # create dy_column name if wasn't specified
     dy_column = dy_column if dy_column is not None else dtc_column.replace("DTC", "DY")
 
-    def calculate_study_day(row: pd.DataFrame) -> str:
+    def calculate_study_day(dtc, rfstdtc) -> str:
         try:
-            dtc = pd.Timestamp(row[dtc_column])
-            if not isinstance(dtc, date):
-                dtc = (dtc)
-            rfstdtc = convert_to_dt(row['RFSTDTC'])
+            for value in (dtc, rfstdtc):
+                if isinstance(value, Exception):
+                    raise value
             delta = dtc - rfstdtc
             dy = delta.days
             if dy >= 0:
                 dy += 1
         except Exception:
-            logging.error('Calculation of study day went wrong: ' + str(row[dtc_column]))
             dy = None
         return str(dy)
 
-    df[dy_column] = df.apply(calculate_study_day, axis=1, result_type="reduce")
+    dtcs = _map_unique(df[dtc_column], _or_exception(pd.Timestamp))
+    rfstdtcs = _map_unique(df['RFSTDTC'], _or_exception(convert_to_dt))
+    dtc_dts, rfstdtc_dts = _to_datetime64(*dtcs), _to_datetime64(*rfstdtcs)
+    if dtc_dts is None or rfstdtc_dts is None:
+        # timezones or dates out of datetime64 range: pair by pair
+        dtc_dts = rfstdtc_dts = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[ns]')
+    days = _days(rfstdtc_dts, dtc_dts)
+    days[days.ge(0).fillna(False).to_numpy(dtype=bool)] += 1
+    study_days = _days_to_str(days)
+
+    # rows with a date not converted to datetime: the same result as pandas arithmetic gives, once per distinct pair
+    others = np.flatnonzero(days.isna().to_numpy())
+    if len(others):
+        pairs = {}
+        for position in others:
+            pair = dtcs[0][position], rfstdtcs[0][position]
+            if pair not in pairs:
+                pairs[pair] = calculate_study_day(dtcs[1][pair[0]], rfstdtcs[1][pair[1]])
+                if pairs[pair] == 'None':
+                    logging.error('Calculation of study day went wrong: ' + str(df[dtc_column].iat[position]))
+            study_days[position] = pairs[pair]
+    df[dy_column] = pd.Series(study_days, index=df.index, dtype=object)
     return df
 
 
+def _or_exception(function: Callable) -> Callable:
+    """
+    Wraps the function to return the exception it raises instead of raising it.
+    """
+
+    def wrapped(value):
+        try:
+            return function(value)
+        except Exception as e:
+            return e
+    return wrapped
+
+
+def _to_datetime64(codes: np.ndarray, values: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Returns datetime64 array of values.take(codes): NaT where a value isn't a datetime.
+    Returns None if a value is a date without time, has a timezone or is out of datetime64 range.
+    """
+    is_datetime = np.array([isinstance(value, date) and pd.notnull(value) for value in values], dtype=bool)
+    datetimes = values[is_datetime]
+    if any(not isinstance(value, datetime) or value.tzinfo is not None for value in datetimes):
+        return None
+    converted = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[ns]')
+    try:
+        converted[is_datetime] = pd.to_datetime(list(datetimes)).to_numpy()
+    except (pd.errors.OutOfBoundsDatetime, OverflowError):
+        return None
+    return converted.take(codes)
+
+
+def _days(start: np.ndarray, end: np.ndarray) -> pd.Series:
+    """
+    Returns nullable integer days between datetime64 arrays, rounded down like timedelta.days.
+    """
+    return pd.Series(end - start).dt.days.astype('Int64')
+
+
+def _days_to_str(days: pd.Series) -> np.ndarray:
+    """
+    Returns days as strings, None where days are missing.
+    """
+    strings = days.astype(str).to_numpy(dtype=object)
+    strings[days.isna().to_numpy()] = None
+    return strings
+
+
 def _combine_partial_date(orig_date: str, year: str = None, month: str = None, day: str = None,
                           start: bool = False, hour: str = '00', minute: str = '00', second: str = '00'):
     """
@@ -1,8 +1,13 @@
 import logging
-from typing import Dict, Any, List, Callable, Optional, Union, TypedDict
+import weakref
+from typing import Dict, Any, Iterable, List, Callable, Optional, Union, TypedDict
 
+import numpy as np
 import pandas as pd
 
+from sdw4_mapping.common.utils import compile_patterns
+from sdw4_mapping.transformations.conditions import Condition
+
 
 class TUnpivotAttr(TypedDict):
     val: Optional[str]
@@ -106,16 +111,28 @@ def copy_columns(df: pd.DataFrame, source_columns: Union[str, List[str]],
 def drop_columns(df: pd.DataFrame, columns: Union[str, List[str]]) -> pd.DataFrame:
     """
     Drops columns. Can be one column or list of columns. If columns to drop doesn't exist, does nothing.
+    All the columns are dropped by one projection of the data (see prune_columns).
     """
-    if isinstance(columns, list):
-        for column in columns:
-            df = df.drop(columns=column, errors='ignore')
-    else:
-        df = df.drop(columns=columns, errors='ignore')
-    return df
+    return prune_columns(df, columns=columns if isinstance(columns, list) else [columns])
+
+
+def prune_columns(df: pd.DataFrame, columns: Iterable[str] = (), patterns: Iterable[str] = ()) -> pd.DataFrame:
+    """
+    Drops the columns from "columns" list and the columns matching one of "patterns" regular expressions (searched
+    anywhere in the column name, like str.contains), e.g. patterns=['_RAW$', '_STD$'].
+    The surviving columns are computed once and taken by one projection; if there is nothing to drop, the data is
+    returned as it is. Columns to drop which don't exist are ignored.
+    """
+    columns = set(columns)
+    regex = compile_patterns(tuple(patterns))
+    drop = [column for column in dict.fromkeys(df.columns)
+            if column in columns or (regex is not None and isinstance(column, str) and regex.search(column))]
+    if not drop:
+        return df
+    return df.drop(columns=drop)
 
 
-def filter_rows(df: pd.DataFrame, filter_function: Callable, column: str = None) -> pd.DataFrame:
+def filter_rows(df: pd.DataFrame, filter_function: Union[Condition, Callable], column: str = None) -> pd.DataFrame:
     """
     Applies custom filter function to the dataframe. E.g.
 
@@ -124,8 +141,12 @@ def filter_rows(df: pd.DataFrame, filter_function: Callable, column: str = None)
 
     If specific column to filter are given, pandas boolean functions can be used as filter functions:
     pd.isna, pd.notnull etc.
+    A condition (see conditions module) filters by whole columns at once, much faster than a function called row by
+    row, e.g. equals('VALUES', '15 Sep 2017').
     """
-    if column is not None:
+    if isinstance(filter_function, Condition):
+        df = df[filter_function.mask(df)]
+    elif column is not None:
         df = df[df[column].apply(filter_function)]
     else:
         df = df[df.apply(filter_function, axis=1)]
@@ -247,39 +268,47 @@ def join(left: pd.DataFrame, right: pd.DataFrame, columns: Union[List[str], Dict
     in "suffix" parameter.
     If columns to join on have the same names in both dataframes, use 'on' param, if names are different - use 'left_on'
     and 'right_on'
+    Only the join keys and the requested columns of the right are merged. A left join on unique keys of the right
+    looks rows up in an index of the right keys, built once per right dataframe and reused by the next joins.
+    NaN values of the joined columns are replaced by None.
     """
     num_rows_before = len(left)
 
-    def filter(row: pd.Series) -> bool:
-        if right_filter:
-            for column, value in right_filter.items():
-                if row[column] != value:
-                    return False
-        return True
-
     def column_hit_and_miss(column_names: List[str], df) -> tuple:
         column_hit, column_miss = [], []
         for column in column_names:
             (column_miss, column_hit)[column in df].append(column)
         return column_hit, column_miss
 
-    right = right[right.apply(filter, axis=1)]
+    key_index = None
+    if right_filter:
+        right = right[_equality_mask(right, right_filter)]
 
     # Keep only columns we're interested in (all from left and some from right)
     columns_keep = left.columns.tolist()
     column_hit, column_miss = column_hit_and_miss(columns if isinstance(columns, list) else list(columns.keys()), right)
 
     forced_suffix = '_JOIN'
-    right = right.rename(columns={key: key + forced_suffix for key in right.columns})
-
     if on is not None:
         left_on = on
-        right_on = [column + forced_suffix for column in on]
+        right_on = on
+    left_on, right_on = _as_list(left_on), _as_list(right_on)
+
+    if how == 'left' and not kwargs and not right_filter:
+        key_index = _right_key_index(left, right, left_on, right_on, column_hit, forced_suffix)
+
+    right = right[list(dict.fromkeys(right_on + column_hit))]
+    if key_index is not None:
+        # many-to-one left join: each left row takes the right row of its key (NaN if none), as merge gives
+        positions = key_index.get_indexer(_keys(left, left_on))
+        joined = right[column_hit].reset_index(drop=True).reindex(positions)
+        joined.columns = [column + forced_suffix for column in column_hit]
+        joined.index = pd.RangeIndex(len(left))
+        df = pd.concat([left.reset_index(drop=True), joined], axis=1)
     else:
-        right_on = [column + forced_suffix for column in right_on]
-
-    df = left.merge(right, right_on=right_on, left_on=left_on, how=how, suffixes=[None, "_JOIN"], copy=False,
-                    **kwargs)
+        right = right.rename(columns={key: key + forced_suffix for key in right.columns})
+        df = left.merge(right, right_on=[column + forced_suffix for column in right_on], left_on=left_on, how=how,
+                        suffixes=[None, "_JOIN"], copy=False, **kwargs)
 
     suffix = '_JOIN' if suffix is None else suffix
 
@@ -300,7 +329,9 @@ def join(left: pd.DataFrame, right: pd.DataFrame, columns: Union[List[str], Dict
     df = df[columns_keep]
     df = rename_columns(df, column_renames)
 
-    for column in df.columns:
+    # only the joined columns can have new NaN values
+    joined_columns = set(column_renames) | set(column_renames.values())
+    for column in dict.fromkeys(column for column in df.columns if column in joined_columns):
         df[column] = _replace_nan_to_None(df[column])
 
     if len(column_miss):
@@ -310,6 +341,64 @@ def join(left: pd.DataFrame, right: pd.DataFrame, columns: Union[List[str], Dict
     return df
 
 
+def _equality_mask(df: pd.DataFrame, values: Dict[str, Any]) -> np.ndarray:
+    """
+    Returns the mask of rows equal to the values {column: value} in all the columns.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for column, value in values.items():
+        mask &= (df[column] == value).fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+def _as_list(columns: Union[List[str], str]) -> List[str]:
+    return [columns] if isinstance(columns, str) else list(columns)
+
+
+def _keys(df: pd.DataFrame, columns: List[str]) -> pd.Index:
+    if len(columns) == 1:
+        return pd.Index(df[columns[0]])
+    return pd.MultiIndex.from_arrays([df[column] for column in columns])
+
+
+# id of a right dataframe -> (weak reference, key columns, copies of the key values, index of its keys or None)
+_key_indexes: Dict[int, tuple] = {}
+
+
+def _right_key_index(left: pd.DataFrame, right: pd.DataFrame, left_on: List[str], right_on: List[str],
+                     column_hit: List[str], forced_suffix: str) -> Optional[pd.Index]:
+    """
+    Returns the index of the right keys if a left join can look rows up in it with the same result as merge: unique
+    keys without nulls, same key types on both sides (object or integer) and no left column named like a suffixed right
+    one. Else None.
+    The index is kept for the next joins with the same right dataframe, while its key values don't change (replaced
+    columns or values changed in place).
+    """
+    if len(left_on) != len(right_on) or not right_on:
+        return None
+    for left_column, right_column in zip(left_on, right_on):
+        if left_column not in left or right_column not in right:
+            return None
+        dtype = right[right_column].dtype
+        if left[left_column].dtype != dtype or not (dtype == object or pd.api.types.is_integer_dtype(dtype)):
+            return None
+    if any(column + forced_suffix in left for column in right.columns):
+        return None
+
+    values = [right[column].to_numpy() for column in right_on]
+    cached = _key_indexes.get(id(right))
+    if cached is not None and cached[0]() is right and cached[1] == tuple(right_on) and \
+            all(np.array_equal(kept, value) for kept, value in zip(cached[2], values)):
+        return cached[3]
+    index = _keys(right, right_on)
+    if right[right_on].isna().any(axis=None) or not index.is_unique:
+        index = None
+    key = id(right)
+    _key_indexes[key] = (weakref.ref(right, lambda _: _key_indexes.pop(key, None)), tuple(right_on),
+                         [value.copy() for value in values], index)
+    return index
+
+
 # todo add column name
 def apply(df: pd.DataFrame, func: Callable) -> pd.DataFrame:
     """